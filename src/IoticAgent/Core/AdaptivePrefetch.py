@@ -0,0 +1,136 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Choice of (AMQP) consumer prefetch count based on measured throughput & latency
+"""
+
+from __future__ import unicode_literals
+
+from math import ceil
+
+from .utils import validate_nonnegative_int
+
+# Additional time (in seconds) for which processed messages can remain unacknowledged (see AmqpLink drain loop)
+ACK_DELAY = .1
+# Multiple of (estimated) required prefetch to aim for, to allow for bursts
+HEADROOM = 2
+# Weight of new samples for exponential moving averages
+SMOOTHING = .3
+# Changes of less than this fraction of the current value are not applied (to avoid frequent basic.qos calls)
+MIN_CHANGE = .1
+
+
+def _ewma(previous, sample):
+    return sample if previous is None else previous + SMOOTHING * (sample - previous)
+
+
+class AdaptivePrefetch(object):
+    """Chooses the prefetch count based on where unacknowledged messages spend their time. When the prefetch limit is
+    reached without messages queueing up locally (i.e. the link rather than processing is the bottleneck, e.g. due to a
+    high round trip time), the prefetch count is doubled. Conversely when most unacknowledged messages are waiting to be
+    processed, it shrinks towards the number needed to cover messages in transit and processed but not yet
+    acknowledged, limiting memory use in bursts. NOT thread safe."""
+
+    def __init__(self, prefetch, min_prefetch=16, max_prefetch=2048, interval=2):
+        """
+        `prefetch` - (int) initial prefetch count
+
+        `min_prefetch`/`max_prefetch` - (int) bounds for prefetch count
+
+        `interval` - (int/float) minimum time (in seconds) between updates
+        """
+        self.__min = validate_nonnegative_int(min_prefetch, 'min_prefetch')
+        self.__max = validate_nonnegative_int(max_prefetch, 'max_prefetch')
+        if self.__max < self.__min:
+            raise ValueError('max_prefetch must not be less than min_prefetch')
+        self.__prefetch = validate_nonnegative_int(prefetch, 'prefetch')
+        self.__interval = interval
+        self.__last_update = None
+        self.__rtt = None
+        self.__latency = None
+        self.__rate = None
+
+    @property
+    def prefetch(self):
+        return self.__prefetch
+
+    def stats(self):
+        """
+        Returns:
+            dict of current prefetch, round trip time (`rtt`, seconds), per-message processing latency (`latency`,
+            seconds) and processing rate (`rate`, messages per second). Measurements are None until available.
+        """
+        return {'prefetch': self.__prefetch,
+                'rtt': self.__rtt,
+                'latency': self.__latency,
+                'rate': self.__rate}
+
+    def add_rtt(self, rtt):
+        """Record a round trip time (in seconds) measurement"""
+        self.__rtt = _ewma(self.__rtt, rtt)
+
+    def due(self, now):
+        """
+        Returns:
+            True if at least interval seconds have passed since the last update (or since the first call)
+        """
+        if self.__last_update is None:
+            self.__last_update = now
+            return False
+        return now - self.__last_update >= self.__interval
+
+    def update(self, now, processed, latency_sum, unacked_peak):
+        """Record measurements since the last update and re-evaluate prefetch count. Should only be called when due()
+        returns True.
+
+        `now` - (float) current (monotonic) time
+
+        `processed` - (int) number of messages processed since the last update
+
+        `latency_sum` - (float) total time (in seconds) the processed messages took between receipt and completion
+
+        `unacked_peak` - (int) highest number of unacknowledged messages since the last update
+
+        Returns:
+            New prefetch count if it should be changed, otherwise None
+        """
+        elapsed = now - self.__last_update
+        self.__last_update = now
+
+        self.__rate = _ewma(self.__rate, processed / elapsed)
+        if processed:
+            self.__latency = _ewma(self.__latency, latency_sum / processed)
+        if not (self.__rate and self.__latency is not None):
+            return None
+
+        current = self.__prefetch
+        # messages waiting for or being processed locally (on average)
+        local = self.__rate * self.__latency
+        if local * 2 < current:
+            if unacked_peak < current:
+                return None
+            # limited by broker (link) rather than processing
+            target = current * 2
+        else:
+            # Limited by processing: Only need enough to cover messages in transit & awaiting ack, plus a few to be
+            # processed. (Latency is not used here since it includes time spent queueing due to prefetch itself.)
+            target = int(ceil(HEADROOM * self.__rate * ((self.__rtt or 0) + ACK_DELAY)))
+            if target >= current:
+                return None
+            # shrink gradually
+            target = (current + target) // 2
+        target = max(self.__min, min(self.__max, target))
+        if abs(target - current) < max(1, current * MIN_CHANGE):
+            return None
+        self.__prefetch = target
+        return target
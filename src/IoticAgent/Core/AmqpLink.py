@@ -18,6 +18,8 @@ import logging
 logger = logging.getLogger(__name__)
 
 from sys import version_info, exc_info
+from collections import deque
+from functools import partial
 
 try:
     BlockingIOError
@@ -31,8 +33,9 @@ from socket import timeout as SocketTimeout
 
 from ..third.amqp import Connection, Message, exceptions
 
+from .AdaptivePrefetch import AdaptivePrefetch
 from .Profiler import profiled_thread
-from .compat import raise_from, Event, RLock, monotonic, SocketError
+from .compat import raise_from, Event, Lock, RLock, monotonic, SocketError
 from .utils import EventWithChangeTimes, validate_nonnegative_int
 from .Exceptions import LinkException
 
@@ -46,7 +49,8 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
 
     def __init__(self, host, vhost, prefix, epid, passwd, msg_callback, ka_callback,  # pylint: disable=too-many-locals
                  send_ready_callback, sslca=None, prefetch=128, ackpc=0.5, heartbeat=30, socket_timeout=10,
-                 startup_ignore_exc=False, conn_retry_delay=5, conn_error_log_threshold=180):
+                 startup_ignore_exc=False, conn_retry_delay=5, conn_error_log_threshold=180,
+                 send_confirm_callback=None, deferred_ack=False, adaptive_prefetch=False, recv_lost_callback=None):
         """
         `host`: Broker 'host:port'
 
@@ -58,7 +62,7 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
 
         `passwd`: password
 
-        `msg_callback`: function callback for messages. Arguments: message
+        `msg_callback`: function callback for messages. Arguments: message (and done function, see `deferred_ack`)
 
         `ka_callback`: function callback for keepalives, Arguments: none
 
@@ -70,6 +74,9 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
 
         `ackpc` 1..0 (percentage) maximum fraction (of prefetch) of unacknowledged messages
 
+        `adaptive_prefetch` Adjust prefetch (and with it the ack threshold) based on measured processing rate, latency
+                            and round trip time, starting with `prefetch`. See AdaptivePrefetch and recv_stats.
+
         `heartbeat` How often (in seconds) to send AMQP heartbeat
 
         `socket_timeout` Timeout of underlying sockets both for connection and subsequent operations
@@ -83,6 +90,20 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
 
         `conn_error_log_threshold` How long (in seconds) to delay logging connection failures at ERROR level. Until said
                                    threshold is reached, the error messages will be logged at WARNING level.
+
+        `send_confirm_callback`: If set, enables publisher confirms on the send channel. Called with the references (as
+                                 passed to send()) of messages which were confirmed (or not) by the broker. Arguments:
+                                 list of references, whether delivered. Messages which were still unconfirmed when the
+                                 send channel was lost are reported as not delivered on reconnection, before
+                                 `send_ready_callback` is called.
+
+        `deferred_ack`: If set, `msg_callback` is passed a second argument: a function (without arguments) which must
+                        be called once the message has been processed, from any thread. Messages are only acknowledged
+                        once processed and so these functions must be called in the order in which messages were
+                        passed to `msg_callback`. Otherwise messages are deemed processed when `msg_callback` returns.
+
+        `recv_lost_callback`: Called (without arguments) when the receive connection has failed, i.e. messages might be
+                              missed until it has been re-established.
         """
         self.__host = host
         self.__vhost = vhost
@@ -93,16 +114,31 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
         self.__msg_callback = msg_callback
         self.__ka_callback = ka_callback
         self.__send_ready_callback = send_ready_callback
+        self.__send_confirm_callback = send_confirm_callback
+        self.__recv_lost_callback = recv_lost_callback
         #
         self.__sslca = sslca
         self.__prefetch = prefetch
         self.__ackpc = ackpc
-        self.__ack_threshold = self.__prefetch * self.__ackpc
+        self.__ack_threshold = max(1, int(self.__prefetch * self.__ackpc))
+        self.__adaptive_prefetch = AdaptivePrefetch(self.__prefetch) if adaptive_prefetch else None
         self.__heartbeat = heartbeat
         self.__socket_timeout = validate_nonnegative_int(socket_timeout, 'socket_timeout', allow_zero=False)
         #
+        self.__deferred_ack = deferred_ack
+        # last processed (but not yet acknowledged) delivery tag and number of such messages
         self.__unacked = 0
         self.__last_id = None
+        # incremented on every (re)connection, so that messages processed after their channel was lost are not acked
+        self.__recv_generation = 0
+        self.__recv_ack_lock = Lock()
+        # for adaptive prefetch: received & acked counts (receive thread only), highest difference between the two
+        # since last evaluation, processed count & total latency (under recv_ack_lock) since last evaluation
+        self.__received = 0
+        self.__acked = 0
+        self.__unacked_peak = 0
+        self.__processed = 0
+        self.__latency_sum = 0
         #
         self.__end = Event()
         self.__recv_ready = EventWithChangeTimes()
@@ -114,6 +150,11 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
         self.__send_thread = None
         self.__send_exc_time = None
         self.__send_exc = None     # Used to pass exceptions to blocking calls EG .start
+        # publisher confirms: (delivery tag, reference) of messages not yet confirmed by broker, in tag order
+        self.__unconfirmed = deque()
+        self.__delivery_tag = 0
+        # confirm results (tuples of reference list & whether delivered) to pass on outside of send lock
+        self.__confirmed = []
         self.__recv_exc = None
         # Whether to only rely on timeout on startup
         self.__startup_ignore_exc = bool(startup_ignore_exc)
@@ -190,12 +231,26 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
         """
         return self.__send_exc_time
 
+    @property
+    def recv_stats(self):
+        """dict of current `prefetch` and `ack_threshold` and whether these are `adaptive`. If so, also includes
+        measurements of round trip time (`rtt`), per-message processing `latency` and processing `rate`. See
+        AdaptivePrefetch.stats.
+        """
+        stats = {'prefetch': self.__prefetch,
+                 'ack_threshold': self.__ack_threshold,
+                 'adaptive': self.__adaptive_prefetch is not None}
+        if self.__adaptive_prefetch is not None:
+            stats.update(self.__adaptive_prefetch.stats())
+        return stats
+
     def __del__(self):
         self.stop()
 
-    def send(self, body, content_type='application/ubjson', timeout=5):
+    def send(self, body, content_type='application/ubjson', timeout=5, ref=None):
         """timeout indicates amount of time to wait for sending thread to be ready. set to larger than zero to wait
-        (in seconds, fractional) or None to block.
+        (in seconds, fractional) or None to block. ref is passed to send_confirm_callback (if publisher confirms are
+        enabled) once the broker has confirmed the message.
         """
         if self.__send_ready.wait(timeout):
             try:
@@ -203,6 +258,9 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
                     # access denied response might be received inside send thread rather than here how to best handle?
                     self.__send_channel.basic_publish(msg=Message(body, delivery_mode=2, content_type=content_type),
                                                       exchange=self.__epid)
+                    if self.__send_confirm_callback:
+                        self.__delivery_tag += 1
+                        self.__unconfirmed.append((self.__delivery_tag, ref))
             except exceptions.AccessRefused as exc:
                 raise_from(LinkException('Access denied'), exc)
             except (exceptions.AMQPError, SocketError) as exc:
@@ -262,6 +320,45 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
 
         return ctx
 
+    def __send_ack_cb(self, delivery_tag, multiple, delivered=True):
+        """Handles basic.ack & basic.nack from broker (publisher confirms). Called within send lock."""
+        unconfirmed = self.__unconfirmed
+        refs = []
+        if multiple:
+            while unconfirmed and unconfirmed[0][0] <= delivery_tag:
+                refs.append(unconfirmed.popleft()[1])
+        elif unconfirmed and unconfirmed[0][0] == delivery_tag:
+            refs.append(unconfirmed.popleft()[1])
+        else:
+            # out-of-order confirmation of single message
+            for item in unconfirmed:
+                if item[0] == delivery_tag:
+                    unconfirmed.remove(item)
+                    refs.append(item[1])
+                    break
+            else:
+                logger.warning('Confirmation for unknown delivery tag %d', delivery_tag)
+                return True
+        if not delivered:
+            logger.warning('Broker rejected %d message(s) (up to tag %d)', len(refs), delivery_tag)
+        self.__confirmed.append((refs, delivered))
+        # return value (truthy) prevents channel from raising NotConfirmed for basic.nack
+        return True
+
+    def __send_nack_cb(self, delivery_tag, multiple, requeue):  # pylint: disable=unused-argument
+        return self.__send_ack_cb(delivery_tag, multiple, delivered=False)
+
+    def __send_confirmed_notify(self):
+        """Pass on confirmation results gathered by __send_confirm_cb. Must NOT be called within send lock."""
+        with self.__send_lock:
+            confirmed = self.__confirmed
+            self.__confirmed = []
+        for refs, delivered in confirmed:
+            try:
+                self.__send_confirm_callback(refs, delivered)
+            except:
+                logger.exception("send_confirm_callback exception ignored.")
+
     def __recv_ka_cb(self, msg):
         try:
             if self.__recv_ready.wait(2):
@@ -277,24 +374,78 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
             logger.exception("__recv_ka_cb exception ignored.")
 
     def __recv_cb(self, msg):
-        """Calls user-provided callback and marks message for Ack regardless of success
+        """Calls user-provided callback and marks message for Ack regardless of success (immediately or via the done
+        function if deferred_ack is set)
         """
+        if self.__adaptive_prefetch is not None:
+            self.__received += 1
+            self.__unacked_peak = max(self.__unacked_peak, self.__received - self.__acked)
+        done = partial(self.__recv_done, self.__recv_generation, msg.delivery_tag, monotonic())
         try:
+            if self.__deferred_ack:
+                self.__msg_callback(msg, done)
+                return
             self.__msg_callback(msg)
         except:
             logger.exception("AmqpLink.__recv_cb exception calling msg_callback")
-        finally:
-            # only works if all messages handled in series
-            self.__last_id = msg.delivery_tag
-            self.__unacked += 1
+        done()
+
+    def __recv_done(self, generation, delivery_tag, received_at):
+        """Marks message for Ack. Only works if messages are marked in the order they were received."""
+        with self.__recv_ack_lock:
+            if generation == self.__recv_generation:
+                self.__last_id = delivery_tag
+                self.__unacked += 1
+                self.__processed += 1
+                self.__latency_sum += monotonic() - received_at
+
+    def __recv_ack(self, channel):
+        """Acknowledge all messages processed so far (and re-evaluate prefetch count, if adaptive)"""
+        with self.__recv_ack_lock:
+            unacked, last_id = self.__unacked, self.__last_id
+            self.__unacked = 0
+        if unacked:
+            logger.debug('acking (%d) up to %s', unacked, last_id)
+            channel.basic_ack(last_id, multiple=True)
+            self.__acked += unacked
+        if self.__adaptive_prefetch is not None:
+            self.__recv_tune(channel)
+
+    def __recv_set_qos(self, channel, prefetch):
+        """Apply prefetch count (and ack threshold) and measure round trip time"""
+        start = monotonic()
+        channel.basic_qos(prefetch_size=0, prefetch_count=prefetch, a_global=False)
+        if self.__adaptive_prefetch is not None:
+            self.__adaptive_prefetch.add_rtt(monotonic() - start)
+        self.__prefetch = prefetch
+        self.__ack_threshold = max(1, int(prefetch * self.__ackpc))
+
+    def __recv_tune(self, channel):
+        """Re-evaluate prefetch count, if due. Called from receive thread only."""
+        tuner = self.__adaptive_prefetch
+        now = monotonic()
+        if not tuner.due(now):
+            return
+        with self.__recv_ack_lock:
+            processed, latency_sum = self.__processed, self.__latency_sum
+            self.__processed = self.__latency_sum = 0
+        unacked_peak = self.__unacked_peak
+        self.__unacked_peak = self.__received - self.__acked
+        prefetch = tuner.update(now, processed, latency_sum, unacked_peak)
+        if prefetch is not None:
+            logger.debug('Changing prefetch from %d to %d (%s)', self.__prefetch, prefetch, tuner.stats())
+            self.__recv_set_qos(channel, prefetch)
 
     @profiled_thread  # noqa (complexity)
     def __recv_run(self):  # pylint: disable=too-many-branches,too-many-statements
         """Main receive thread/loop
         """
         while not self.__end.is_set():
-            self.__unacked = 0
-            self.__last_id = None
+            with self.__recv_ack_lock:
+                self.__recv_generation += 1
+                self.__unacked = 0
+                self.__last_id = None
+            self.__received = self.__acked = self.__unacked_peak = 0
 
             try:
                 self.__recv_ready.clear()  # Ensure event is cleared for EG network failure/retry loop
@@ -310,7 +461,7 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
                         conn.channel() as channel_ka:
                     logger.debug('Connected, using cipher %s', conn.transport.sock.cipher()[0])
 
-                    channel_data.basic_qos(prefetch_size=0, prefetch_count=self.__prefetch, a_global=False)
+                    self.__recv_set_qos(channel_data, self.__prefetch)
                     # exclusive=True.  There can be only one (receiver)
                     msgtag = channel_data.basic_consume(queue=self.__epid, exclusive=True, callback=self.__recv_cb)
                     acktag = channel_ka.basic_consume(queue=('%s_ka' % self.__epid), exclusive=True, no_ack=True,
@@ -329,10 +480,7 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
                             except SocketTimeout:
                                 pass
                             # either have waited for .1s or threshold reached, so always ack
-                            if self.__unacked:
-                                logger.debug('acking (%d) up to %s', self.__unacked, self.__last_id)
-                                channel_data.basic_ack(self.__last_id, multiple=True)
-                                self.__unacked = 0
+                            self.__recv_ack(channel_data)
                             conn.heartbeat_tick()
                     finally:
                         self.__recv_ready.clear()
@@ -369,6 +517,11 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
             exc_info=DEBUG_ENABLED
         )
         self.__recv_exc = exc_info()[1]
+        if self.__recv_lost_callback:
+            try:
+                self.__recv_lost_callback()
+            except:
+                logger.warning('Receive connection lost callback failed', exc_info=DEBUG_ENABLED)
         self.__end.wait(self.__conn_retry_delay if wait_seconds is None else wait_seconds)
 
     def __recv_exc_clear(self, log_if_exc_set=None):
@@ -393,20 +546,18 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
                                 host=self.__host) as conn,\
                         conn.channel(auto_encode_decode=False) as channel:
 
+                    if self.__send_confirm_callback:
+                        self.__send_confirm_enable(channel)
                     self.__send_channel = channel
                     self.__send_exc_clear(log_if_exc_set='reconnected')
                     self.__send_ready.set()
                     try:
+                        if self.__send_confirm_callback:
+                            self.__send_confirmed_notify()
                         self.__send_ready_callback(self.__send_exc_time)
 
                         while not self.__end.is_set():
-                            with self.__send_lock:
-                                try:
-                                    # deal with any incoming messages (AMQP protocol only, not QAPI)
-                                    conn.drain_events(0)
-                                except (BlockingIOError, SocketTimeout):
-                                    pass
-                                conn.heartbeat_tick()
+                            self.__send_drain(conn)
                             # idle
                             self.__end.wait(.25)
                     finally:
@@ -429,6 +580,34 @@ class AmqpLink(object):  # pylint: disable=too-many-instance-attributes
                 break
         logger.debug('finished')
 
+    def __send_drain(self, conn):
+        """Process incoming (AMQP protocol only, not QAPI) messages on the send connection"""
+        with self.__send_lock:
+            try:
+                conn.drain_events(0)
+                # with confirms enabled, there can be many more (basic.ack) to process
+                while self.__send_confirm_callback:
+                    conn.drain_events(0)
+            except (BlockingIOError, SocketTimeout):
+                pass
+            conn.heartbeat_tick()
+        if self.__confirmed:
+            self.__send_confirmed_notify()
+
+    def __send_confirm_enable(self, channel):
+        """Enable publisher confirms on the given (new) send channel. Any messages still unconfirmed on the previous
+        channel will never be confirmed and so are reported as not delivered."""
+        channel.confirm_select()
+        channel.events['basic_ack'].add(self.__send_ack_cb)
+        channel.events['basic_nack'].add(self.__send_nack_cb)
+        with self.__send_lock:
+            if self.__unconfirmed:
+                logger.debug('%d message(s) unconfirmed by broker before reconnection', len(self.__unconfirmed))
+                self.__confirmed.append(([item[1] for item in self.__unconfirmed], False))
+                self.__unconfirmed.clear()
+            # delivery tags are per channel
+            self.__delivery_tag = 0
+
     def __send_log_set_exc_and_wait(self, msg, wait_seconds=None):
         """To be called in exception context only.
 
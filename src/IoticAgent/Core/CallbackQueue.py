@@ -0,0 +1,141 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Bounded per-subscription queue for feed data callbacks
+"""
+
+from __future__ import unicode_literals
+
+from collections import deque
+from threading import Condition
+import logging
+logger = logging.getLogger(__name__)
+
+from .Const import QueuePolicy
+from .compat import Lock
+from .utils import validate_nonnegative_int
+
+DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
+
+# How often (in seconds) a blocked put re-checks whether it should give up
+_BLOCK_CHECK_INTERVAL = 1
+
+
+class CallbackQueue(object):
+    """Delivers arguments to a single callback, one at a time and in order, via a (shared) submit function such as
+    ThreadPool.submit. Only one item is handed to submit at a time so that a slow callback can occupy at most one
+    worker, leaving the others free for other queues. Threadsafe."""
+
+    def __init__(self, callback, submit, maxsize=0, policy=QueuePolicy.BLOCK, abort=None):
+        """
+        `callback` - (func) Called with each item
+
+        `submit` - (func) Schedules a function (without arguments) to be run, e.g. ThreadPool.submit
+
+        `maxsize` - (int) Maximum number of items waiting for the callback. Zero means unlimited.
+
+        `policy` - (QueuePolicy) What to do with an item when the queue is full
+
+        `abort` - (Event) If set, put() no longer blocks (and drops the item instead) with QueuePolicy.BLOCK
+        """
+        self.__callback = callback
+        self.__submit = submit
+        self.__maxsize = validate_nonnegative_int(maxsize, 'maxsize', allow_zero=True)
+        self.__policy = policy
+        if policy == QueuePolicy.LATEST:
+            self.__maxsize = 1
+        self.__abort = abort
+        self.__items = deque()
+        self.__not_full = Condition(Lock())
+        # whether a __run call has been submitted (or is in progress)
+        self.__scheduled = False
+        self.__dropped = 0
+        self.__delayed = 0
+        self.__max_queued = 0
+
+    @property
+    def callback(self):
+        return self.__callback
+
+    @property
+    def policy(self):
+        return self.__policy
+
+    @property
+    def maxsize(self):
+        return self.__maxsize
+
+    def stats(self):
+        """
+        Returns:
+            dict with keys of:
+
+            `queued` - number of items currently waiting
+
+            `max_queued` - highest number of items which have been waiting at any one time
+
+            `dropped` - number of items discarded due to the queue being full
+
+            `delayed` - number of items which could not be passed to the callback straight away because it was still
+                        busy with earlier ones
+        """
+        with self.__not_full:
+            return {'queued': len(self.__items),
+                    'max_queued': self.__max_queued,
+                    'dropped': self.__dropped,
+                    'delayed': self.__delayed}
+
+    def put(self, item):
+        """Queue item for the callback, applying the overflow policy if the queue is full. With QueuePolicy.BLOCK this
+        blocks the caller until space becomes available."""
+        items = self.__items
+        maxsize = self.__maxsize
+        with self.__not_full:
+            if self.__scheduled:
+                self.__delayed += 1
+            if maxsize and len(items) >= maxsize:
+                policy = self.__policy
+                if policy == QueuePolicy.BLOCK:
+                    abort = self.__abort
+                    while len(items) >= maxsize:
+                        if abort is not None and abort.is_set():
+                            self.__dropped += 1
+                            return
+                        self.__not_full.wait(_BLOCK_CHECK_INTERVAL)
+                elif policy == QueuePolicy.DROP_NEWEST:
+                    self.__dropped += 1
+                    return
+                else:  # DROP_OLDEST, LATEST
+                    self.__dropped += 1
+                    items.popleft()
+            items.append(item)
+            if len(items) > self.__max_queued:
+                self.__max_queued = len(items)
+            if self.__scheduled:
+                return
+            self.__scheduled = True
+        self.__submit(self.__run)
+
+    def __run(self):
+        with self.__not_full:
+            item = self.__items.popleft()
+            self.__not_full.notify()
+        try:
+            self.__callback(item)
+        except:
+            logger.warning("Callback failed: %s", self.__callback, exc_info=DEBUG_ENABLED)
+        with self.__not_full:
+            self.__scheduled = reschedule = bool(self.__items)
+        # One item per submission so other queues sharing the same workers get a turn
+        if reschedule:
+            self.__submit(self.__run)
@@ -17,15 +17,12 @@
 from __future__ import unicode_literals
 
 from warnings import warn
-from datetime import datetime
-from hashlib import sha256 as hashfunc
-from hmac import new as hmacNew
 from binascii import a2b_hex
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from functools import partial
 import string
 import random
 from threading import Thread, Timer
-from struct import Struct
 import logging
 
 from ubjson import dumpb as ubjdumpb, loadb as ubjloadb, EXTENSION_ENABLED as ubj_ext, __version__ as ubj_version
@@ -36,16 +33,24 @@ from .RequestEvent import RequestEvent
 from .Profiler import profiled_thread
 from .MessageDecoder import decode_sent_msg, decode_rcvd_msg
 from .ThreadSafeDict import ThreadSafeDict
+from .TimeIndex import TimeIndex
 from .Validation import Validation, VALIDATION_MAX_ENCODED_LENGTH
-from .Compressors import COMPRESSORS, OversizeException
+from .Compressors import OversizeException, AdaptiveCompression, ZlibDict
+from .EncodePipeline import MessageEncoder, EncodePipeline
+from .DecodePipeline import DecodePipeline
 from .PreparedMessage import PreparedMessage
+from .LazyPayload import LazyPayload, decode_share_data
+from .TimeCodec import get_converter
+from .FeedCache import FeedCache
+from .SendQueue import SendQueue, LANE_CONTROL, LANE_DEFAULT, LANE_BULK
 from .compat import (
-    PY3, py_version_check, ssl_version_check, monotonic, Queue, Empty, Full, u, int_types, unicode_type, raise_from,
+    PY3, py_version_check, ssl_version_check, monotonic, Empty, Full, u, int_types, unicode_type, raise_from,
     Lock, Event, re_compile
 )
 from .ThreadPool import ThreadPool
-from .Mime import valid_mimetype, expand_idx_mimetype
-from .RateLimiter import RateLimiter
+from .CallbackQueue import CallbackQueue
+from .Mime import valid_mimetype
+from .RateLimiter import RateLimiter, try_acquire_all
 from .utils import version_string_to_tuple, validate_nonnegative_int, validate_int
 from .Const import (
     C_CREATE, C_UPDATE, C_DELETE, C_LIST,
@@ -57,9 +62,9 @@ from .Const import (
     W_SEQ, W_HASH, W_COMPRESSION, W_MESSAGE,
     M_RESOURCE, M_TYPE, M_CLIENTREF, M_ACTION, M_PAYLOAD, M_RANGE,
     P_CODE, P_RESOURCE, P_MESSAGE, P_LID, P_ENTITY_LID, P_FEED_ID, P_POINT_ID, P_DATA, P_MIME, P_POINT_TYPE, P_TIME,
-    P_SAMPLES,
-    COMP_NONE, COMP_DEFAULT, COMP_SIZE, COMP_LZ4F,
-    SearchType, SearchScope, DescribeScope
+    P_SAMPLES, P_ID,
+    COMP_NONE, COMP_DEFAULT, COMP_SIZE, COMP_ZLIB_DICT, COMP_DICT_SIZE,
+    SearchType, SearchScope, DescribeScope, QueuePolicy, TimeType
 )
 
 py_version_check()
@@ -83,7 +88,7 @@ _CB_CREATED = 4         # a resource has been created
 _CB_DUPLICATE = 5       # a resource already exists
 _CB_RENAMED = 6         # a resource has been renamed (lid/nickname)
 _CB_DELETED = 7         # a resource has been deleted
-_CB_FEED = 8            # feedid -> function (1:1)
+_CB_FEED = 8            # feedid -> CallbackQueue (1:1)
 _CB_FEEDDATA = 9        # Catch All FEEDDATA Messages!
 _CB_CONTROL = 10        # lid -> {pid -> func} (1:1)
 _CB_CONTROLREQ = 11     # Catch All CONTROLREQ Messages!
@@ -130,7 +135,10 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
     def __init__(self, host, vhost, epId, passwd, token, prefix='', lang=None,  # pylint: disable=too-many-locals
                  sslca=None, network_retry_timeout=300, socket_timeout=30, auto_encode_decode=True, send_queue_size=128,
                  throttle_conf='', max_encoded_length=None, startup_ignore_exc=False, conn_retry_delay=5,
-                 conn_error_log_threshold=180):
+                 conn_error_log_threshold=180, send_workers=0, send_confirm=False, send_queue_size_control=None,
+                 send_queue_size_bulk=None, throttle_reserve=0, adaptive_compression=False, callback_workers=8,
+                 recv_workers=0, prefetch=128, ackpc=0.5, adaptive_prefetch=False, lazy_decode=False,
+                 time_type=TimeType.DATETIME, feed_cache_budget=16777216):
         """
         `host` amqp broker "host:port"
 
@@ -156,10 +164,28 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         `auto_encode_decode` Automatically encode/decode text (utf8) and dictionaries (ubjson) when
                              sending/receiving point data. When sending, only applies if mime type not specified.
 
+        `lazy_decode` If `auto_encode_decode` is also enabled, received point data is passed to callbacks as a
+                      LazyPayload instance which only decodes the data on first access. This moves the decoding cost to
+                      the callback and avoids it for data which is never used. The mime passed alongside is always None
+                      - use the LazyPayload's mime (or raw_mime) attribute instead.
+
+        `time_type` (TimeType) How to represent timestamps of received feed data and recent data samples: As (naive,
+                    UTC) datetime instances, seconds since the epoch or numpy.datetime64.
+
+        `feed_cache_budget` Maximum (estimated) memory use in bytes of the local cache of recently received samples for
+                            feeds followed with a non-zero `cache_size` (see request_sub_create). Samples of the least
+                            recently read feeds are evicted first. Zero disables the cache.
+
         `send_queue_size` Maximum number of unsent requets to keep in interval queue. The queue can reach
                           its size limit when using asynchronous requests AND either `throttle_conf` is
                           used or if the the client has not been connected to the container for a while
-                          (due to network problems). Set to zero for no limit.
+                          (due to network problems). Set to zero for no limit. Requests are queued in three
+                          priority lanes: control (tell) confirmations & pings, then any other requests and
+                          finally feed shares. This size applies to the second lane and, unless overridden, to
+                          the other two.
+
+        `send_queue_size_control`/`send_queue_size_bulk` Override `send_queue_size` for the control confirmation and
+                                                         feed share lanes respectively.
 
         `throttle_conf` Automatic request (outgoing) throttling, specified as comma-separate list of
                         REQUESTS/INTERVAL pairs. E.g. '180/60,600/300' would result in no more than 180
@@ -167,10 +193,36 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
                         last 5 minutes. Used to prevent rate-limiting containers from temporarily banning
                         the client without requiring application code to introduce artificial delays.
 
+        `throttle_reserve` Percentage (0-99) of each `throttle_conf` limit which feed shares cannot use, so that
+                           control confirmations and other requests are not held up by shares.
+
         `max_encoded_length` Override the maximum permissible encoded request size (in bytes). Warning: Increasing this
                              without first consulting the container provider could result in a ban.
 
         `startup_ignore_exc`/`conn_retry_delay`/`conn_error_log_threshold` - See AmqpLink class parameters
+
+        `send_workers` Number of threads with which to encode, compress & sign outgoing requests. If zero, requests are
+                       encoded by the sending thread itself. Requests are always published in order regardless.
+
+        `adaptive_compression` Choose compression per request type based on how well (and how quickly) recent
+                               requests of the same type compressed, skipping compression where it does not help. Only
+                               methods announced by the container are used: its default plus any listed in the
+                               (optional) compression_methods container parameter. See compression_stats.
+
+        `send_confirm` Use publisher confirms to track delivery of requests to the broker. Requests which have not been
+                       confirmed when the connection is lost are re-sent immediately on reconnection, rather than
+                       re-sending any request without a response after a delay.
+
+        `callback_workers` Maximum number of threads to run (non-CRUD) callbacks, e.g. for feed data & control requests,
+                           with. Additional threads (beyond two) are only started when callbacks are queued. Callbacks
+                           for the same feed or control always run in the order the data was received.
+
+        `recv_workers` Number of threads with which to validate, decompress & decode received messages. Messages are
+                       still processed (and acknowledged) in the order they were received. If zero (the default),
+                       messages are decoded by the AMQP receiving thread itself.
+
+        `prefetch`/`ackpc`/`adaptive_prefetch` - See AmqpLink class parameters. Current values are available via
+                                                 recv_stats.
         """
         logger.info('ubjson version: %s (extension %s)', ubj_version, 'enabled' if ubj_ext else 'disabled')
         logger.debug("__init__ config host='%s', vhost='%s', epId='%s', passwd='%s', token='%s', prefix='%s'"
@@ -182,7 +234,7 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         self.__local_meta = False
         #
         try:
-            self.__token = a2b_hex(token.encode('ascii'))
+            token = a2b_hex(token.encode('ascii'))
         except Exception as ex:  # pylint: disable=broad-except
             raise_from(ValueError('token invalid'), ex)
         # seq (from this client)
@@ -192,17 +244,44 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         #
         for param in ('host', 'vhost', 'passwd'):
             Validation.check_convert_string(locals().get(param))
-        # Only applies until ping response (see start() method)
-        self.set_compression(comp=COMP_NONE)
+        # maximum permissible request size (outgoing only)
+        self.__max_encoded_length = validate_nonnegative_int(max_encoded_length or VALIDATION_MAX_ENCODED_LENGTH,
+                                                             'max_encoded_length', allow_zero=True)
+        # Compression only applies until ping response (see start() method)
+        self.__encoder = MessageEncoder(token, self.__max_encoded_length, comp=COMP_NONE)
+        self.__send_workers = validate_nonnegative_int(send_workers, 'send_workers', allow_zero=True)
+        self.__adaptive_compression = bool(adaptive_compression)
+        self.__encode_pipeline = None
         #
         self.__seqnum_lock = Lock()
         self.__reqpre = self.__rnd_string(6)
         self.__auto_encode_decode = bool(auto_encode_decode)
+        self.__lazy_decode = bool(lazy_decode)
+        self.__time_converter = get_converter(Validation.time_type_check_convert(time_type))
+        self.__feed_cache = FeedCache(feed_cache_budget)
+        self.__send_confirm = bool(send_confirm)
         #
-        self.__amqplink = AmqpLink(host, vhost, prefix, self.__epId, passwd, self.__dispatch_msg, self.__dispatch_ka,
-                                   self.__send_ready_cb, sslca=sslca, socket_timeout=socket_timeout,
+        # Received messages are decoded in parallel & dispatched in order, off the AMQP receiving thread
+        recv_workers = validate_nonnegative_int(recv_workers, 'recv_workers', allow_zero=True)
+        prefetch = validate_nonnegative_int(prefetch, 'prefetch')
+        try:
+            ackpc = float(ackpc)
+        except (TypeError, ValueError) as ex:
+            raise_from(ValueError('ackpc invalid'), ex)
+        if not 0 < ackpc <= 1:
+            raise ValueError('ackpc must be within (0, 1]')
+        self.__decode_pipeline = (DecodePipeline(self.__validate_decode_msg, self.__dispatch_decoded_msg,
+                                                 num_workers=recv_workers)
+                                  if recv_workers else None)
+        self.__amqplink = AmqpLink(host, vhost, prefix, self.__epId, passwd,
+                                   (self.__decode_pipeline.submit if self.__decode_pipeline else self.__dispatch_msg),
+                                   self.__dispatch_ka, self.__send_ready_cb, sslca=sslca, socket_timeout=socket_timeout,
                                    startup_ignore_exc=startup_ignore_exc, conn_retry_delay=conn_retry_delay,
-                                   conn_error_log_threshold=conn_error_log_threshold)
+                                   conn_error_log_threshold=conn_error_log_threshold,
+                                   send_confirm_callback=(self.__send_confirm_cb if self.__send_confirm else None),
+                                   deferred_ack=bool(self.__decode_pipeline), prefetch=prefetch, ackpc=ackpc,
+                                   adaptive_prefetch=adaptive_prefetch,
+                                   recv_lost_callback=(self.__feed_cache.clear if self.__feed_cache else None))
         # seq (from container - initial value used to surpress warning on first message from container)
         self.__cnt_seqnum = -1
         # (Core.Client has not been .start or is .stop)
@@ -211,17 +290,32 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         # Timer used to retry sending of requests which might not have reached the broker (dummy instance set here)
         self.__send_retry_requests_timer = Timer(0, self.__send_retry_requests, args=(0,))
         self.__send_retry_requests_lock = Lock()
-        # maximum permissible request size (outgoing only)
-        self.__max_encoded_length = validate_nonnegative_int(max_encoded_length or VALIDATION_MAX_ENCODED_LENGTH,
-                                                             'max_encoded_length', allow_zero=True)
         # network_retry thread
         self.__network_retry_thread = None
         self.__network_retry_timeout = validate_nonnegative_int(network_retry_timeout, 'network_retry_timeout')
         self.__network_retry_queue_size = validate_nonnegative_int(send_queue_size, 'send_queue_size')
+        self.__network_retry_queue_size_control = self.__network_retry_queue_size_bulk = self.__network_retry_queue_size
+        if send_queue_size_control is not None:
+            self.__network_retry_queue_size_control = validate_nonnegative_int(send_queue_size_control,
+                                                                               'send_queue_size_control')
+        if send_queue_size_bulk is not None:
+            self.__network_retry_queue_size_bulk = validate_nonnegative_int(send_queue_size_bulk,
+                                                                            'send_queue_size_bulk')
         self.__network_retry_queue = None
         self.__network_retry_throttlers = self.__create_throttlers(throttle_conf, self.__end)
+        throttle_reserve = validate_nonnegative_int(throttle_reserve, 'throttle_reserve', allow_zero=True)
+        if throttle_reserve > 99:
+            raise ValueError('throttle_reserve invalid')
+        # feed shares are limited to the non-reserved part of the throttling budget (checked when dequeuing)
+        self.__network_retry_bulk_throttlers = (self.__create_throttlers(throttle_conf, self.__end,
+                                                                         share=(100 - throttle_reserve))
+                                                if throttle_reserve else ())
         # __requests stores all incoming messages {'requestId': event}
         self.__requests = ThreadSafeDict()
+        # send time index of requests (for __send_retry_requests)
+        self.__sent_index = TimeIndex()
+        # network retry deadlines of queued messages (for __expire_requests)
+        self.__deadline_index = TimeIndex()
         #
         # Remember pending subscriptions & control callbacks.  __dispatch_msg will bind them when CREATED.
         self.__pending_subs = ThreadSafeDict()
@@ -240,21 +334,25 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         self.__crud_threadpool = ThreadPool(daemonic=True)
         #
         # Callback threadpool for any callbacks not covered by CRUD thread
-        self.__threadpool = ThreadPool(num_workers=2, daemonic=True)
+        callback_workers = validate_nonnegative_int(callback_workers, 'callback_workers')
+        self.__threadpool = ThreadPool(num_workers=min(2, callback_workers), max_workers=callback_workers,
+                                       daemonic=True)
         #
         # Store container params from request_ping response
         self.__container_params = None
 
     @staticmethod
-    def __create_throttlers(conf, end_event):
+    def __create_throttlers(conf, end_event, share=100):
+        """share - percentage of iterations (per interval) to allow relative to the configuration"""
         conf = Validation.check_convert_string(conf, name='throttle_conf', no_whitespace=True, min_len=0, max_len=128)
         throttlers = []
         try:
             for part in conf.split(','):
                 if part:
                     iterations, interval = part.split('/')
+                    iterations = max(1, int(iterations) * share // 100)
                     # use end_event so that throttling does not delay shutdown
-                    throttlers.append(RateLimiter(int(interval), int(iterations), wait_cmd=end_event.wait))
+                    throttlers.append(RateLimiter(int(interval), iterations, wait_cmd=end_event.wait))
         except (ValueError, TypeError) as ex:
             raise_from(ValueError('throttle_conf invalid'), ex)
         return throttlers
@@ -276,6 +374,25 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         start() this will always be False."""
         return self.__local_meta
 
+    @property
+    def compression_stats(self):
+        """
+        Returns:
+            Statistics of adaptive compression (see AdaptiveCompression.stats) by request resource type (Const.R_*) or
+            None if adaptive compression is not in use. Before calling start() this will always be None.
+        """
+        adaptive = self.__encoder.adaptive
+        return None if adaptive is None else adaptive.stats()
+
+    @property
+    def recv_stats(self):
+        """
+        Returns:
+            Current message prefetch count & acknowledgement threshold and, if adaptive prefetch is enabled, the
+            measurements these are based on. See AmqpLink.recv_stats.
+        """
+        return self.__amqplink.recv_stats
+
     @property
     def container_params(self):
         """
@@ -353,7 +470,8 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         a single argument - a dict with c, the reference to the original request, pointId, the
         id of the point to which the data applies, and samples, a list of dicts containing time
         (the timestamp of the recent data sample), mime and data. If auto_encode_decode is enabled,
-        the data & mime fields might be modified."
+        the data & mime fields might be modified." Callbacks for the same request are run one at a time, in order
+        and before the request completes.
         """
         self.__add_callback(_CB_RECENT_DATA, func)
 
@@ -399,7 +517,8 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         feedid = Validation.guid_check_convert(feedid)
         mime = Validation.mime_check_convert(mime, allow_none=True)
         Validation.datetime_check_convert(time, allow_none=True, to_iso8601=False)
-        self.__simulate_feeddata(feedid, data, mime, datetime.utcnow() if time is None else time)
+        self.__simulate_feeddata(feedid, data, mime, (self.__time_converter.now() if time is None else
+                                                      self.__time_converter.from_datetime(time)))
 
     # Used by both simulate_feeddata() and internally to propagate feed data
     def __simulate_feeddata(self, feedid, data, mime, time):
@@ -409,15 +528,44 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
                'time': time}
 
         # general catch-all
-        have_general = self.__fire_callback(_CB_FEEDDATA, arg)
+        have_general = self.__fire_callback_ordered((_CB_FEEDDATA, feedid), _CB_FEEDDATA, arg)
         # just for this feed
         try:
-            callback = self.__callbacks[_CB_FEED][feedid]
+            queue = self.__callbacks[_CB_FEED][feedid]
         except KeyError:
             if not have_general:
                 logger.info("Received Feed Data for Point GUID '%s' but no callback registered.", feedid)
         else:
-            self.__threadpool.submit(callback, arg)
+            queue.put(arg)
+
+    def feed_cache_recent(self, feedid, count):
+        """
+        Returns:
+            List of the last count samples (oldest first, in the same format as recent data samples) received for the
+            given feed, from the local cache. None if the feed is not cached or fewer than count samples have been
+            cached.
+        """
+        if not self.__feed_cache:
+            return None
+        return self.__feed_cache.get_recent(Validation.guid_check_convert(feedid),
+                                            validate_nonnegative_int(count, 'count'))
+
+    @property
+    def feed_cache_stats(self):
+        """Statistics (dict) of the local cache of received feed data (see FeedCache.stats)"""
+        return self.__feed_cache.stats()
+
+    def feed_callback_stats(self, feedid):
+        """
+        Returns:
+            Statistics (dict) of the callback queue for the given followed feed (see CallbackQueue.stats) or None if no
+            callback has been registered for it.
+        """
+        feedid = Validation.guid_check_convert(feedid)
+        try:
+            return self.__callbacks[_CB_FEED][feedid].stats()
+        except KeyError:
+            return None
 
     # Unlike simulate_feeddata this attempts to decode!
     def __handle_controlreq(self, payload, requestId):
@@ -428,7 +576,8 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
                     'mime': mime})
 
         # general catch-all
-        have_general = self.__fire_callback(_CB_CONTROLREQ, arg)
+        key = (payload[P_ENTITY_LID], payload[P_LID])
+        have_general = self.__fire_callback_ordered((_CB_CONTROLREQ, key), _CB_CONTROLREQ, arg)
         # just for this control
         try:
             callback = self.__callbacks[_CB_CONTROL][payload[P_ENTITY_LID]][payload[P_LID]]
@@ -439,7 +588,7 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
                     payload[P_LID]
                 )
         else:
-            self.__threadpool.submit(callback, arg)
+            self.__threadpool.submit_ordered((_CB_CONTROL, key), callback, arg)
 
     def is_alive(self):
         return not self.__end.is_set()
@@ -457,9 +606,16 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
 
         self.__end.clear()
         try:
-            self.__network_retry_queue = Queue(self.__network_retry_queue_size)
+            self.__network_retry_queue = SendQueue(((self.__network_retry_queue_size_control, ()),
+                                                    (self.__network_retry_queue_size, ()),
+                                                    (self.__network_retry_queue_size_bulk,
+                                                     self.__network_retry_bulk_throttlers)))
+            self.__encode_pipeline = EncodePipeline(self.__encoder, num_workers=self.__send_workers)
+            self.__encode_pipeline.start()
             self.__network_retry_thread = Thread(target=self.__network_retry, name='network')
             self.__network_retry_thread.start()
+            if self.__decode_pipeline:
+                self.__decode_pipeline.start()
             try:
                 self.__amqplink.start()
             except Exception as exc:  # pylint: disable=broad-except
@@ -484,10 +640,7 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
             if self.__default_lang is None:
                 self.__default_lang = payload['lang']
             self.__container_params = payload
-            try:
-                self.set_compression(payload['compression'])
-            except ValueError as ex:
-                raise_from(Exception('Container compression method (%d) unsupported' % payload['compression']), ex)
+            self.__negotiate_compression(payload)
             self.__local_meta = payload['local_meta']
 
             self.__threadpool.start()
@@ -496,6 +649,29 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
             self.stop()
             raise
 
+    def __negotiate_compression(self, payload):
+        """Set up compression based on container parameters (from ping response)"""
+        # zlib preset dictionary, if container has one
+        zdict = payload.get('compression_dict')
+        if zdict:
+            try:
+                self.__encoder.add_compressor(ZlibDict(zdict))
+            except ValueError:
+                logger.warning('Container compression dictionary unusable', exc_info=DEBUG_ENABLED)
+            else:
+                logger.info('Using container compression dictionary (%d bytes)', len(zdict))
+
+        comp = payload['compression']
+        try:
+            self.set_compression(comp, size=(COMP_DICT_SIZE if comp == COMP_ZLIB_DICT else COMP_SIZE))
+        except ValueError as ex:
+            raise_from(Exception('Container compression method (%d) unsupported' % comp), ex)
+
+        if self.__adaptive_compression:
+            methods = [comp]
+            methods.extend(method for method in payload.get('compression_methods', ()) if method not in methods)
+            self.__encoder.set_adaptive(AdaptiveCompression(methods, compressors=self.__encoder.compressors))
+
     @classmethod
     def __qapi_version_check(cls, payload):
         try:
@@ -528,12 +704,15 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         self.__threadpool.stop()
         self.__crud_threadpool.stop()
         self.__amqplink.stop()
+        if self.__decode_pipeline:
+            self.__decode_pipeline.stop()
         self.__network_retry_thread.join()
+        self.__encode_pipeline.stop()
         # Clear out remaining pending requests
         with self.__requests:
             shutdown = LinkShutdownException('Client stopped')
             for req in self.__requests.values():
-                req.exception = shutdown
+                req._exception = shutdown
                 req._set()
                 self.__clear_references(req, remove_request=False)
             if self.__requests:
@@ -542,19 +721,22 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         #
         self.__network_retry_thread = None
         self.__network_retry_queue = None
+        self.__encode_pipeline = None
+        # compression is negotiated again on start()
+        self.__encoder.set_adaptive(None)
+        self.__encoder.set_compression(COMP_NONE)
+        self.__encoder.remove_compressor(COMP_ZLIB_DICT)
         self.__container_params = None
 
     def set_compression(self, comp=COMP_DEFAULT, size=COMP_SIZE):
         """Override compression method (defined by container) and threshold"""
-        if comp not in COMPRESSORS:
-            if comp == COMP_LZ4F:
-                raise ValueError('lz4f compression not available, required lz4framed')
-            raise ValueError('Invalid compression method')
-        if not isinstance(size, int_types) or size < 1:
-            raise ValueError('size must be non-negative integer')
-        self.__comp_default = comp
-        self.__comp_size = size
-        return self.__comp_default, self.__comp_size
+        return self.__encoder.set_compression(comp, size)
+
+    def set_compression_trainer(self, trainer):
+        """Pass a copy of every outgoing request (before compression) to the given Compressors.ZlibDictTrainer, e.g. to
+        build a preset dictionary for the container to announce (via the compression_dict container parameter). Set to
+        None to stop sampling."""
+        self.__encoder.set_trainer(trainer)
 
     def get_seqnum(self):
         return self.__seqnum
@@ -604,18 +786,36 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
             raise LinkShutdownException('Client stopping')
         return ret
 
+    @staticmethod
+    def __lane_for(inner_msg):
+        """
+        Returns:
+            Send queue (priority) lane for the given inner message
+        """
+        resource = inner_msg[M_RESOURCE]
+        action = inner_msg[M_ACTION]
+        if resource == R_PING or (action and action[-1] == 'confirm' and resource in (R_FEED, R_CONTROL)):
+            return LANE_CONTROL
+        if resource == R_FEED and action and action[-1] == 'share':
+            return LANE_BULK
+        return LANE_DEFAULT
+
     # don't block shutdown on full send queue. returns True if did enqueue, False if shutting down
     def __retry_enqueue(self, msg):
         end_wait = self.__end.wait
         queue_put_nowait = self.__network_retry_queue.put_nowait
+        lane = self.__lane_for(msg.inner_msg)
         while True:
             # don't block shutdown on full send queue
             try:
-                queue_put_nowait(msg)
+                queue_put_nowait(msg, lane)
             except Full:
                 if end_wait(.2):
                     return False
             else:
+                if self.__network_retry_timeout:
+                    # only enqueue time kept (not message itself) since entries can outlive the request
+                    self.__deadline_index.push(msg.time + self.__network_retry_timeout, msg.requestId, msg.time)
                 return True
 
     def __send_ready_cb(self, last_send_failure_time):
@@ -623,7 +823,8 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         logger.debug('Readiness notification (last failed=%s)', last_send_failure_time)
         # It is possible for multiple timers to be scheduled (if multiple transport failures happen in a fairly short
         # amount of time. See logic for __send_retry_requests
-        if last_send_failure_time is not None:
+        # With publisher confirms, unconfirmed requests will already have been re-sent via __send_confirm_cb
+        if last_send_failure_time is not None and not self.__send_confirm:
             self.__send_retry_requests_timer.cancel()
             # allow 10s for responses to come in before attempting to resend
             self.__send_retry_requests_timer = Timer(10, self.__send_retry_requests, args=(last_send_failure_time,))
@@ -635,30 +836,74 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
            for sent messages."""
         # make sure multiple failures having set multiple times do not run concurrently
         with self.__send_retry_requests_lock:
-            with self.__requests:
-                # produce list instead of generator as requests mapping can change during subsequent loop
-                retry_reqs = [req for req in self.__requests.values()
-                              if req._sent_without_response(last_send_failure_time)]
+            # oldest first, without having to scan all requests
+            retry_reqs = deque(self.__sent_index.pop_before(last_send_failure_time, self.__sent_without_response))
 
             retry_req_count = 0
-            # don't continue if another network failure has occured (which will trigger this function again)
-            while retry_reqs and self.__amqplink.last_send_exc_time <= last_send_failure_time:
-                req = retry_reqs.pop()
-                # lock individuallly so incoming request handling does not 'pause' for too long
-                with self.__requests:
-                    # might have received a response (or finished since)
-                    if not (req.id_ in self.__requests and req._sent_without_response(last_send_failure_time)):
-                        logger.debug('Not resending request %s (finished or has received response)', req.id_)
-                        continue
-                logger.debug('Resending request %s', req.id_)
-                if not self.__retry_enqueue(PreparedMessage(req._inner_msg_out, req.id_)):
-                    # client shutdown
-                    break
-                retry_req_count += 1
+            try:
+                # don't continue if another network failure has occured (which will trigger this function again)
+                while retry_reqs and self.__amqplink.last_send_exc_time <= last_send_failure_time:
+                    req = self.__requests.get(retry_reqs.popleft()[1])
+                    # lock individuallly so incoming request handling does not 'pause' for too long
+                    with self.__requests:
+                        # might have received a response (or finished since)
+                        if not (req and req.id_ in self.__requests and
+                                req._sent_without_response(last_send_failure_time)):
+                            logger.debug('Not resending request (finished or has received response)')
+                            continue
+                    logger.debug('Resending request %s', req.id_)
+                    if not self.__retry_enqueue(PreparedMessage(req._inner_msg_out, req.id_)):
+                        # client shutdown
+                        break
+                    retry_req_count += 1
+            finally:
+                # remaining requests are to be considered again on next failure
+                for send_time, requestId, _ in retry_reqs:
+                    self.__sent_index.push(send_time, requestId)
 
         if retry_req_count:
             logger.debug('Resending of %d request(s) complete (before %s)', retry_req_count, last_send_failure_time)
 
+    def __sent_without_response(self, send_time, requestId, _):
+        """Validation function for __sent_index entries"""
+        req = self.__requests.get(requestId)
+        # a later entry exists if the send time has changed
+        return req is not None and req._send_time == send_time and not req._messages
+
+    def __expire_requests(self):
+        """Finish requests which have not been sent (whilst queued) within network_retry_timeout"""
+        for _, requestId, _ in self.__deadline_index.pop_before(monotonic(), self.__not_sent_since):
+            logger.warning("requestId '%s' timeout after %i", requestId, self.__network_retry_timeout)
+            # note: previously set exception is preserved
+            self.__request_except(requestId, None)
+
+    def __not_sent_since(self, _, requestId, enqueue_time):
+        """Validation function for __deadline_index entries"""
+        req = self.__requests.get(requestId)
+        return req is not None and (req._send_time is None or req._send_time < enqueue_time)
+
+    def __send_confirm_cb(self, requestIds, delivered):
+        """Callback from AmqpLink with publisher confirm results. (Only ever comes from a single thread.)"""
+        if delivered:
+            if DEBUG_ENABLED:
+                logger.debug('Broker confirmed %d request(s)', len(requestIds))
+            return
+        with self.__requests:
+            # a response might have been received already (or request might have finished)
+            retry_reqs = [self.__requests[requestId] for requestId in requestIds
+                          if requestId in self.__requests and not self.__requests[requestId]._messages]
+        if retry_reqs:
+            logger.debug('Resending %d unconfirmed request(s)', len(retry_reqs))
+            # enqueue in separate thread since send queue might be full and blocking here would stop AmqpLink from
+            # processing confirmations
+            Thread(target=self.__resend, args=(retry_reqs,), name='resend').start()
+
+    def __resend(self, reqs):
+        for req in reqs:
+            if self.__end.is_set() or not self.__retry_enqueue(PreparedMessage(req._inner_msg_out, req.id_)):
+                # client shutdown
+                break
+
     def request_ping(self):
         logger.debug("request_ping")
         return self._request(R_PING, C_LIST)
@@ -924,37 +1169,64 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
                              None,
                              offset=offset, limit=limit)
 
-    def request_sub_create(self, lid, foc, gpid, callback=None):
+    def request_sub_create(self, lid, foc, gpid, callback=None, queue_size=0, queue_policy=QueuePolicy.BLOCK,
+                           cache_size=0):
+        """`queue_size` - Maximum number of feed data messages to hold for the callback whilst it is busy (zero for
+                         unlimited)
+
+        `queue_policy` - (QueuePolicy) What to do with further feed data once queue_size has been reached
+
+        `cache_size` - Number of most recently received samples to keep locally for the feed (see feed_cache_recent).
+                       Only applies if feed_cache_budget is non-zero. The cache is per feed rather than per
+                       subscription so the largest size requested for a feed applies.
+        """
         Validation.foc_check(foc)
         lid = Validation.lid_check_convert(lid)
         Validation.guid_check_convert(gpid)
-        if foc == R_FEED:
-            Validation.callable_check(callback, allow_none=True)
-        elif callback is not None:
-            raise ValueError('Subscription for control cannot have callback')
+        pending = self.__sub_pending(foc, callback, queue_size, queue_policy, cache_size)
         logger.debug("request_sub_create foc=%i lid='%s' gpid=%s", foc, lid, gpid)
         evt = self._request(R_SUB, C_CREATE, (lid, gpid), is_crud=True)
-        if callback:
+        if pending:
             with self.__pending_subs:
-                self.__pending_subs[evt.id_] = callback
+                self.__pending_subs[evt.id_] = pending
         return evt
 
-    def request_sub_create_local(self, slid, foc, lid, pid, callback=None):
+    def request_sub_create_local(self, slid, foc, lid, pid, callback=None, queue_size=0,
+                                 queue_policy=QueuePolicy.BLOCK, cache_size=0):
+        """See request_sub_create for `queue_size`, `queue_policy` & `cache_size`"""
         slid = Validation.lid_check_convert(slid)
         Validation.foc_check(foc)
         lid = Validation.lid_check_convert(lid)
         pid = Validation.pid_check_convert(pid)
-        if foc == R_FEED:
-            Validation.callable_check(callback, allow_none=True)
-        elif callback is not None:
-            raise ValueError('Subscription for control cannot have callback')
+        pending = self.__sub_pending(foc, callback, queue_size, queue_policy, cache_size)
         logger.debug("request_sub_create_local slid=%s foc=%i lid='%s' pid='%s'", slid, foc, lid, pid)
         evt = self._request(R_SUB, C_CREATE, (slid, lid, pid, foc), is_crud=True)
-        if callback:
+        if pending:
             with self.__pending_subs:
-                self.__pending_subs[evt.id_] = callback
+                self.__pending_subs[evt.id_] = pending
         return evt
 
+    def __sub_pending(self, foc, callback, queue_size, queue_policy, cache_size):
+        """
+        Returns:
+            Tuple of CallbackQueue for feed subscription callback (or None if no callback specified) & cache size to
+            apply once the subscription has been created. None if neither applies.
+        """
+        if foc == R_FEED:
+            Validation.callable_check(callback, allow_none=True)
+        elif callback is not None:
+            raise ValueError('Subscription for control cannot have callback')
+        elif cache_size:
+            raise ValueError('Subscription for control cannot be cached')
+        queue_policy = Validation.queue_policy_check_convert(queue_policy)
+        queue_size = validate_nonnegative_int(queue_size, 'queue_size', allow_zero=True)
+        cache_size = validate_nonnegative_int(cache_size, 'cache_size', allow_zero=True)
+        if callback is None:
+            return (None, cache_size) if cache_size else None
+        return (CallbackQueue(callback, self.__threadpool.submit, maxsize=queue_size, policy=queue_policy,
+                              abort=self.__end),
+                cache_size)
+
     def __point_data_to_bytes(self, data, mime=None):  # pylint: disable=too-many-branches
         """
         Returns:
@@ -988,23 +1260,16 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
             raise ValueError('invalid mime type %s' % mime)
 
     def __bytes_to_share_data(self, payload):
-        """Attempt to auto-decode data"""
+        """Attempt to auto-decode data (or defer decoding, if lazy_decode is enabled)"""
         rbytes = payload[P_DATA]
         mime = payload[P_MIME]
 
-        if mime is None or not self.__auto_encode_decode:
-            return rbytes, mime
-        mime = expand_idx_mimetype(mime).lower()
-        try:
-            if mime == 'application/ubjson':
-                return ubjloadb(rbytes), None
-            elif mime == 'text/plain; charset=utf8':
-                return rbytes.decode('utf-8'), None
-            else:
-                return rbytes, mime
-        except:
-            logger.warning('auto-decode failed, returning bytes', exc_info=DEBUG_ENABLED)
+        if not self.__auto_encode_decode:
             return rbytes, mime
+        if self.__lazy_decode:
+            # mime describes the (not yet decoded) data, so is available via the LazyPayload only
+            return LazyPayload(rbytes, mime), None
+        return decode_share_data(rbytes, mime)
 
     def request_point_share(self, lid, pid, data, mime=None, time=None):
         logger.debug("request_point_share lid='%s' pid='%s'", lid, pid)
@@ -1108,25 +1373,6 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
             self.__reqpre = self.__rnd_string(6)
         return requestId
 
-    # used by __make_hash
-    __byte_packer = Struct(b'>Q').pack
-
-    @classmethod
-    def __make_hash(cls, innermsg, token, seqnum):
-        """return the hash for this innermsg, token, seqnum
-        return digest bytes
-        """
-        hobj = hmacNew(token, digestmod=hashfunc)
-        hobj.update(innermsg)
-        hobj.update(cls.__byte_packer(seqnum))
-        return hobj.digest()
-
-    def __check_hash(self, message):
-        """return true/false if hash is good
-        message = dict
-        """
-        return message[W_HASH] == self.__make_hash(message[W_MESSAGE], self.__token, message[W_SEQ])
-
     @staticmethod
     def __make_innermsg(resource, rtype, ref, action=None, payload=None, limit=None):
         """return innermsg chunk (dict)
@@ -1156,7 +1402,7 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
             logger.error('Unknown request %s - cannot set exception', requestId)
         else:
             if exc is not None:
-                req.exception = exc
+                req._exception = exc
             if set_and_forget:
                 req._set()
 
@@ -1169,117 +1415,118 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
                 # request might have had a response already have been removed by receiving thread
                 pass
             else:
-                req.exception = None
-                req._send_time = monotonic()
-
-    def __publish(self, qmsg):
-        """
-        Returns:
-            True unless sending failed (at which point an exception will have been set in the request)
-        """
+                req._exception = None
+                req._send_time = send_time = monotonic()
+                if not self.__send_confirm:
+                    self.__sent_index.push(send_time, requestId)
+        # drop obsolete entries once they dominate (e.g. if there are no transport failures for a long time)
+        if len(self.__sent_index) > max(1024, 2 * len(self.__requests)):
+            self.__sent_index.compact(self.__sent_without_response)
+        if len(self.__deadline_index) > max(1024, 2 * len(self.__requests)):
+            self.__deadline_index.compact(self.__not_sent_since)
+
+    def __next_seqnum(self):
         with self.__seqnum_lock:
             seqnum = self.__seqnum
             self.__seqnum = (self.__seqnum + 1) % _SEQ_WRAP_SIZE
-        #
-        innermsg = ubjdumpb(qmsg.inner_msg)
-        clevel = COMP_NONE
-        if len(innermsg) >= self.__comp_size:
-            logger.debug('Compressing payload')
-            try:
-                innermsg = COMPRESSORS[self.__comp_default].compress(innermsg)
-            except KeyError:
-                logger.warning('Unknown compression method %s, not compressing', self.__comp_default)
-            else:
-                clevel = self.__comp_default
-
-        p = {W_SEQ: seqnum,
-             W_MESSAGE: innermsg,
-             W_HASH: self.__make_hash(innermsg, self.__token, seqnum),
-             W_COMPRESSION: clevel}
-        msg = ubjdumpb(p)
-
-        # do not send messages exceeding size limit
-        if len(msg) > self.__max_encoded_length:
-            self.__request_except(qmsg.requestId, ValueError("Message Payload too large %d > %d"
-                                                             % (len(msg), self.__max_encoded_length)))
-            return False
+        return seqnum
 
-        self.__amqplink.send(msg, content_type='application/ubjson')
+    def __publish(self, encoded):
+        """Send previously encoded request (EncodedMessage instance). Raises LinkException on failure."""
+        self.__amqplink.send(encoded.msg, content_type='application/ubjson', ref=encoded.qmsg.requestId)
         if DEBUG_ENABLED:
-            p[W_MESSAGE] = qmsg.inner_msg
-            logger.debug(decode_sent_msg('decode_sent_msg', p))
+            wrapper = encoded.wrapper.copy()
+            wrapper[W_MESSAGE] = encoded.qmsg.inner_msg
+            logger.debug(decode_sent_msg('decode_sent_msg', wrapper))
         # Callback any debuggers
-        self.__fire_callback(_CB_DEBUG_SEND, msg)
-        #
-        return True
+        self.__fire_callback(_CB_DEBUG_SEND, encoded.msg)
+
+    def __fill_pipeline(self):
+        """Move requests from the send queue to the encode pipeline (assigning sequence numbers in order) until either
+        the pipeline is full or the queue is empty. Only waits for new requests if the pipeline is empty."""
+        pipeline = self.__encode_pipeline
+        queue_get = self.__network_retry_queue.get
+        queue_get_nowait = self.__network_retry_queue.get_nowait
+
+        while not pipeline.full:
+            try:
+                qmsg = queue_get_nowait() if pipeline else queue_get(timeout=0.2)
+            except Empty:
+                return
+            pipeline.submit(qmsg, self.__next_seqnum())
 
     @profiled_thread  # noqa (complexity)
     def __network_retry(self):  # pylint: disable=too-many-branches
-        queue_get = self.__network_retry_queue.get
-        queue_task_done = self.__network_retry_queue.task_done
+        pipeline = self.__encode_pipeline
         retry_timeout = self.__network_retry_timeout
         end_is_set = self.__end.is_set
-        qmsg = None
+        end_wait = self.__end.wait
+        throttlers = self.__network_retry_throttlers
+        # last request for which throttling delay was logged
+        throttled = None
 
         while not end_is_set():
-            # retrieve next message
-            if qmsg is None:
-                try:
-                    qmsg = queue_get(timeout=0.2)
-                except Empty:
-                    continue
-                requestId = qmsg.requestId
-            else:
-                # wait before retrying previously failed request
-                if retry_timeout:
-                    if self.__end.wait(0.5):
-                        # shutting down
-                        break
+            if retry_timeout:
+                self.__expire_requests()
+            self.__fill_pipeline()
+            # requests are always published in the order their sequence numbers were assigned
+            encoded = pipeline.head()
+            if not (encoded and encoded.ready(0.2)):
+                continue
+            requestId = encoded.qmsg.requestId
 
-            if retry_timeout and qmsg.time < (monotonic() - retry_timeout):
+            if requestId not in self.__requests:
+                # e.g. expired (see __expire_requests) or response received for previous attempt
+                logger.debug("Not sending finished request '%s'", requestId)
+            elif retry_timeout and encoded.qmsg.time < (monotonic() - retry_timeout):
                 logger.warning("requestId '%s' timeout after %i", requestId, retry_timeout)
                 # note: previously set exception is preserved
                 self.__request_except(requestId, None)
+            elif encoded.exception:
+                # e.g. encoded message exceeds size limit
+                self.__request_except(requestId, encoded.exception)
             else:
-                if self.__send_throttle():
-                    # end event (shutdown) set during throttling
-                    break
+                delay = try_acquire_all(throttlers)
+                if delay:
+                    # not allowed to send yet - keep the pipeline topped up (and check for shutdown) whilst waiting
+                    if delay > 1 and throttled is not encoded:
+                        logger.warning('Send throttling delay: %.2fs', delay)
+                    throttled = encoded
+                    end_wait(min(delay, 0.2))
+                    continue
                 try:
-                    published = self.__publish(qmsg)
+                    self.__publish(encoded)
                 except LinkException as exc:
                     logger.debug("Failed to send '%s'", requestId)
                     if retry_timeout:
                         self.__request_except(requestId, exc, set_and_forget=False)
-                        # request will be retried (assuming timeout is not reached after delay)
+                        # wait before retrying previously failed request
+                        if end_wait(0.5):
+                            # shutting down
+                            break
+                        # request will be retried (assuming timeout is not reached after delay). Re-encode it and any
+                        # requests queued behind it so that sequence numbers remain in publishing order.
+                        pipeline.resubmit(self.__next_seqnum)
                         continue
                     self.__request_except(requestId, exc)
                 else:
-                    # if not published, an exception will have been set on the request already
-                    if published:
-                        logger.debug("Sent request '%s'", requestId)
-                        self.__request_mark_sent(requestId)
+                    logger.debug("Sent request '%s'", requestId)
+                    self.__request_mark_sent(requestId)
 
-            queue_task_done()
-            qmsg = None
-
-    def __send_throttle(self):
-        """
-        Returns:
-            True if end event was set during throttling-wait
-        """
-        for throttler in self.__network_retry_throttlers:
-            if throttler.throttle():
-                # end event was set
-                return True
-        return False
+            pipeline.pop()
 
     def __fire_callback(self, type_, *args, **kwargs):
         """
         Returns:
             True if at least one callback was called
         """
+        return self.__fire_callback_ordered(None, type_, *args, **kwargs)
+
+    def __fire_callback_ordered(self, key, type_, *args, **kwargs):
+        """As __fire_callback but non-CRUD callbacks submitted with the same key (unless None) are run one at a time,
+        in order."""
         called = False
-        plain_submit = self.__threadpool.submit
+        plain_submit = partial(self.__threadpool.submit_ordered, key)
         with self.__callbacks:
             submit = self.__crud_threadpool.submit if type_ in _CB_CRUD_TYPES else plain_submit
             for func, serialised_if_crud in self.__callbacks[type_]:
@@ -1319,65 +1566,61 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
                 isinstance(body[M_PAYLOAD], cls.__msg_body_payload_types))
 
     def __validate_decode_msg(self, message):  # noqa (complexity) pylint: disable=too-many-return-statements,too-many-branches
-        """Decodes wrapper, check hash & seq, decodes body.
+        """Decodes wrapper, check hash, decodes body. Does not depend on previously received messages and so can be
+        called for multiple messages in parallel.
 
         Returns:
-            Body or None, if validation / unpack failed
+            Tuple of body (or None, if validation / unpack failed) and seqnum (or None, if wrapper invalid)
         """
         try:
             if not _CONTENT_TYPE_PATTERN.match(message.content_type):
                 logger.debug('Message with unexpected content type %s from container, ignoring', message.content_type)
-                return None
+                return None, None
         except AttributeError:
             logger.debug('Message without content type from container, ignoring')
-            return None
+            return None, None
 
         # Decode & check message wrapper
         try:
             body = ubjloadb(message.body)
         except:
             logger.warning('Failed to decode message wrapper, ignoring', exc_info=DEBUG_ENABLED)
-            return None
+            return None, None
         if not self.__valid_msg_wrapper(body):
             logger.warning('Invalid message wrapper, ignoring')
-            return None
-
-        # currently only warn although maybe this should be an error
-        if self.__cnt_seqnum != -1 and not self.__valid_seqnum(body[W_SEQ], self.__cnt_seqnum):
-            logger.warning('Unexpected seqnum from container: %d (last seen: %d)', body[W_SEQ],
-                           self.__cnt_seqnum)
-        self.__cnt_seqnum = body[W_SEQ]
+            return None, None
+        seqnum = body[W_SEQ]
 
         # Check message hash
-        if not self.__check_hash(body):
+        if not self.__encoder.check_hash(body):
             logger.warning('Message has invalid hash, ignoring')
-            return None
+            return None, seqnum
 
         # Decompress inner message
         try:
-            msg = COMPRESSORS[body[W_COMPRESSION]].decompress(body[W_MESSAGE])
+            msg = self.__encoder.compressors[body[W_COMPRESSION]].decompress(body[W_MESSAGE])
         except KeyError:
             logger.warning('Received message with unknown compression: %s', body[W_COMPRESSION])
-            return None
+            return None, seqnum
         except OversizeException as ex:
             logger.warning('Uncompressed message exceeds %d bytes, ignoring', ex.size, exc_info=DEBUG_ENABLED)
-            return None
+            return None, seqnum
         except:
             logger.warning('Decompression failed, ignoring message', exc_info=DEBUG_ENABLED)
-            return None
+            return None, seqnum
 
         # Decode inner message
         try:
             msg = ubjloadb(msg, object_pairs_hook=OrderedDict)
         except:
             logger.warning('Failed to decode message, ignoring', exc_info=DEBUG_ENABLED)
-            return None
+            return None, seqnum
 
         if self.__valid_msg_body(msg):
-            return (msg, body[W_SEQ])
+            return msg, seqnum
         else:
             logger.warning('Message with invalid body, ignoring: %s', msg)
-            return None
+            return None, seqnum
 
     def __dispatch_msg(self, message):
         """Verify the signature and update RequestEvents / perform callbacks
@@ -1385,10 +1628,18 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         Note messages with an invalid wrapper, invalid hash, invalid sequence number or unexpected clientRef
         will be sent to debug_bad callback.
         """
-        msg = self.__validate_decode_msg(message)
-        if msg:
-            msg, seqnum = msg
-        else:
+        self.__dispatch_decoded_msg(message, self.__validate_decode_msg(message))
+
+    def __dispatch_decoded_msg(self, message, decoded):
+        """As __dispatch_msg but for an already decoded message (see __validate_decode_msg). Must be called in the
+        order messages were received."""
+        msg, seqnum = decoded or (None, None)
+        if seqnum is not None:
+            # currently only warn although maybe this should be an error
+            if self.__cnt_seqnum != -1 and not self.__valid_seqnum(seqnum, self.__cnt_seqnum):
+                logger.warning('Unexpected seqnum from container: %d (last seen: %d)', seqnum, self.__cnt_seqnum)
+            self.__cnt_seqnum = seqnum
+        if msg is None:
             self.__fire_callback(_CB_DEBUG_BAD, message.body, message.content_type)
             return
 
@@ -1453,6 +1704,9 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
             # Serialise completion of CRUD requests (together with CREATED, DELETED, etc. messages)
             if req.is_crud:
                 self.__crud_threadpool.submit(req._set)
+            # Only complete once all recent data callbacks (which use the request id as ordering key) have run
+            elif any(rsp[M_TYPE] == E_RECENTDATA for rsp in req._messages):
+                self.__threadpool.submit_ordered(req.id_, req._set)
             else:
                 req._set()
 
@@ -1482,9 +1736,11 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
                 # Add callback for feeddata
                 with self.__pending_subs:
                     if msg[M_CLIENTREF] in self.__pending_subs:
-                        callback = self.__pending_subs.pop(msg[M_CLIENTREF])
+                        queue, cache_size = self.__pending_subs.pop(msg[M_CLIENTREF])
                         if payload[P_POINT_TYPE] == R_FEED:
-                            self.__callbacks[_CB_FEED][payload[P_POINT_ID]] = callback
+                            if queue:
+                                self.__callbacks[_CB_FEED][payload[P_POINT_ID]] = queue
+                            self.__feed_cache.enable(payload[P_POINT_ID], cache_size, subid=payload[P_ID])
                         else:
                             logger.warning('Subscription intended to feed is actually control: %s', payload[P_POINT_ID])
 
@@ -1501,8 +1757,8 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
             for sample in payload[P_SAMPLES]:
                 data, mime, time = self.__decode_data_time(sample)
                 samples.append({'data': data, 'mime': mime, 'time': time})
-            self.__fire_callback(_CB_RECENT_DATA, {'c': msg[M_CLIENTREF],
-                                                   'samples': samples})
+            self.__fire_callback_ordered(msg[M_CLIENTREF], _CB_RECENT_DATA, {'c': msg[M_CLIENTREF],
+                                                                             'samples': samples})
 
     def __handle_low_seq_resend(self, msg, req):
         """special error case - low sequence number (update sequence number & resend if applicable).
@@ -1518,8 +1774,6 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
             return True
         return False
 
-    __share_time_fmt = '%Y-%m-%dT%H:%M:%S.%fZ'
-
     def __decode_data_time(self, payload):
         """Extract time and decode payload (based on mime type) from payload. Applies to E_FEEDDATA and E_RECENTDATA.
 
@@ -1528,11 +1782,11 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
         """
         data, mime = self.__bytes_to_share_data(payload)
         try:
-            time = datetime.strptime(payload.get(P_TIME), self.__share_time_fmt)
+            time = self.__time_converter.parse(payload.get(P_TIME))
         except (ValueError, TypeError):
-            logger.warning('Share payload from container has invalid timestamp (%s), will use naive local time',
+            logger.warning('Share payload from container has invalid timestamp (%s), will use current time',
                            payload.get(P_TIME))
-            time = datetime.utcnow()
+            time = self.__time_converter.now()
         return data, mime, time
 
     def __perform_unsolicited_callbacks(self, msg):
@@ -1542,11 +1796,17 @@ class Client(object):  # pylint: disable=too-many-instance-attributes,too-many-p
 
         # callbacks for responses which might be unsolicited (e.g. created or deleted)
         if type_ in _RSP_PAYLOAD_CB_MAPPING:
+            # cached samples of unfollowed feed no longer updated
+            if type_ == E_DELETED and payload[P_RESOURCE] == R_SUB and self.__feed_cache:
+                self.__feed_cache.remove_sub(payload[P_ID])
             self.__fire_callback(_RSP_PAYLOAD_CB_MAPPING[type_], msg)
 
         # Perform callbacks for feed data
         elif type_ == E_FEEDDATA:
-            self.__simulate_feeddata(payload[P_FEED_ID], *self.__decode_data_time(payload))
+            data, mime, time = self.__decode_data_time(payload)
+            if self.__feed_cache:
+                self.__feed_cache.add(payload[P_FEED_ID], data, mime, time, len(payload[P_DATA]))
+            self.__simulate_feeddata(payload[P_FEED_ID], data, mime, time)
 
         # Perform callbacks for unsolicited subscriber message
         elif type_ == E_SUBSCRIBED:
@@ -12,16 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from __future__ import unicode_literals
+from __future__ import division, unicode_literals
 
 from warnings import warn
 from functools import partial
+from collections import deque, Counter
 from abc import ABCMeta, abstractmethod
 from io import BytesIO
 from zlib import (compressobj as _zlib_compressobj, decompressobj as _zlib_decompressobj, DEFLATED as _zlib_DEFLATED,
                   Z_FINISH as _zlib_Z_FINISH)
 
-from .Const import COMP_NONE, COMP_ZLIB, COMP_LZ4F
+from .Const import COMP_NONE, COMP_ZLIB, COMP_LZ4F, COMP_ZLIB_DICT
+from .compat import Lock, monotonic
 
 
 def __dummy(*args, **kwargs):  # pylint: disable=unused-argument
@@ -40,6 +42,10 @@ else:
 # Default maximum length to allow when decompressing before raising OversizeException
 DEFAULT_MAX_SIZE = 1024 * 1024
 
+# Preset dictionary sizes (zlib can only make use of up to window size)
+ZLIB_DICT_MAX_SIZE = 32 * 1024
+ZLIB_DICT_DEFAULT_SIZE = 4 * 1024
+
 
 class OversizeException(Exception):
     """Raised when the decompressed result exceeds the associated size restriction"""
@@ -98,6 +104,31 @@ else:
     _zlib_decompressobj = partial(_zlib_decompressobj, wbits=15)  # pylint: disable=invalid-name
 
 
+try:
+    _zlib_compressobj(zdict=b'test')
+except TypeError:
+    # Python < 3.3
+    ZLIB_DICT_AVAILABLE = False
+else:
+    ZLIB_DICT_AVAILABLE = True
+
+
+def _zlib_compress(compressor, data):
+    out = BytesIO()
+    out.write(compressor.compress(data))
+    out.write(compressor.flush(_zlib_Z_FINISH))
+    return out.getvalue()
+
+
+def _zlib_decompress(decompressor, data, max_size):
+    out = BytesIO()
+    out.write(decompressor.decompress(data, max_size + 1024))
+    if out.tell() > max_size:
+        raise OversizeException(max_size)
+    out.write(decompressor.flush())
+    return out.getvalue()
+
+
 class Zlib(Compressor):
 
     @staticmethod
@@ -106,22 +137,39 @@ class Zlib(Compressor):
 
     @staticmethod
     def compress(data):
-        out = BytesIO()
         # using obj so can specify params (via functools.partial)
-        compressor = _zlib_compressobj()
-        out.write(compressor.compress(data))
-        out.write(compressor.flush(_zlib_Z_FINISH))
-        return out.getvalue()
+        return _zlib_compress(_zlib_compressobj(), data)
 
     @staticmethod
     def decompress(data, max_size=DEFAULT_MAX_SIZE):
-        out = BytesIO()
-        decompressor = _zlib_decompressobj()
-        out.write(decompressor.decompress(data, max_size + 1024))
-        if out.tell() > max_size:
-            raise OversizeException(max_size)
-        out.write(decompressor.flush())
-        return out.getvalue()
+        return _zlib_decompress(_zlib_decompressobj(), data, max_size)
+
+
+class ZlibDict(Compressor):
+    """zlib using a preset dictionary (see build_zlib_dict). Since the dictionary has to match the one in use by the
+    container, this class has to be instantiated rather than being used via COMPRESSORS. NOTE: Check
+    ZLIB_DICT_AVAILABLE to make sure the zlib module supports preset dictionaries."""
+
+    def __init__(self, zdict):
+        if not ZLIB_DICT_AVAILABLE:
+            raise ValueError('zlib preset dictionaries not supported (requires Python 3.3+)')
+        if not (isinstance(zdict, bytes) and 0 < len(zdict) <= ZLIB_DICT_MAX_SIZE):
+            raise ValueError('zdict should be non-empty bytes of at most %d bytes' % ZLIB_DICT_MAX_SIZE)
+        self.__zdict = zdict
+
+    @staticmethod
+    def method():
+        return COMP_ZLIB_DICT
+
+    @property
+    def zdict(self):
+        return self.__zdict
+
+    def compress(self, data):  # pylint: disable=arguments-differ
+        return _zlib_compress(_zlib_compressobj(zdict=self.__zdict), data)
+
+    def decompress(self, data, max_size=DEFAULT_MAX_SIZE):  # pylint: disable=arguments-differ
+        return _zlib_decompress(_zlib_decompressobj(zdict=self.__zdict), data, max_size)
 
 
 class Lz4f(Compressor):
@@ -147,3 +195,304 @@ class Lz4f(Compressor):
 
 # pylint: disable=superfluous-parens
 COMPRESSORS = {c.method(): c for c in ((Noop, Zlib, Lz4f) if LZ4F_AVAILABLE else (Noop, Zlib))}
+
+
+class _MethodStats(object):
+    """Running statistics for one compression method (and message class). NOT thread safe."""
+
+    __slots__ = ('count', 'bytes_in', 'bytes_out', 'time', 'ratio', 'rate')
+
+    def __init__(self):
+        self.count = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.time = 0.0
+        # exponentially weighted moving averages of compressed/uncompressed size & seconds per byte
+        self.ratio = None
+        self.rate = None
+
+    def update(self, size_in, size_out, duration, alpha):
+        self.count += 1
+        self.bytes_in += size_in
+        self.bytes_out += size_out
+        self.time += duration
+        ratio = size_out / size_in
+        rate = duration / size_in
+        if self.ratio is None:
+            self.ratio = ratio
+            self.rate = rate
+        else:
+            self.ratio += alpha * (ratio - self.ratio)
+            self.rate += alpha * (rate - self.rate)
+
+    def as_dict(self):
+        return {'count': self.count,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'time': self.time,
+                'ratio': self.ratio,
+                'rate': self.rate}
+
+
+class AdaptiveCompression(object):
+    """Chooses a compression method (or none at all) per message class, based on recently observed compression ratios
+    and times. Every method is tried for a few messages of each class first and then, periodically, again so that the
+    observed values stay current. Threadsafe."""
+
+    def __init__(self, methods, min_saving=0.1, speed_tolerance=0.05, sample_interval=32, alpha=0.2,
+                 compressors=None):
+        """
+        `methods` - (sequence) compression methods (Const.COMP_*) to choose from. Unavailable methods are ignored.
+
+        `min_saving` - (float) fraction of size a method has to save on average to be used at all
+
+        `speed_tolerance` - (float) methods whose average saving is within this (fraction) of the best one are
+                            considered equal in which case the fastest is chosen
+
+        `sample_interval` - (int) every Nth message of a class is compressed with the least sampled method
+
+        `alpha` - (float) smoothing factor (0-1) for moving averages. Higher values favour recent messages.
+
+        `compressors` - (mapping) method to Compressor to use instead of COMPRESSORS
+        """
+        self.__compressors = COMPRESSORS if compressors is None else compressors
+        self.__methods = tuple(method for method in methods if method in self.__compressors and method != COMP_NONE)
+        if not 0 <= min_saving < 1:
+            raise ValueError('min_saving invalid')
+        if not 0 <= speed_tolerance < 1:
+            raise ValueError('speed_tolerance invalid')
+        if not 0 < alpha <= 1:
+            raise ValueError('alpha invalid')
+        if sample_interval < 1:
+            raise ValueError('sample_interval invalid')
+        self.__min_saving = min_saving
+        self.__speed_tolerance = speed_tolerance
+        self.__sample_interval = sample_interval
+        self.__alpha = alpha
+        # message class -> {method -> _MethodStats}
+        self.__stats = {}
+        # message class -> number of messages seen
+        self.__seen = {}
+        # message class -> (method, or None if not compressing)
+        self.__choice = {}
+        self.__lock = Lock()
+
+    @property
+    def methods(self):
+        """Compression methods to choose from"""
+        return self.__methods
+
+    def stats(self):
+        """
+        Returns:
+            Dict of message class to dict of method to statistics. Statistics are: count (number of messages), bytes_in
+            (total uncompressed), bytes_out (total compressed), time (total seconds spent compressing), ratio (moving
+            average of compressed/uncompressed size), rate (moving average of seconds per uncompressed byte). Also
+            contains the currently chosen method (or None if not compressing) under the 'chosen' key.
+        """
+        with self.__lock:
+            return {msg_class: dict({method: stats.as_dict() for method, stats in methods.items()},
+                                    chosen=self.__choice.get(msg_class))
+                    for msg_class, methods in self.__stats.items()}
+
+    def compress(self, msg_class, data):
+        """Compress data using the method deemed most suitable for the given class of message.
+
+        Returns:
+            Tuple of method used and (possibly) compressed data
+        """
+        if not self.__methods:
+            return COMP_NONE, data
+        method = self.__select(msg_class)
+        if method is None:
+            return COMP_NONE, data
+
+        start = monotonic()
+        compressed = self.__compressors[method].compress(data)
+        duration = monotonic() - start
+
+        with self.__lock:
+            self.__stats[msg_class][method].update(len(data), len(compressed), duration, self.__alpha)
+            self.__choice[msg_class] = self.__choose(msg_class)
+        # when sampling a method, only use result if it actually helped
+        if len(compressed) >= len(data):
+            return COMP_NONE, data
+        return method, compressed
+
+    def __select(self, msg_class):
+        """
+        Returns:
+            Method to use for the next message of the given class (or None to not compress)
+        """
+        with self.__lock:
+            try:
+                stats = self.__stats[msg_class]
+            except KeyError:
+                stats = self.__stats[msg_class] = {method: _MethodStats() for method in self.__methods}
+            seen = self.__seen[msg_class] = self.__seen.get(msg_class, 0) + 1
+
+            least_sampled = min(self.__methods, key=lambda method: stats[method].count)
+            # initial samples for each method, then periodic re-sampling
+            if stats[least_sampled].count < 2 or seen % self.__sample_interval == 0:
+                return least_sampled
+            return self.__choice.get(msg_class)
+
+    def __choose(self, msg_class):
+        """Pick method based on available statistics. Must be called within lock."""
+        stats = self.__stats[msg_class]
+        sampled = [method for method in self.__methods if stats[method].ratio is not None]
+        if not sampled:
+            return None
+        best_ratio = min(stats[method].ratio for method in sampled)
+        if 1 - best_ratio < self.__min_saving:
+            return None
+        # prefer faster methods if size saving is (almost) as good
+        return min((method for method in sampled if stats[method].ratio - best_ratio <= self.__speed_tolerance),
+                   key=lambda method: stats[method].rate)
+
+
+def build_zlib_dict(samples, size=ZLIB_DICT_DEFAULT_SIZE, min_frequency=0.05, window=8):
+    """Build a zlib preset dictionary from sample (uncompressed) messages. Byte sequences which occur in many samples
+    (e.g. message keys, common identifiers) are included, most frequent last since zlib encodes references to the end
+    of the dictionary more cheaply.
+
+    `samples` - sequence of bytes
+
+    `size` - (int) maximum size of dictionary
+
+    `min_frequency` - (float) fraction of samples (but at least two) a sequence has to occur in to be considered
+
+    `window` - (int) length of sequences to count occurrences of. Adjacent frequent sequences are joined.
+
+    Returns:
+        Dictionary (bytes), which is empty if no sample data was frequent enough.
+    """
+    if not 0 < size <= ZLIB_DICT_MAX_SIZE:
+        raise ValueError('size invalid')
+    # number of samples each window occurs in
+    counts = Counter()
+    for sample in samples:
+        counts.update({sample[i:i + window] for i in range(len(sample) - window + 1)})
+    threshold = max(2, int(len(samples) * min_frequency))
+
+    # join overlapping frequent windows into segments
+    segments = Counter()
+    for sample in samples:
+        start = end = None
+        for i in range(len(sample) - window + 1):
+            if counts[sample[i:i + window]] >= threshold:
+                if start is None or i > end:
+                    if start is not None:
+                        segments[sample[start:end]] += 1
+                    start = i
+                end = i + window
+        if start is not None:
+            segments[sample[start:end]] += 1
+
+    # highest scoring (bytes saved) segments first
+    selected = []
+    total = 0
+    for segment, count in sorted(segments.items(), key=lambda item: (item[1] * len(item[0]), item[0]), reverse=True):
+        if total >= size:
+            break
+        if any(segment in existing for existing in selected):
+            continue
+        selected.append(segment)
+        total += len(segment)
+
+    zdict = b''.join(reversed(selected))
+    return zdict[-size:]
+
+
+class ZlibDictTrainer(object):
+    """Collects a sample of (uncompressed) messages with which to build a zlib preset dictionary. Threadsafe."""
+
+    def __init__(self, max_samples=1024, sample_interval=1):
+        """
+        `max_samples` - (int) number of most recent samples to keep
+
+        `sample_interval` - (int) only keep every Nth message added
+        """
+        if max_samples < 1 or sample_interval < 1:
+            raise ValueError('max_samples & sample_interval must be positive')
+        self.__samples = deque(maxlen=max_samples)
+        self.__sample_interval = sample_interval
+        self.__seen = 0
+        self.__lock = Lock()
+
+    def __len__(self):
+        return len(self.__samples)
+
+    def add(self, data):
+        with self.__lock:
+            self.__seen += 1
+            if self.__seen % self.__sample_interval == 0:
+                self.__samples.append(bytes(data))
+
+    def build(self, size=ZLIB_DICT_DEFAULT_SIZE, **kwargs):
+        """Build dictionary from samples collected so far. See build_zlib_dict for parameters."""
+        with self.__lock:
+            samples = list(self.__samples)
+        return build_zlib_dict(samples, size=size, **kwargs)
+
+
+def __benchmark(count=1000):  # pylint: disable=too-many-locals
+    """Compare compressed sizes of typical share & metadata requests without and with a preset dictionary. The
+    dictionary is trained on one half of the generated messages and evaluated on the other."""
+    from random import Random
+    from ubjson import dumpb
+
+    from .Const import (R_FEED, R_ENTITY_META, R_VALUE_META, R_ENTITY_TAG_META, C_CREATE, C_UPDATE, M_RESOURCE, M_TYPE,
+                        M_CLIENTREF, M_ACTION, M_PAYLOAD)
+
+    rnd = Random(0)
+    things = ['weather_station_%d' % i for i in range(20)]
+    points = ['temperature', 'humidity', 'pressure', 'wind_speed']
+
+    def inner_msg(resource, rtype, action, payload):
+        return dumpb({M_RESOURCE: resource, M_TYPE: rtype, M_CLIENTREF: 'Kq7Zt2%d' % rnd.randint(0, 99999),
+                      M_ACTION: action, M_PAYLOAD: payload})
+
+    def share():
+        point = rnd.choice(points)
+        data = dumpb({point: round(rnd.uniform(-20, 40), 2), 'unit': 'http://purl.org/iot/vocab/m3-lite#Celsius'})
+        return inner_msg(R_FEED, C_UPDATE, (rnd.choice(things), point, 'share'),
+                         {'mime': 'idx/1', 'data': data, 'time': '2019-01-01T%02d:%02d:%02d.000000Z' %
+                          (rnd.randint(0, 23), rnd.randint(0, 59), rnd.randint(0, 59))})
+
+    def metadata():
+        thing = rnd.choice(things)
+        choice = rnd.randint(0, 2)
+        if choice == 0:
+            return inner_msg(R_VALUE_META, C_CREATE, (thing, rnd.choice(points), R_FEED),
+                             {'label': 'value', 'type': 'http://www.w3.org/2001/XMLSchema#decimal', 'lang': 'en',
+                              'comment': 'Current reading', 'unit': 'http://purl.org/iot/vocab/m3-lite#Celsius'})
+        elif choice == 1:
+            return inner_msg(R_ENTITY_TAG_META, C_UPDATE, (thing,),
+                             {'tags': ['weather', 'station', 'outdoor'], 'delete': False})
+        return inner_msg(R_ENTITY_META, C_UPDATE, (thing,), {
+            'meta': ('<urn:x-iotic:thing> <http://www.w3.org/2000/01/rdf-schema#label> "Weather station %s"@en .\n'
+                     '<urn:x-iotic:thing> <http://www.w3.org/2000/01/rdf-schema#comment> "Outdoor sensors"@en .'
+                     % thing), 'format': 'n3'})
+
+    for name, factory in (('share', share), ('metadata', metadata)):
+        messages = [factory() for _ in range(count)]
+        training, test = messages[:count // 2], messages[count // 2:]
+        zdict = build_zlib_dict(training)
+        # local stand-in for container: decompress with separate instance using same dictionary
+        compressor, container = ZlibDict(zdict), ZlibDict(zdict)
+        raw = plain = with_dict = 0
+        for msg in test:
+            compressed = compressor.compress(msg)
+            assert container.decompress(compressed) == msg
+            raw += len(msg)
+            plain += len(Zlib.compress(msg))
+            with_dict += len(compressed)
+        num = len(test)
+        print('%-8s (dict %5d bytes) avg raw %4d, zlib %4d (%5.1f%%), zlib+dict %4d (%5.1f%%) bytes' % (
+            name, len(zdict), raw / num, plain / num, 100 * (1 - plain / raw), with_dict / num,
+            100 * (1 - with_dict / raw)))
+
+
+if __name__ == '__main__':
+    __benchmark()
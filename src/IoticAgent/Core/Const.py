@@ -77,6 +77,8 @@ W_MESSAGE = 'm'
 COMP_NONE = 0
 COMP_ZLIB = 1
 COMP_LZ4F = 2
+# zlib with preset dictionary (only available if dictionary announced by container, see Core.Client.start)
+COMP_ZLIB_DICT = 3
 
 # Message
 M_RESOURCE = 'r'
@@ -118,6 +120,9 @@ COMP_DEFAULT = COMP_ZLIB
 # comp_size when innerMsg is longer than this (selected) compression will be used
 COMP_SIZE = 768
 
+# comp_size to use instead of COMP_SIZE with COMP_ZLIB_DICT (even small messages benefit from a preset dictionary)
+COMP_DICT_SIZE = 64
+
 
 # Request-specific enumerations
 
@@ -168,3 +173,36 @@ class DescribeScope(Enum):
     PUBLIC = 'public'
     LOCAL = 'local'
     LOCAL_OWN = 'localOwn'
+
+
+@unique
+class QueuePolicy(Enum):
+    """Determines what happens to new feed data when a subscription's callback queue is full
+
+    `BLOCK` - Wait for the callback to catch up. Note: This holds up receipt of all other messages too.
+
+    `DROP_OLDEST` - Discard the oldest queued data
+
+    `DROP_NEWEST` - Discard the new data
+
+    `LATEST` - Only keep the most recent data, i.e. a queue size of one with DROP_OLDEST
+    """
+    BLOCK = 'block'
+    DROP_OLDEST = 'dropOldest'
+    DROP_NEWEST = 'dropNewest'
+    LATEST = 'latest'
+
+
+@unique
+class TimeType(Enum):
+    """Determines how timestamps of received feed data (and recent data samples) are represented
+
+    `DATETIME` - Naive datetime.datetime instance (in UTC)
+
+    `EPOCH` - Seconds since the (UNIX) epoch (float)
+
+    `DATETIME64` - numpy.datetime64 with microsecond precision (requires numpy)
+    """
+    DATETIME = 'datetime'
+    EPOCH = 'epoch'
+    DATETIME64 = 'datetime64'
@@ -0,0 +1,141 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Decoding (validation, decompression & deserialisation) of received messages using a pool of worker threads
+"""
+
+from __future__ import unicode_literals
+
+from collections import deque
+from threading import Thread, Condition
+import logging
+logger = logging.getLogger(__name__)
+
+from .Profiler import profiled_thread
+from .ThreadPool import ThreadPool
+from .compat import Event, Lock
+from .utils import validate_nonnegative_int
+
+DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
+
+
+class DecodedMessage(object):
+    """Result of decoding a single received message. Available once ready() returns True."""
+
+    __slots__ = ('message', 'done', 'result', '_event')
+
+    def __init__(self, message, done):
+        self.message = message
+        self.done = done
+        self.result = None
+        self._event = Event()
+
+    def _decode(self, decode):
+        try:
+            self.result = decode(self.message)
+        except:
+            logger.exception('Failed to decode message')
+        finally:
+            self._event.set()
+
+    def ready(self, timeout=None):
+        """
+        Returns:
+            True if decoding has finished (successfully or otherwise), waiting for up to timeout seconds
+        """
+        return self._event.wait(timeout)
+
+
+class DecodePipeline(object):
+    """Decodes received messages in parallel but dispatches them strictly in the order they were submitted, from a
+    single thread. This way the (AMQP) receiving thread only has to hand over messages and ordering of e.g. responses
+    for the same request is preserved. Once dispatched, the function supplied with each message is called, which is
+    used to acknowledge messages (in order)."""
+
+    def __init__(self, decode, dispatch, num_workers=1):
+        """
+        `decode` - (func) Called with a message (from any worker). Its return value is passed to dispatch.
+
+        `dispatch` - (func) Called with a message and the result of decode, in submission order, from the dispatching
+                     thread. If decode raised an exception, the result is None.
+
+        `num_workers` - (int) Number of threads to decode messages with
+        """
+        self.__decode = decode
+        self.__dispatch = dispatch
+        self.__pool = ThreadPool(num_workers=validate_nonnegative_int(num_workers, 'num_workers'), daemonic=True)
+        self.__pending = deque()
+        self.__cond = Condition(Lock())
+        self.__stopped = True
+        self.__thread = None
+
+    def start(self):
+        with self.__cond:
+            if not self.__stopped:
+                return
+            self.__stopped = False
+        self.__pool.start()
+        self.__thread = Thread(target=self.__dispatch_run, name='decode_dispatch')
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        """Stop decoding & dispatching. Messages not yet dispatched are discarded (and their done functions not
+        called)."""
+        with self.__cond:
+            if self.__stopped:
+                return
+            self.__stopped = True
+            self.__cond.notify()
+        self.__thread.join()
+        self.__pool.stop()
+        with self.__cond:
+            self.__pending.clear()
+
+    def __len__(self):
+        return len(self.__pending)
+
+    def submit(self, message, done):
+        """Schedule decoding & dispatching of the given message. done (func, no arguments) is called once the message
+        has been dispatched."""
+        decoded = DecodedMessage(message, done)
+        with self.__cond:
+            self.__pending.append(decoded)
+            self.__cond.notify()
+        self.__pool.submit(decoded._decode, self.__decode)
+
+    @profiled_thread
+    def __dispatch_run(self):
+        cond = self.__cond
+        pending = self.__pending
+        dispatch = self.__dispatch
+        while True:
+            with cond:
+                while not (pending or self.__stopped):
+                    cond.wait()
+                if self.__stopped:
+                    break
+                decoded = pending[0]
+            decoded.ready()
+            with cond:
+                if self.__stopped:
+                    break
+                pending.popleft()
+            try:
+                dispatch(decoded.message, decoded.result)
+            except:
+                logger.exception('Failed to dispatch message')
+            try:
+                decoded.done()
+            except:
+                logger.exception('Message completion failed')
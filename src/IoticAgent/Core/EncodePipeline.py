@@ -0,0 +1,326 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Encoding (serialisation, compression & signing) of outgoing requests, optionally using a pool of worker threads
+"""
+
+from __future__ import unicode_literals
+
+from collections import deque
+from hashlib import sha256 as hashfunc
+from hmac import new as hmacNew
+from struct import Struct
+import logging
+logger = logging.getLogger(__name__)
+
+from ubjson import dumpb as ubjdumpb
+
+from .Compressors import COMPRESSORS
+from .Const import W_SEQ, W_HASH, W_COMPRESSION, W_MESSAGE, M_RESOURCE, COMP_NONE, COMP_SIZE, COMP_LZ4F
+from .ThreadPool import ThreadPool
+from .compat import Event, int_types
+from .utils import validate_nonnegative_int
+
+DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
+
+__byte_packer = Struct(b'>Q').pack
+
+
+def make_hash(innermsg, token, seqnum):
+    """
+    Returns:
+        HMAC (digest bytes) for the given (encoded) inner message, token & sequence number
+    """
+    hobj = hmacNew(token, digestmod=hashfunc)
+    hobj.update(innermsg)
+    hobj.update(__byte_packer(seqnum))
+    return hobj.digest()
+
+
+class MessageEncoder(object):
+    """Serialises, compresses and signs inner messages. Threadsafe (compression settings are replaced atomically)."""
+
+    def __init__(self, token, max_encoded_length, comp=COMP_NONE, size=COMP_SIZE):
+        """
+        `token` - (bytes) HMAC secret
+
+        `max_encoded_length` - (int) maximum permissible size of a fully encoded message
+
+        `comp` / `size` - See set_compression()
+        """
+        self.__token = token
+        self.__max_encoded_length = max_encoded_length
+        self.__comp = None
+        self.__adaptive = None
+        self.__trainer = None
+        # available compressors by method (can be extended, see add_compressor)
+        self.__compressors = dict(COMPRESSORS)
+        self.set_compression(comp, size)
+
+    @property
+    def compressors(self):
+        """Mapping of compression method to Compressor, for both compression & decompression"""
+        return self.__compressors
+
+    def add_compressor(self, compressor):
+        """Make an additional (or replacement) compressor instance available, e.g. Compressors.ZlibDict"""
+        self.__compressors[compressor.method()] = compressor
+
+    def remove_compressor(self, method):
+        """Remove previously added compressor (unless it is currently in use)"""
+        if method in COMPRESSORS:
+            raise ValueError('Only compressors added via add_compressor can be removed')
+        if method == self.__comp[0]:
+            raise ValueError('Compressor in use')
+        self.__compressors.pop(method, None)
+
+    def set_compression(self, comp, size=COMP_SIZE):
+        """Set compression method and threshold (in bytes) above which to apply it.
+
+        Returns:
+            Tuple of compression method & size
+        """
+        if comp not in self.__compressors:
+            if comp == COMP_LZ4F:
+                raise ValueError('lz4f compression not available, required lz4framed')
+            raise ValueError('Invalid compression method')
+        if not isinstance(size, int_types) or size < 1:
+            raise ValueError('size must be non-negative integer')
+        self.__comp = (comp, size)
+        return self.__comp
+
+    @property
+    def compression(self):
+        """Tuple of compression method & size threshold currently in use"""
+        return self.__comp
+
+    def set_adaptive(self, adaptive):
+        """Use the given AdaptiveCompression instance to pick the compression method (by message resource type) for
+        messages above the size threshold, instead of always using the fixed method. None disables adaptive mode."""
+        self.__adaptive = adaptive
+
+    @property
+    def adaptive(self):
+        """AdaptiveCompression instance in use (or None)"""
+        return self.__adaptive
+
+    def set_trainer(self, trainer):
+        """Pass all (uncompressed) inner messages to the given Compressors.ZlibDictTrainer instance. None disables
+        sampling."""
+        self.__trainer = trainer
+
+    def check_hash(self, wrapper):
+        """
+        Returns:
+            True if the hash in the given (decoded) message wrapper matches its contents.
+        """
+        return wrapper[W_HASH] == make_hash(wrapper[W_MESSAGE], self.__token, wrapper[W_SEQ])
+
+    def encode(self, inner_msg, seqnum):
+        """Encode the given inner message using the given sequence number.
+
+        Returns:
+            Tuple of encoded message (bytes) and (unencoded) wrapper
+
+        Raises:
+            ValueError - if the encoded message exceeds the maximum permitted length
+        """
+        comp, size = self.__comp
+        adaptive = self.__adaptive
+        innermsg = ubjdumpb(inner_msg)
+        if self.__trainer is not None:
+            self.__trainer.add(innermsg)
+        clevel = COMP_NONE
+        if len(innermsg) >= size:
+            if adaptive:
+                clevel, innermsg = adaptive.compress(inner_msg[M_RESOURCE], innermsg)
+            else:
+                logger.debug('Compressing payload')
+                innermsg = self.__compressors[comp].compress(innermsg)
+                clevel = comp
+
+        wrapper = {W_SEQ: seqnum,
+                   W_MESSAGE: innermsg,
+                   W_HASH: make_hash(innermsg, self.__token, seqnum),
+                   W_COMPRESSION: clevel}
+        msg = ubjdumpb(wrapper)
+
+        # do not send messages exceeding size limit
+        if len(msg) > self.__max_encoded_length:
+            raise ValueError("Message Payload too large %d > %d" % (len(msg), self.__max_encoded_length))
+
+        return msg, wrapper
+
+
+class EncodedMessage(object):
+    """Result of encoding a single PreparedMessage. Available once ready() returns True."""
+
+    __slots__ = ('qmsg', 'seqnum', 'msg', 'wrapper', 'exception', '_event')
+
+    def __init__(self, qmsg, seqnum):
+        self.qmsg = qmsg
+        self.seqnum = seqnum
+        self.msg = None
+        self.wrapper = None
+        self.exception = None
+        self._event = Event()
+
+    def _encode(self, encoder):
+        try:
+            self.msg, self.wrapper = encoder.encode(self.qmsg.inner_msg, self.seqnum)
+        except Exception as ex:  # pylint: disable=broad-except
+            self.exception = ex
+        finally:
+            self._event.set()
+
+    def ready(self, timeout=None):
+        """
+        Returns:
+            True if encoding has finished (successfully or otherwise), waiting for up to timeout seconds
+        """
+        return self._event.wait(timeout)
+
+
+class EncodePipeline(object):
+    """Encodes messages in submission order, optionally in parallel. Results are retrieved strictly in submission
+    order, so the (single) caller can publish them in the same order as their sequence numbers were assigned. Apart
+    from the workers themselves, all methods must be called from the same thread."""
+
+    def __init__(self, encoder, num_workers=0, window=None):
+        """
+        `encoder` - MessageEncoder instance
+
+        `num_workers` - (int) Number of threads to encode messages with. If zero, encoding happens in the calling
+                        thread on submission.
+
+        `window` - (int) Maximum number of messages to be in the pipeline at any one time. Defaults to twice the number
+                   of workers (or one if not using workers).
+        """
+        self.__encoder = encoder
+        self.__num_workers = validate_nonnegative_int(num_workers, 'num_workers', allow_zero=True)
+        if window is None:
+            window = max(1, 2 * self.__num_workers)
+        self.__window = validate_nonnegative_int(window, 'window')
+        self.__pending = deque()
+        self.__pool = ThreadPool(num_workers=self.__num_workers, daemonic=True) if self.__num_workers else None
+
+    def start(self):
+        if self.__pool:
+            self.__pool.start()
+
+    def stop(self):
+        if self.__pool:
+            self.__pool.stop()
+        self.__pending.clear()
+
+    def __len__(self):
+        return len(self.__pending)
+
+    @property
+    def full(self):
+        """Whether the pipeline has reached its window size"""
+        return len(self.__pending) >= self.__window
+
+    def submit(self, qmsg, seqnum):
+        """Schedule encoding of given PreparedMessage with given sequence number."""
+        encoded = EncodedMessage(qmsg, seqnum)
+        self.__pending.append(encoded)
+        self.__schedule(encoded)
+
+    def __schedule(self, encoded):
+        if self.__pool:
+            self.__pool.submit(encoded._encode, self.__encoder)
+        else:
+            encoded._encode(self.__encoder)
+
+    def head(self):
+        """
+        Returns:
+            The oldest EncodedMessage in the pipeline (which might not be ready yet) or None if the pipeline is empty.
+        """
+        try:
+            return self.__pending[0]
+        except IndexError:
+            return None
+
+    def pop(self):
+        """Remove the oldest EncodedMessage from the pipeline"""
+        return self.__pending.popleft()
+
+    def resubmit(self, seqnum_func):
+        """Re-encode all messages currently in the pipeline, assigning new sequence numbers (in order) via seqnum_func.
+        Used when previously encoded messages could not be sent and so their sequence numbers will not have been seen
+        by the container."""
+        previous = list(self.__pending)
+        self.__pending.clear()
+        for encoded in previous:
+            # still have to wait for existing encoding to finish since workers reference the instance
+            encoded.ready()
+            self.submit(encoded.qmsg, seqnum_func())
+
+
+def __benchmark(count=5000, payload_size=4096):  # pylint: disable=too-many-locals
+    """Measure encoding throughput with increasing numbers of workers. Note that any speed-up relies on compression and
+    hashing releasing the GIL for larger payloads."""
+    from os import urandom
+    from base64 import b64encode
+    from multiprocessing import cpu_count
+
+    from .compat import monotonic
+    from .Const import COMP_ZLIB, R_FEED, C_UPDATE, M_RESOURCE, M_TYPE, M_CLIENTREF, M_ACTION, M_PAYLOAD
+    from .PreparedMessage import PreparedMessage
+
+    # semi-compressible payload (base64 encoded random bytes)
+    data = b64encode(urandom(payload_size * 3 // 4))
+    qmsgs = [PreparedMessage({M_RESOURCE: R_FEED,
+                              M_TYPE: C_UPDATE,
+                              M_CLIENTREF: 'ref%d' % i,
+                              M_ACTION: ('thing', 'feed'),
+                              M_PAYLOAD: {'d': data, 'm': 'idx/1'}}, 'ref%d' % i) for i in range(count)]
+    encoder = MessageEncoder(urandom(32), 1024 * 1024, comp=COMP_ZLIB)
+
+    print('Encoding %d messages (%d byte payloads) using %d CPU(s)' % (count, len(data), cpu_count()))
+    baseline = None
+    for num_workers in (0, 1, 2, 4, 8):
+        pipeline = EncodePipeline(encoder, num_workers=num_workers)
+        pipeline.start()
+        try:
+            seqnum = 0
+            messages = iter(qmsgs)
+            start = monotonic()
+            while True:
+                # same access pattern as Core.Client: top up pipeline, then consume (publish) in order
+                while not pipeline.full:
+                    try:
+                        pipeline.submit(next(messages), seqnum)
+                    except StopIteration:
+                        break
+                    seqnum += 1
+                encoded = pipeline.head()
+                if encoded is None:
+                    break
+                encoded.ready()
+                if encoded.exception:
+                    raise encoded.exception
+                pipeline.pop()
+            duration = monotonic() - start
+        finally:
+            pipeline.stop()
+        rate = count / duration
+        if baseline is None:
+            baseline = rate
+        print('%d worker(s): %8.0f msgs/s (x%.2f)' % (num_workers, rate, rate / baseline))
+
+
+if __name__ == '__main__':
+    __benchmark()
@@ -0,0 +1,151 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Local cache of the most recently received samples of followed feeds
+"""
+
+from __future__ import unicode_literals
+
+from collections import deque, OrderedDict
+from itertools import islice
+
+from .compat import Lock
+from .utils import validate_nonnegative_int
+
+# Estimated memory use (in bytes) of a cached sample in addition to its payload size
+SAMPLE_OVERHEAD = 256
+
+
+class FeedCache(object):
+    """Ring buffers of the last N samples for individual feeds, sharing a common memory budget. When over budget,
+    samples are evicted (oldest first) from the feed which has been read least recently. Threadsafe."""
+
+    def __init__(self, budget):
+        """
+        `budget` - (int) Maximum (estimated) total size of cached samples in bytes. Zero disables the cache.
+        """
+        self.__budget = validate_nonnegative_int(budget, 'budget', allow_zero=True)
+        self.__lock = Lock()
+        # feedid -> deque of (data, mime, time, size), least recently read first
+        self.__feeds = OrderedDict()
+        self.__sizes = {}
+        # subscription id -> feedid, for subscriptions which enabled caching
+        self.__subs = {}
+        self.__used = 0
+        self.__evicted = 0
+
+    def __bool__(self):
+        return self.__budget > 0
+
+    __nonzero__ = __bool__
+
+    def enable(self, feedid, size, subid=None):
+        """Cache (at least) the last size samples of the given feed. Has no effect if size is zero or if a larger size
+        has already been set for the feed. If `subid` (the subscription for which caching is enabled) is given, caching
+        stops once all such subscriptions of the feed have been removed (see remove_sub)."""
+        size = validate_nonnegative_int(size, 'size', allow_zero=True)
+        if not (size and self.__budget):
+            return
+        with self.__lock:
+            if subid is not None:
+                self.__subs[subid] = feedid
+            if self.__sizes.get(feedid, 0) >= size:
+                return
+            self.__sizes[feedid] = size
+            self.__feeds.setdefault(feedid, deque())
+
+    def remove_sub(self, subid):
+        """Forget the given subscription (e.g. since it has been deleted), disabling caching of its feed if no other
+        subscriptions (which enabled caching) of the feed remain"""
+        with self.__lock:
+            feedid = self.__subs.pop(subid, None)
+            if feedid is None or feedid in self.__subs.values():
+                return
+            self.__disable(feedid)
+
+    def disable(self, feedid):
+        """Stop caching the given feed, discarding any of its cached samples"""
+        with self.__lock:
+            for subid in [subid for subid, other in self.__subs.items() if other == feedid]:
+                del self.__subs[subid]
+            self.__disable(feedid)
+
+    def __disable(self, feedid):
+        """MUST be called within lock"""
+        samples = self.__feeds.pop(feedid, ())
+        self.__sizes.pop(feedid, None)
+        self.__used -= sum(sample[3] for sample in samples)
+
+    def clear(self):
+        """Discard all cached samples (e.g. since some might have been missed whilst disconnected), caching remaining
+        enabled. Until enough new samples have been received, get_recent returns None."""
+        with self.__lock:
+            for samples in self.__feeds.values():
+                samples.clear()
+            self.__used = 0
+
+    def add(self, feedid, data, mime, time, payload_size):
+        """Store a sample for the given feed, if it is cached. `payload_size` (int) is the size of the (encoded)
+        payload in bytes."""
+        with self.__lock:
+            try:
+                samples = self.__feeds[feedid]
+            except KeyError:
+                return
+            size = payload_size + SAMPLE_OVERHEAD
+            if len(samples) >= self.__sizes[feedid]:
+                self.__used -= samples.popleft()[3]
+            samples.append((data, mime, time, size))
+            self.__used += size
+            if self.__used > self.__budget:
+                self.__evict()
+
+    def __evict(self):
+        """Remove samples until within budget. MUST be called within lock."""
+        for samples in self.__feeds.values():
+            while samples and self.__used > self.__budget:
+                self.__used -= samples.popleft()[3]
+                self.__evicted += 1
+            if self.__used <= self.__budget:
+                break
+
+    def get_recent(self, feedid, count):
+        """
+        Returns:
+            List of the last count samples (oldest first) as dicts with data, mime & time keys. None if the
+            feed is not cached or fewer than count samples are available.
+        """
+        with self.__lock:
+            try:
+                samples = self.__feeds[feedid]
+            except KeyError:
+                return None
+            if len(samples) < count:
+                return None
+            # most recently read last
+            self.__feeds[feedid] = self.__feeds.pop(feedid)
+            return [{'data': data, 'mime': mime, 'time': time}
+                    for data, mime, time, _ in islice(samples, len(samples) - count, None)]
+
+    def stats(self):
+        """
+        Returns:
+            dict of number of cached `feeds`, `samples` in total, their estimated size in `bytes`, the `budget` and how
+            many samples have been `evicted` due to the budget being exceeded.
+        """
+        with self.__lock:
+            return {'feeds': len(self.__feeds),
+                    'samples': sum(len(samples) for samples in self.__feeds.values()),
+                    'bytes': self.__used,
+                    'budget': self.__budget,
+                    'evicted': self.__evicted}
@@ -0,0 +1,94 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Automatic decoding of received point data (feed data & control requests), optionally on first access
+"""
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+from ubjson import loadb as ubjloadb
+
+from .Mime import expand_idx_mimetype
+
+DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
+
+_MIME_UBJSON = 'application/ubjson'
+_MIME_TEXT = 'text/plain; charset=utf8'
+
+
+def decode_share_data(rbytes, mime):
+    """Attempt to auto-decode data
+
+    Returns:
+        Tuple of data & mime. The mime type is None if the data was decoded (to a dict or string), otherwise the data
+        is returned as-is.
+    """
+    if mime is None:
+        return rbytes, mime
+    mime = expand_idx_mimetype(mime).lower()
+    try:
+        if mime == _MIME_UBJSON:
+            return ubjloadb(rbytes), None
+        elif mime == _MIME_TEXT:
+            return rbytes.decode('utf-8'), None
+        else:
+            return rbytes, mime
+    except:
+        logger.warning('auto-decode failed, returning bytes', exc_info=DEBUG_ENABLED)
+        return rbytes, mime
+
+
+class LazyPayload(object):
+    """Received point data which is only decoded (see decode_share_data) when first accessed via `data` or `mime`. The
+    result is cached. Threadsafe (though concurrent first accesses might decode more than once)."""
+
+    __slots__ = ('__raw', '__raw_mime', '__decoded')
+
+    def __init__(self, raw, raw_mime):
+        self.__raw = raw
+        self.__raw_mime = raw_mime
+        self.__decoded = None
+
+    @property
+    def raw(self):
+        """The payload as received (bytes)"""
+        return self.__raw
+
+    @property
+    def raw_mime(self):
+        """Mime type of raw payload (or None)"""
+        return self.__raw_mime
+
+    @property
+    def decoded(self):
+        """Tuple of data & mime (as would be passed to callbacks without lazy decoding)"""
+        decoded = self.__decoded
+        if decoded is None:
+            self.__decoded = decoded = decode_share_data(self.__raw, self.__raw_mime)
+        return decoded
+
+    @property
+    def data(self):
+        """Decoded data (dict or string) or raw bytes if the mime type is not one supported by auto-decoding"""
+        return self.decoded[0]
+
+    @property
+    def mime(self):
+        """None if data was decoded, otherwise (expanded) mime type of raw payload"""
+        return self.decoded[1]
+
+    def __repr__(self):
+        return '%s(%d bytes, mime=%s)' % (self.__class__.__name__, len(self.__raw), self.__raw_mime)
@@ -24,7 +24,11 @@ from .compat import monotonic, int_types, raise_from
 
 
 class RateLimiter(object):
-    """Allows an action to be automatically limited to at most N iterations over time interval T"""
+    """Allows an action to be automatically limited to at most N iterations over time interval T (exact sliding
+    window, i.e. no period of length T ever contains more than N iterations). Only the times of the last N iterations
+    are kept (in a bounded ring buffer), so checking & recording an iteration is constant time.
+
+    Any object providing the delay(), try_acquire() and throttle() methods can be used in place of this class."""
 
     def __init__(self, interval, max_iterations, wait_cmd=None):
         """
@@ -48,9 +52,42 @@ class RateLimiter(object):
 
         self.__interval = interval
         self.__max_iterations = max_iterations
-        self.__iterations = deque()
+        # times of the most recent iterations, oldest first (oldest dropped automatically when full)
+        self.__iterations = deque(maxlen=max_iterations)
         self.__lock = Lock()
 
+    def __delay(self, timestamp):
+        """
+        Returns:
+            Delay before an iteration is allowed. Must be called within lock.
+        """
+        iterations = self.__iterations
+        if len(iterations) < self.__max_iterations:
+            return 0
+        # allowed once the oldest of the last max_iterations is at least interval in the past
+        return max(0, iterations[0] + self.__interval - timestamp)
+
+    def delay(self):
+        """
+        Returns:
+            Time (in seconds) until an iteration would be allowed. Does not count as an iteration.
+        """
+        with self.__lock:
+            return self.__delay(monotonic())
+
+    def try_acquire(self):
+        """Non-blocking version of throttle(): Counts as an iteration only if allowed to proceed immediately.
+
+        Returns:
+            Zero if allowed to proceed, otherwise the time (in seconds) after which to try again.
+        """
+        with self.__lock:
+            timestamp = monotonic()
+            delay = self.__delay(timestamp)
+            if not delay:
+                self.__iterations.append(timestamp)
+            return delay
+
     def throttle(self):
         """Uses time.monotonic() (or time.sleep() if not available) to limit to the desired rate. Should be called once
         per iteration of action which is to be throttled.
@@ -59,30 +96,30 @@ class RateLimiter(object):
             None unless a custom wait_cmd was specified in the constructor in which case its return value is used if a
             wait was required.
         """
-        iterations = self.__iterations
-        timestamp = monotonic()
-        outdated_threshold = timestamp - self.__interval
+        retval = None
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                return retval
+            # only notify user about longer delays
+            if delay > 1:
+                logger.warning('Send throttling delay (interval=%d, max_iterations=%d): %.2fs', self.__interval,
+                               self.__max_iterations, delay)
+            retval = self.__wait_cmd(delay)
+            # e.g. interrupted by event
+            if retval:
+                return retval
 
-        with self.__lock:
-            # remove any iterations older than interval
-            try:
-                while iterations[0] < outdated_threshold:
-                    iterations.popleft()
-            except IndexError:
-                pass
-            # apply throttling if rate would be exceeded
-            if len(iterations) <= self.__max_iterations:
-                iterations.append(timestamp)
-                retval = None
-            else:
-                # wait until oldest sample is too old
-                delay = max(0, iterations[0] + self.__interval - timestamp)
-                # only notify user about longer delays
-                if delay > 1:
-                    logger.warning('Send throttling delay (interval=%d, max_iterations=%d): %.2fs', self.__interval,
-                                   self.__max_iterations, delay)
-                retval = self.__wait_cmd(delay)
-                # log actual addition time
-                iterations.append(monotonic())
-
-            return retval
+
+def try_acquire_all(throttlers):
+    """Counts an iteration against all of the given throttlers, but only if all of them allow it immediately. Must not
+    be used concurrently with other calls for the same throttlers.
+
+    Returns:
+        Zero if allowed to proceed, otherwise the time (in seconds) after which to try again.
+    """
+    delay = max(throttler.delay() for throttler in throttlers) if throttlers else 0
+    if not delay:
+        for throttler in throttlers:
+            throttler.try_acquire()
+    return delay
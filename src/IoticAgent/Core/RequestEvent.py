@@ -14,12 +14,44 @@
 
 from __future__ import unicode_literals
 
+from collections import namedtuple, deque
 from functools import partial
+from threading import Condition
+from warnings import warn
 import logging
 logger = logging.getLogger(__name__)
 DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
 
-from .compat import Event
+from .compat import Event, Lock, monotonic
+
+try:
+    from concurrent.futures import TimeoutError  # pylint: disable=redefined-builtin
+except ImportError:
+    class TimeoutError(Exception):  # pylint: disable=redefined-builtin
+        """Raised by RequestEvent.result/exception & as_completed on timeout"""
+
+
+class _ExceptionMethod(object):
+    """Bound RequestEvent.exception which, for compatibility with the former exception attribute, has the truth value of
+    the request's exception"""
+
+    __slots__ = ('__evt',)
+
+    def __init__(self, evt):
+        self.__evt = evt
+
+    def __call__(self, timeout=None):
+        return self.__evt._wait_for_exception(timeout)
+
+    def __bool__(self):
+        warn('RequestEvent.exception is a method, call it instead of testing its truth value', DeprecationWarning,
+             stacklevel=2)
+        return self.__evt._exception is not None
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return '<bound method RequestEvent.exception of %r>' % self.__evt
 
 
 class RequestEvent(object):  # pylint: disable=too-many-instance-attributes
@@ -27,10 +59,16 @@ class RequestEvent(object):  # pylint: disable=too-many-instance-attributes
     """Request event object. Uses threading.Event (factory function).
 
     See here for more information: https://docs.python.org/3/library/threading.html#event-objects
+
+    Also implements the concurrent.futures.Future interface (done, result, exception, add_done_callback etc.), where
+    the result is the request's payload. Requests cannot be cancelled. For waiting on many requests at once, use the
+    wait_all, wait_any & as_completed functions in this module.
     """
 
     def __init__(self, id_, inner_msg_out=None, is_crud=False):
         self.__event = Event()  # pylint: disable=assigning-non-slot
+        # protects completion function & callback lists against concurrent _set()
+        self.__lock = Lock()
         #
         # request id used to communicate with the QAPI
         self.id_ = id_
@@ -44,8 +82,8 @@ class RequestEvent(object):  # pylint: disable=too-many-instance-attributes
         # Whether the associated operation is a resource CRUD type (used by Client to serialise CRUD type responses)
         self.is_crud = is_crud
         #
-        # If an exception occurred, this is instance
-        self.exception = None
+        # If an exception occurred, this is instance (see exception())
+        self._exception = None
         #
         # Time at which request was sent by transport. (Can change if transport failure triggers retry due to no
         # response having been received for a certain amount of time.)
@@ -57,8 +95,11 @@ class RequestEvent(object):  # pylint: disable=too-many-instance-attributes
         # Raw messages from the QAPI
         self._messages = []
         #
-        # function to run on completion
-        self._complete_func = None
+        # functions to run on completion
+        self._complete_funcs = []
+        #
+        # Future-style done callbacks (run exactly once)
+        self.__done_callbacks = []
 
     def _sent_without_response(self, send_time_before):
         """Used internally to determine whether the request has not received any response from the container and was
@@ -74,17 +115,22 @@ class RequestEvent(object):  # pylint: disable=too-many-instance-attributes
             LinkException: Request failed due to a network related problem.
         """
         if self.__event.is_set():
-            if self.exception is not None:
+            if self._exception is not None:
                 # todo better way to raise errors on behalf of other Threads?
-                raise self.exception  # pylint: disable=raising-bad-type
+                raise self._exception  # pylint: disable=raising-bad-type
             return True
         return False
 
     def _set(self):
         """Called internally by Client to indicate this request has finished"""
-        self.__event.set()
-        if self._complete_func:
-            self.__run_completion_func(self._complete_func, self.id_)
+        with self.__lock:
+            self.__event.set()
+            callbacks = self.__done_callbacks or ()
+            self.__done_callbacks = None
+        for func in self._complete_funcs:
+            self.__run_completion_func(func, self.id_)
+        for func in callbacks:
+            self.__run_completion_func(partial(func, self), self.id_)
 
     @staticmethod
     def __run_completion_func(func, req_id):
@@ -97,15 +143,96 @@ class RequestEvent(object):  # pylint: disable=too-many-instance-attributes
     def _run_on_completion(self, func, *args, **kwargs):
         """Function to call when request has finished, after having been _set(). The first argument passed to func will
         be the request itself. Additional parameters are NOT validated. If the request is already finished, the given
-        function will be run immediately (in same thread).
+        function will be run immediately (in same thread). Multiple functions can be added and are run in the order in
+        which they were added. Note that functions might also be called (before completion) when wait() times out.
+        """
+        func = partial(func, self, *args, **kwargs)
+        with self.__lock:
+            if not self.__event.is_set():
+                self._complete_funcs.append(func)
+                return
+        self.__run_completion_func(func, self.id_)
+
+    def add_done_callback(self, func):
+        """Run func (with the request as its only argument) once the request has finished. If the request has finished
+        already, func is called immediately (in the same thread). Unlike with _run_on_completion, func is never called
+        before the request has finished. Exceptions raised by func are logged and ignored."""
+        with self.__lock:
+            if not self.__event.is_set():
+                self.__done_callbacks.append(func)
+                return
+        self.__run_completion_func(partial(func, self), self.id_)
+
+    def _remove_done_callback(self, func):
+        """Used by waiting helpers to stop being notified"""
+        with self.__lock:
+            if self.__done_callbacks:
+                try:
+                    self.__done_callbacks.remove(func)
+                except ValueError:
+                    pass
+
+    def done(self):
+        """
+        Returns:
+            True if the request has finished (successfully or otherwise). Never raises an exception, unlike is_set().
+        """
+        return self.__event.is_set()
+
+    @staticmethod
+    def cancel():
+        """Requests cannot be cancelled
+
+        Returns:
+            False
+        """
+        return False
+
+    @staticmethod
+    def cancelled():
+        return False
+
+    def running(self):
+        return not self.__event.is_set()
+
+    @property
+    def exception(self):
+        """Call as exception(timeout=None), as with concurrent.futures.Future.
+
+        Returns:
+            The exception (e.g. LinkException) with which the request failed or None. Note that requests which were
+            processed but unsuccessful (see success attribute) do not have an exception.
+
+        Raises:
+            TimeoutError: if the request does not finish within timeout seconds
+
+        Note:
+            exception used to be an attribute holding the exception (or None). For compatibility, the truth value of
+            the (uncalled) exception method is that of the stored exception, e.g. `if evt.exception:` still works but
+            raises a DeprecationWarning. Other uses of it as an attribute (e.g. `evt.exception is None` or
+            `raise evt.exception`) no longer work and must be replaced by calls.
+        """
+        return _ExceptionMethod(self)
+
+    def _wait_for_exception(self, timeout=None):
+        """See exception()"""
+        if not self.__event.wait(timeout):
+            raise TimeoutError()
+        return self._exception
+
+    def result(self, timeout=None):
         """
-        if self._complete_func is not None:
-            raise ValueError('Completion function already set for %s: %s' % (self.id_, self._complete_func))
+        Returns:
+            The request's payload (also for unsuccessful requests)
 
-        if not self.__event.is_set():
-            self._complete_func = partial(func, self, *args, **kwargs)
-        else:
-            self.__run_completion_func(partial(func, self, *args, **kwargs), self.id_)
+        Raises:
+            TimeoutError: if the request does not finish within timeout seconds
+            LinkException: Request failed due to a network related problem.
+        """
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception  # pylint: disable=raising-bad-type
+        return self.payload
 
     def wait(self, timeout=None):
         """Wait for the request to finish, optionally timing out.
@@ -117,13 +244,110 @@ class RequestEvent(object):  # pylint: disable=too-many-instance-attributes
             LinkException: Request failed due to a network related problem.
         """
         if self.__event.wait(timeout):
-            if self.exception is not None:
+            if self._exception is not None:
                 # todo better way to raise errors on behalf of other Threads?
-                raise self.exception  # pylint: disable=raising-bad-type
+                raise self._exception  # pylint: disable=raising-bad-type
             return True
 
         # Won't have been called in case a) _set() hasn't be called and b) request didn't complete before wait (see
         # _run_on_completion).
-        if self._complete_func:
-            self.__run_completion_func(self._complete_func, self.id_)
+        for func in self._complete_funcs:
+            self.__run_completion_func(func, self.id_)
         return False
+
+
+class _Waiter(object):
+    """Collects finished requests, signalling a single condition (rather than waiting on each request's own event)"""
+
+    def __init__(self):
+        self.__cond = Condition(Lock())
+        self.__finished = deque()
+
+    def add(self, event):
+        with self.__cond:
+            self.__finished.append(event)
+            self.__cond.notify()
+
+    def get(self, end_time):
+        """Returns next finished request or None if none finished before end_time (or if None, waits indefinitely)"""
+        with self.__cond:
+            while not self.__finished:
+                if end_time is None:
+                    self.__cond.wait()
+                else:
+                    remaining = end_time - monotonic()
+                    if remaining <= 0:
+                        return None
+                    self.__cond.wait(remaining)
+            return self.__finished.popleft()
+
+
+DoneAndNotDone = namedtuple('DoneAndNotDone', 'done not_done')
+
+
+def __wait(events, timeout, count):
+    """Wait until count of the given events have finished. Returns DoneAndNotDone"""
+    pending = set(events)
+    done = set(event for event in pending if event.done())
+    pending -= done
+    if len(done) >= count or not pending:
+        return DoneAndNotDone(done, pending)
+    end_time = None if timeout is None else monotonic() + timeout
+    waiter = _Waiter()
+    for event in pending:
+        event.add_done_callback(waiter.add)
+    try:
+        while len(done) < count and pending:
+            event = waiter.get(end_time)
+            if event is None:
+                break
+            done.add(event)
+            pending.discard(event)
+    finally:
+        for event in pending:
+            event._remove_done_callback(waiter.add)
+    return DoneAndNotDone(done, pending)
+
+
+def wait_all(events, timeout=None):
+    """Wait for all of the given requests to finish, for at most timeout seconds.
+
+    Returns:
+        Named tuple of sets (done, not_done), as with concurrent.futures.wait. Does not raise exceptions of failed
+        requests.
+    """
+    events = list(events)
+    return __wait(events, timeout, len(events))
+
+
+def wait_any(events, timeout=None):
+    """Wait for at least one of the given requests to finish, for at most timeout seconds.
+
+    Returns:
+        Named tuple of sets (done, not_done), as with concurrent.futures.wait
+    """
+    return __wait(events, timeout, 1)
+
+
+def as_completed(events, timeout=None):
+    """Yields the given requests as they finish (already finished ones first).
+
+    Raises:
+        TimeoutError: If not all requests have finished within timeout seconds (from the original call)
+    """
+    end_time = None if timeout is None else monotonic() + timeout
+    pending = set(events)
+    total = len(pending)
+    waiter = _Waiter()
+    for event in pending:
+        event.add_done_callback(waiter.add)
+    try:
+        while pending:
+            event = waiter.get(end_time)
+            if event is None:
+                raise TimeoutError('%d (of %d) requests still pending' % (len(pending), total))
+            pending.discard(event)
+            yield event
+    finally:
+        for event in pending:
+            event._remove_done_callback(waiter.add)
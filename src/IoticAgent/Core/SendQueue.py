@@ -0,0 +1,109 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Prioritised queue for outgoing requests
+"""
+
+from __future__ import unicode_literals
+
+from collections import deque
+from threading import Condition
+
+from .compat import Lock, Empty, Full, monotonic
+from .RateLimiter import try_acquire_all
+from .utils import validate_nonnegative_int
+
+# Priority lanes, highest priority first
+LANE_CONTROL = 0  # control (tell) confirmations & pings
+LANE_DEFAULT = 1  # CRUD, metadata and any other requests
+LANE_BULK = 2     # feed data shares
+LANES = (LANE_CONTROL, LANE_DEFAULT, LANE_BULK)
+
+
+class SendQueue(object):
+    """FIFO queue with multiple priority lanes. Items are always retrieved from the highest priority lane which is
+    neither empty nor throttled. Each lane has its own size limit and optionally its own throttlers. Threadsafe."""
+
+    def __init__(self, lanes):
+        """
+        `lanes` - sequence of (maxsize, throttlers) tuples, one for each lane in LANES. A maxsize of zero means the
+                  lane is unlimited. throttlers (sequence of RateLimiter instances) only apply to retrieval from the
+                  given lane and are never waited on.
+        """
+        if len(lanes) != len(LANES):
+            raise ValueError('lanes should contain %d items' % len(LANES))
+        self.__queues = tuple(deque() for _ in LANES)
+        self.__maxsizes = tuple(validate_nonnegative_int(maxsize, 'maxsize', allow_zero=True) for maxsize, _ in lanes)
+        self.__throttlers = tuple(tuple(throttlers) for _, throttlers in lanes)
+        self.__not_empty = Condition(Lock())
+
+    def qsize(self, lane=None):
+        """Number of items in the given lane (or all lanes, if not specified)"""
+        with self.__not_empty:
+            if lane is None:
+                return sum(len(queue) for queue in self.__queues)
+            return len(self.__queues[lane])
+
+    def put_nowait(self, item, lane=LANE_DEFAULT):
+        """Add item to the given lane.
+
+        Raises:
+            Full - if the lane has reached its size limit
+        """
+        with self.__not_empty:
+            queue = self.__queues[lane]
+            maxsize = self.__maxsizes[lane]
+            if maxsize and len(queue) >= maxsize:
+                raise Full
+            queue.append(item)
+            self.__not_empty.notify()
+
+    def get(self, block=True, timeout=None):
+        """Remove and return next item, optionally waiting (for at most timeout seconds) if none is available.
+
+        Raises:
+            Empty - if no (unthrottled) item is available
+        """
+        with self.__not_empty:
+            if timeout is not None:
+                end_time = monotonic() + timeout
+            while True:
+                found, item, delay = self.__next()
+                if found:
+                    return item
+                if not block:
+                    raise Empty
+                if timeout is None:
+                    remaining = delay
+                else:
+                    remaining = end_time - monotonic()
+                    if remaining <= 0:
+                        raise Empty
+                    if delay is not None:
+                        remaining = min(remaining, delay)
+                self.__not_empty.wait(remaining)
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def __next(self):
+        """Returns tuple of whether an item was found, the item and (if not found) the minimum time until a throttled
+        lane becomes available (or None if all lanes are empty). Must be called within lock."""
+        min_delay = None
+        for queue, throttlers in zip(self.__queues, self.__throttlers):
+            if queue:
+                delay = try_acquire_all(throttlers)
+                if not delay:
+                    return True, queue.popleft(), None
+                min_delay = delay if min_delay is None else min(min_delay, delay)
+        return False, None, min_delay
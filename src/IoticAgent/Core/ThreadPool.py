@@ -14,74 +14,173 @@
 
 from __future__ import unicode_literals
 
-from threading import Thread
+from collections import deque
+from itertools import count
+from threading import Thread, Condition, current_thread
 import logging
 logger = logging.getLogger(__name__)
 
-from .compat import Queue, Empty, Event, Lock
+from .compat import Lock, monotonic
 from .Profiler import profiled_thread
+from .utils import validate_nonnegative_int
 
 DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
 
 
-@profiled_thread
-def worker(num, queue, stop):
-    stop_is_set = stop.is_set
-    queue_get = queue.get
-    queue_task_done = queue.task_done
-
-    while not stop_is_set():
-        try:
-            qmsg = queue_get(timeout=0.2)
-        except Empty:
-            continue  # queue.get timeout ignore
-
-        logger.debug("worker %i calling func %s", num, qmsg['func'])
+def _func_name(func):
+    try:
+        return func.__name__
+    except AttributeError:
         try:
-            qmsg['func'](*qmsg['args'], **qmsg['kwargs'])
+            # allow for functools.partial
+            return '%s (partial: %s, %s)' % (func.func.__name__, func.args, func.keywords)
         except:
-            try:
-                func_name = qmsg['func'].__name__
-            except AttributeError:
-                func = qmsg['func']
-                try:
-                    # allow for functools.partial
-                    func_name = '%s (partial: %s, %s)' % (func.func.__name__, func.args, func.keywords)
-                except:
-                    func_name = 'unknown'
-            logger.warning("Call failed: %s", func_name, exc_info=DEBUG_ENABLED)
-        finally:
-            queue_task_done()
+            return 'unknown'
 
 
 class ThreadPool(object):
+    """Executes submitted functions in worker threads. Idle workers block (rather than poll) until work arrives. The
+    number of workers grows with the number of waiting tasks, up to max_workers, and additional workers exit again
+    after having been idle for idle_timeout seconds. Functions submitted via submit_ordered with the same key are run
+    one at a time, in submission order, whilst those with different keys can run in parallel."""
+
+    def __init__(self, num_workers=1, daemonic=False, max_workers=None, idle_timeout=10):
+        """
+        `num_workers` - (int) Number of workers to keep running
+
+        `daemonic` - (bool) Whether worker threads should be daemonic
 
-    def __init__(self, num_workers=1, daemonic=False):
-        self.__queue = Queue()
-        self.__stop = Event()
-        self.__stop.set()
-        self.__lock = Lock()
-        self.__num_workers = num_workers
+        `max_workers` - (int) Number of workers to scale up to under load. Defaults to num_workers (i.e. fixed size).
+
+        `idle_timeout` - (int) Time (in seconds) after which idle workers beyond num_workers exit
+        """
+        self.__num_workers = validate_nonnegative_int(num_workers, 'num_workers')
+        self.__max_workers = (self.__num_workers if max_workers is None else
+                              validate_nonnegative_int(max_workers, 'max_workers'))
+        if self.__max_workers < self.__num_workers:
+            raise ValueError('max_workers must not be less than num_workers')
+        self.__idle_timeout = validate_nonnegative_int(idle_timeout, 'idle_timeout')
         self.__daemonic = daemonic
-        self.__threads = []
+        self.__cond = Condition(Lock())
+        # runnable tasks: (key, func, args, kwargs)
+        self.__tasks = deque()
+        # key -> further tasks for key, waiting for the current (queued or running) one to finish
+        self.__keyed = {}
+        self.__threads = set()
+        self.__idle = 0
+        self.__stopped = True
+        self.__thread_num = count()
+
+    @property
+    def workers(self):
+        """Current number of worker threads"""
+        return len(self.__threads)
+
+    def qsize(self):
+        """Number of tasks not yet started"""
+        with self.__cond:
+            return len(self.__tasks) + sum(len(tasks) for tasks in self.__keyed.values())
 
     def start(self):
-        if self.__stop.is_set():
-            self.__stop.clear()
-            for i in range(0, self.__num_workers):
-                thread = Thread(target=worker, name=('tp-%d' % i), args=(i, self.__queue, self.__stop,))
-                thread.daemon = self.__daemonic
-                self.__threads.append(thread)
-            for thread in self.__threads:
-                thread.start()
+        with self.__cond:
+            if not self.__stopped:
+                return
+            self.__stopped = False
+            for _ in range(self.__num_workers):
+                self.__add_worker()
+
+    def stop(self):
+        """Stop workers, waiting for running tasks to finish. Tasks which have not started yet remain queued (and will
+        run if the pool is started again)."""
+        with self.__cond:
+            if self.__stopped:
+                return
+            self.__stopped = True
+            self.__cond.notify_all()
+            threads = list(self.__threads)
+        for thread in threads:
+            thread.join()
 
     def submit(self, func, *args, **kwargs):
-        with self.__lock:
-            self.__queue.put({'func': func, 'args': args, 'kwargs': kwargs})
+        self.submit_ordered(None, func, *args, **kwargs)
 
-    def stop(self):
-        if not self.__stop.is_set():
-            self.__stop.set()
-            for thread in self.__threads:
-                thread.join()
-            del self.__threads[:]
+    def submit_ordered(self, key, func, *args, **kwargs):
+        """Like submit() but func only runs once all functions previously submitted with the same key have finished. A
+        key of None means no ordering applies."""
+        task = (key, func, args, kwargs)
+        with self.__cond:
+            if key is not None:
+                pending = self.__keyed.get(key)
+                if pending is not None:
+                    pending.append(task)
+                    return
+                # subsequent tasks with the same key wait for this one
+                self.__keyed[key] = deque()
+            self.__schedule(task)
+
+    def __schedule(self, task):
+        """Make task runnable. Must be called within lock."""
+        tasks = self.__tasks
+        tasks.append(task)
+        if self.__idle:
+            self.__cond.notify()
+        if len(tasks) > self.__idle and len(self.__threads) < self.__max_workers and not self.__stopped:
+            self.__add_worker()
+
+    def __add_worker(self):
+        """Must be called within lock"""
+        thread = Thread(target=self.__worker, name='tp-%d' % next(self.__thread_num))
+        thread.daemon = self.__daemonic
+        self.__threads.add(thread)
+        thread.start()
+
+    def __next_task(self):
+        """
+        Returns:
+            The next task or None if the calling worker should exit. Must be called within lock.
+        """
+        cond = self.__cond
+        tasks = self.__tasks
+        idle_since = None
+        while not (tasks or self.__stopped):
+            surplus = len(self.__threads) > self.__num_workers
+            if surplus:
+                if idle_since is None:
+                    idle_since = monotonic()
+                elif monotonic() - idle_since >= self.__idle_timeout:
+                    return None
+            self.__idle += 1
+            try:
+                cond.wait(self.__idle_timeout if surplus else None)
+            finally:
+                self.__idle -= 1
+        if self.__stopped:
+            return None
+        return tasks.popleft()
+
+    @profiled_thread
+    def __worker(self):
+        cond = self.__cond
+        try:
+            while True:
+                with cond:
+                    task = self.__next_task()
+                if task is None:
+                    break
+                key, func, args, kwargs = task
+                if DEBUG_ENABLED:
+                    logger.debug("calling func %s", func)
+                try:
+                    func(*args, **kwargs)
+                except:
+                    logger.warning("Call failed: %s", _func_name(func), exc_info=DEBUG_ENABLED)
+                if key is not None:
+                    with cond:
+                        pending = self.__keyed[key]
+                        if pending:
+                            self.__schedule(pending.popleft())
+                        else:
+                            del self.__keyed[key]
+        finally:
+            with cond:
+                self.__threads.discard(current_thread())
@@ -0,0 +1,205 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Fast parsing & formatting of the (fixed format) ISO 8601 timestamps used by the QAPI, e.g.
+2019-01-31T12:34:56.789123Z. Parsed timestamps can be returned as naive (UTC) datetime instances, seconds since the
+(UNIX) epoch or numpy.datetime64 (if numpy is available).
+"""
+
+from __future__ import unicode_literals
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+from time import time as _epoch_now
+from warnings import warn
+
+try:
+    from numpy import datetime64
+except ImportError:
+    NUMPY_AVAILABLE = False
+else:
+    NUMPY_AVAILABLE = True
+
+from .Const import TimeType
+
+# Only used where parsing falls back to strptime (i.e. for unexpected formatting)
+TIME_FMT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+_EPOCH = datetime(1970, 1, 1)
+_ZERO = timedelta(0)
+_DIGITS = frozenset('0123456789')
+
+
+def _fields(value):
+    """
+    Returns:
+        Tuple of year, month, day, hour, minute, second & microsecond from given timestamp string. Raises ValueError if
+        the string does not match the expected format (or contains out-of-range values) and TypeError if value is not
+        a string.
+    """
+    # Fixed positions up to seconds, followed by 1-6 fractional digits
+    try:
+        if not (value[4] == '-' and value[7] == '-' and value[10] == 'T' and value[13] == ':' and value[16] == ':' and
+                value[19] == '.' and value[-1] == 'Z' and 21 <= len(value) <= 27):
+            raise ValueError('Invalid timestamp: %s' % value)
+    except IndexError:
+        raise ValueError('Invalid timestamp: %s' % value)
+    # int() would also accept e.g. signs & whitespace
+    fraction = value[20:-1]
+    if not _DIGITS.issuperset(value[:4] + value[5:7] + value[8:10] + value[11:13] + value[14:16] + value[17:19] +
+                              fraction):
+        raise ValueError('Invalid timestamp: %s' % value)
+    return (int(value[:4]), int(value[5:7]), int(value[8:10]), int(value[11:13]), int(value[14:16]),
+            int(value[17:19]), int(fraction) * 10 ** (6 - len(fraction)))
+
+
+def parse_datetime(value):
+    """
+    Returns:
+        Naive datetime (in UTC) for given timestamp string. Raises ValueError/TypeError like datetime.strptime.
+    """
+    try:
+        return datetime(*_fields(value))
+    except TypeError:
+        # not a string (e.g. None) or the like
+        return datetime.strptime(value, TIME_FMT)
+
+
+def _days_from_civil(year, month, day):
+    """Days since 1970-01-01 for the given (proleptic Gregorian) date"""
+    year -= month <= 2
+    era = (year if year >= 0 else year - 399) // 400
+    yoe = year - era * 400
+    doy = (153 * (month + (-3 if month > 2 else 9)) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def parse_epoch(value):
+    """
+    Returns:
+        Seconds since the epoch (float) for given timestamp string. Raises ValueError/TypeError like parse_datetime.
+    """
+    try:
+        year, month, day, hour, minute, second, micro = _fields(value)
+    except TypeError:
+        return datetime_to_epoch(datetime.strptime(value, TIME_FMT))
+    if not (1 <= month <= 12 and 1 <= day <= 28 and hour < 24 and minute < 60 and second < 60):
+        # let datetime check the remaining days of the month (and produce an appropriate error if out of range)
+        return datetime_to_epoch(datetime(year, month, day, hour, minute, second, micro))
+    return ((_days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second) +
+            micro / 1000000.0)
+
+
+def parse_datetime64(value):
+    """
+    Returns:
+        numpy.datetime64 (microsecond precision) for given timestamp string. Requires numpy.
+    """
+    return datetime64(datetime(*_fields(value)), 'us')
+
+
+def format_datetime(time):
+    """
+    Returns:
+        Timestamp string for the given datetime instance, which must be either naive (UTC) or have a zero UTC offset.
+        Unlike strftime, this always uses (at least) four digits for the year.
+    """
+    return '%04d-%02d-%02dT%02d:%02d:%02d.%06dZ' % (time.year, time.month, time.day, time.hour, time.minute,
+                                                    time.second, time.microsecond)
+
+
+def datetime_to_epoch(time):
+    """
+    Returns:
+        Seconds since the epoch for given datetime instance (which, if naive, is assumed to be in UTC)
+    """
+    offset = time.utcoffset()
+    if offset is not None:
+        time = time.replace(tzinfo=None) - offset
+    return (time - _EPOCH).total_seconds()
+
+
+def datetime_to_datetime64(time):
+    """
+    Returns:
+        numpy.datetime64 for given datetime instance (which, if naive, is assumed to be in UTC). Requires numpy.
+    """
+    offset = time.utcoffset()
+    if offset is not None:
+        time = time.replace(tzinfo=None) - offset
+    return datetime64(time, 'us')
+
+
+def _datetime64_now():
+    return datetime64(datetime.utcnow(), 'us')
+
+
+def _identity(value):
+    return value
+
+
+TimeConverter = namedtuple('TimeConverter', 'parse from_datetime now')
+TimeConverter.__doc__ = """Functions for a single time representation (see TimeType). `parse` converts a timestamp
+string, `from_datetime` a datetime instance and `now` returns the current time."""
+
+__CONVERTERS = {
+    TimeType.DATETIME: TimeConverter(parse_datetime, _identity, datetime.utcnow),
+    TimeType.EPOCH: TimeConverter(parse_epoch, datetime_to_epoch, _epoch_now),
+    TimeType.DATETIME64: TimeConverter(parse_datetime64, datetime_to_datetime64, _datetime64_now)
+}
+
+
+def get_converter(time_type):
+    """
+    Returns:
+        TimeConverter for the given TimeType
+
+    Raises:
+        ValueError - if the time type requires numpy which is not available
+    """
+    if time_type == TimeType.DATETIME64 and not NUMPY_AVAILABLE:
+        raise ValueError('%s requires numpy' % time_type)
+    return __CONVERTERS[time_type]
+
+
+def __benchmark(count=100000):
+    """Compare parsing & formatting against datetime.strptime/strftime"""
+    from timeit import timeit
+
+    now = datetime.utcnow()
+    value = now.strftime(TIME_FMT)
+    assert parse_datetime(value) == datetime.strptime(value, TIME_FMT)
+    assert format_datetime(now) == value
+    assert abs(parse_epoch(value) - datetime_to_epoch(now)) < 1e-6
+
+    tests = [('strptime', lambda: datetime.strptime(value, TIME_FMT)),
+             ('parse_datetime', lambda: parse_datetime(value)),
+             ('parse_epoch', lambda: parse_epoch(value))]
+    if NUMPY_AVAILABLE:
+        tests.append(('parse_datetime64', lambda: parse_datetime64(value)))
+    else:
+        warn('numpy not available, skipping datetime64', ImportWarning)
+    tests.extend((('strftime', lambda: now.strftime(TIME_FMT)),
+                  ('format_datetime', lambda: format_datetime(now))))
+
+    baseline = None
+    for name, func in tests:
+        duration = timeit(func, number=count)
+        if name in ('strptime', 'strftime'):
+            baseline = duration
+        print('%-16s %8.0f ops/s (x%.2f)' % (name, count / duration, baseline / duration))
+
+
+if __name__ == '__main__':
+    __benchmark()
@@ -0,0 +1,80 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Time-ordered index (e.g. of request send times or deadlines)
+"""
+
+from __future__ import unicode_literals
+
+from heapq import heappush, heappop, heapify
+from itertools import count
+
+from .compat import Lock
+
+
+class TimeIndex(object):
+    """Min-heap of (time, key, value) entries. Entries are not removed when they become obsolete (e.g. when a request
+    finishes) - instead they are checked via a validation function as they are retrieved and discarded if no longer
+    valid. Threadsafe."""
+
+    def __init__(self):
+        # (time, tiebreaker, key, value)
+        self.__heap = []
+        self.__counter = count()
+        self.__lock = Lock()
+
+    def __len__(self):
+        return len(self.__heap)
+
+    def push(self, time, key, value=None):
+        with self.__lock:
+            heappush(self.__heap, (time, next(self.__counter), key, value))
+
+    def next_time(self):
+        """
+        Returns:
+            Earliest time in index (which might belong to an obsolete entry) or None if empty
+        """
+        try:
+            return self.__heap[0][0]
+        except IndexError:
+            return None
+
+    def pop_before(self, time, is_valid=None):
+        """Remove all entries with a time lower than the given one
+
+        `is_valid` - (func) called with time, key & value of each entry. Entries for which it does not return True are
+                     discarded.
+
+        Returns:
+            List of (time, key, value) tuples of valid entries, in time order
+        """
+        result = []
+        # avoid locking if nothing is due
+        first = self.next_time()
+        if first is None or first >= time:
+            return result
+        with self.__lock:
+            heap = self.__heap
+            while heap and heap[0][0] < time:
+                entry_time, _, key, value = heappop(heap)
+                if is_valid is None or is_valid(entry_time, key, value):
+                    result.append((entry_time, key, value))
+        return result
+
+    def compact(self, is_valid):
+        """Discard all entries for which is_valid (see pop_before) does not return True. This is O(n) and so should
+        only be called once the index contains sufficiently many obsolete entries."""
+        with self.__lock:
+            self.__heap = heap = [entry for entry in self.__heap if is_valid(entry[0], entry[2], entry[3])]
+            heapify(heap)
@@ -21,6 +21,7 @@ from warnings import warn
 from . import Const
 from .compat import (PY3, string_types, int_types, arg_checker, ensure_ascii, ensure_unicode, number_types,
                      raise_from, Sequence, Mapping, re_compile)
+from .TimeCodec import format_datetime
 
 
 VALIDATION_LID_LEN = 64
@@ -231,7 +232,7 @@ class Validation(object):  # pylint: disable=too-many-public-methods
             offset = time.utcoffset()
             if offset not in cls.__zeroOffsetOrNone:
                 raise ValueError('datetime instance must be naive or have zero UTC offset')
-        return ensure_unicode(time.strftime(VALIDATION_TIME_FMT)) if to_iso8601 else time
+        return format_datetime(time) if to_iso8601 else time
 
     @staticmethod
     def foc_check(foc):
@@ -384,6 +385,14 @@ class Validation(object):  # pylint: disable=too-many-public-methods
     def describe_scope_check_convert(cls, type_):
         return cls.__check_convert_str_enum(Const.DescribeScope, 'Describe scope', 'scope', type_)
 
+    @classmethod
+    def time_type_check_convert(cls, time_type):
+        return cls.__check_convert_str_enum(Const.TimeType, 'Time type', 'time_type', time_type)
+
+    @classmethod
+    def queue_policy_check_convert(cls, policy):
+        return cls.__check_convert_str_enum(Const.QueuePolicy, 'Queue policy', 'queue_policy', policy)
+
     @staticmethod
     def __check_convert_str_enum(enum_cls, enum_name, var_name, value):
         if isinstance(value, enum_cls):
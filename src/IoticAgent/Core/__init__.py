@@ -14,7 +14,8 @@
 """IoticAgent.Core module provides a Thread Safe AMQP Client connection to the Iotic Labs QAPI
 
 Calling a request function returns a Core.RequestEvent instance on which the caller can .wait
-Or check using the RequestEvent.is_set function
+Or check using the RequestEvent.is_set function. RequestEvent also implements the concurrent.futures.Future interface
+and many requests can be waited for at once using wait_all, wait_any or as_completed.
 
 When the event is complete event.requestId, success and payload will be populated.
 RequestEvent._messages will contain the raw messages from the queue.
@@ -28,7 +29,8 @@ from . import Const  # noqa
 
 from .Client import Client  # noqa
 
-from .RequestEvent import RequestEvent  # noqa
+from .RequestEvent import RequestEvent, wait_all, wait_any, as_completed  # noqa
+from .LazyPayload import LazyPayload  # noqa
 from .ThreadSafeDict import ThreadSafeDict  # noqa
 from .Validation import Validation  # noqa
 
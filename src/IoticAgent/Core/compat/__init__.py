@@ -173,6 +173,13 @@ try:
 except ImportError:
     from time import time as monotonic  # noqa (unused import)
 
+try:
+    # only available since 3.3
+    from os import replace as replace_file  # noqa (unused import)
+except ImportError:
+    # not atomic (and fails if destination exists) on Windows
+    from os import rename as replace_file  # noqa (unused import)
+
 
 def py_version_check():
     if not ((version_info[0] == 3 and version_info[1] >= 2) or
@@ -0,0 +1,271 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""asyncio interface for IOT.Client (Python 3.5+ only)
+"""
+
+import asyncio
+from functools import partial
+import logging
+logger = logging.getLogger(__name__)
+DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
+
+from IoticAgent.Core.compat import raise_from
+from IoticAgent.Core.Const import R_CONTROL, P_ENTITY_LID, P_LID
+from IoticAgent.Core.Validation import Validation
+
+from .Client import Client, DescribeScope
+from .Exceptions import IOTClientError, IOTSyncTimeout
+
+
+class AsyncClient(object):  # pylint: disable=too-many-public-methods
+    """
+    Provides awaitable versions of IOT.Client, Thing, Point & RemotePoint requests. Instead of blocking a thread for
+    each outstanding request (as the synchronous methods do), completion of the underlying request is signalled to the
+    event loop, so any number of requests can be outstanding concurrently.
+
+    Any other request made via the `*_async` methods of the synchronous API can be awaited using `request()`.
+
+    **Example**
+
+    ::
+
+        async def main(loop):
+            async with AsyncClient(IOT.Client('my_script.ini'), loop=loop) as aclient:
+                thing = await aclient.create_thing('my_thing')
+                feeds = await asyncio.gather(*(aclient.create_feed(thing, 'feed%d' % i) for i in range(1000)))
+
+    Note:
+        All coroutines must be run on the loop the instance was created for. Feed data & control request callbacks
+        passed to this class are run on the loop too (see `callback()`).
+    """
+
+    def __init__(self, client, loop=None):
+        """
+        Args:
+            client: :doc:`IoticAgent.IOT.Client` instance to use. It can be started either before or via `start()`.
+            loop (optional): Event loop on which requests complete and callbacks are run. Defaults to the current loop.
+        """
+        if not isinstance(client, Client):
+            raise ValueError('client should be IOT.Client instance')
+        self.__client = client
+        self.__loop = loop or asyncio.get_event_loop()
+
+    @property
+    def client(self):
+        """The (synchronous) :doc:`IoticAgent.IOT.Client` instance in use"""
+        return self.__client
+
+    @property
+    def loop(self):
+        """Event loop in use"""
+        return self.__loop
+
+    async def start(self):
+        """Start the underlying client, without blocking the event loop. See :doc:`IoticAgent.IOT.Client`
+        Client.start"""
+        await self.__loop.run_in_executor(None, self.__client.start)
+        return self
+
+    async def stop(self):
+        """Stop the underlying client, without blocking the event loop"""
+        await self.__loop.run_in_executor(None, self.__client.stop)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    def wrap(self, event):
+        """
+        Returns:
+            asyncio.Future which completes (with the given RequestEvent as result) when the request finishes. If the
+            request failed due to a network related problem, the future raises LinkException instead. Unlike
+            `request()` no timeout applies and unsuccessful requests are not turned into exceptions.
+        """
+        future = self.__loop.create_future()
+        event.add_done_callback(partial(self.__event_done, future))
+        return future
+
+    def __event_done(self, future, event):
+        # Called from arbitrary thread
+        self.__loop.call_soon_threadsafe(self.__resolve, future, event)
+
+    @staticmethod
+    def __resolve(future, event):
+        # e.g. cancelled due to timeout
+        if future.done():
+            return
+        exception = event.exception()
+        if exception is None:
+            future.set_result(event)
+        else:
+            future.set_exception(exception)
+
+    async def request(self, event, timeout=None):
+        """
+        Wait for the given request to finish. This is the asynchronous equivalent of how synchronous IOT methods wait
+        for their requests, e.g. `await aclient.request(client.delete_thing_async('my_thing'))`.
+
+        Returns:
+            The (finished) RequestEvent
+
+        Raises:
+            IOTSyncTimeout: If the request does not finish within timeout (or if not specified, the client's configured
+                sync_timeout) seconds
+            IOTException: Infrastructure problem detected
+            LinkException: Communications problem between you and the infrastructure
+        """
+        try:
+            await asyncio.wait_for(self.wrap(event), timeout or self.__client.sync_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.__client._except_if_failed(event)
+        return event
+
+    def callback(self, func):
+        """
+        Adapt the given function so that it runs on the event loop. This applies automatically to callbacks passed to
+        methods of this class but can also be used to e.g. register coroutines via the synchronous API::
+
+            client.register_catchall_feeddata(aclient.callback(my_coroutine))
+
+        Returns:
+            A function which can be called from any thread. If func is a coroutine function, it is scheduled as a task
+            on the loop, otherwise it is called via the loop. (None if func is None.)
+        """
+        if func is None:
+            return None
+        Validation.callable_check(func)
+        loop = self.__loop
+        if asyncio.iscoroutinefunction(func):
+            return partial(self.__run_coroutine, loop, func)
+        return partial(loop.call_soon_threadsafe, func)
+
+    @staticmethod
+    def __run_coroutine(loop, func, *args):
+        asyncio.run_coroutine_threadsafe(func(*args), loop).add_done_callback(AsyncClient.__log_callback_failure)
+
+    @staticmethod
+    def __log_callback_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning('Callback coroutine failed', exc_info=future.exception())
+
+    async def create_thing(self, lid):
+        """See :doc:`IoticAgent.IOT.Client` Client.create_thing"""
+        await self.request(self.__client.create_thing_async(lid))
+        try:
+            return self.__client.get_thing(lid)
+        except KeyError as ex:
+            raise raise_from(IOTClientError('Thing %s not in cache (post-create)' % lid), ex)
+
+    async def delete_thing(self, lid):
+        """See :doc:`IoticAgent.IOT.Client` Client.delete_thing"""
+        await self.request(self.__client.delete_thing_async(lid))
+
+    async def describe(self, guid_or_resource, lang=None, scope=DescribeScope.AUTO):
+        """See :doc:`IoticAgent.IOT.Client` Client.describe"""
+        evt = await self.request(self.__client.describe_async(guid_or_resource, lang=lang, scope=scope))
+        return evt.payload['result']
+
+    async def confirm_tell(self, data, success):
+        """See :doc:`IoticAgent.IOT.Client` Client.confirm_tell"""
+        logger.info("confirm_tell(success=%s) [lid=\"%s\",pid=\"%s\"]", success, data[P_ENTITY_LID], data[P_LID])
+        await self.request(self.__client._request_point_confirm_tell(R_CONTROL, data[P_ENTITY_LID], data[P_LID],
+                                                                     success, data['requestId']))
+
+    async def create_feed(self, thing, pid, save_recent=0):
+        """See :doc:`IoticAgent.IOT.Thing` Thing.create_feed"""
+        await self.request(thing.create_feed_async(pid, save_recent=save_recent))
+        try:
+            return thing.get_feed(pid)
+        except KeyError as ex:
+            raise raise_from(IOTClientError('Feed %s (from %s) not in cache (post-create)' % (pid, thing.lid)), ex)
+
+    async def create_control(self, thing, pid, callback, callback_parsed=None):
+        """See :doc:`IoticAgent.IOT.Thing` Thing.create_control. The callbacks are run on the event loop."""
+        await self.request(thing.create_control_async(pid, self.callback(callback),
+                                                      callback_parsed=self.callback(callback_parsed)))
+        try:
+            return thing.get_control(pid)
+        except KeyError as ex:
+            raise raise_from(IOTClientError('Control %s (from %s) not in cache (post-create)' % (pid, thing.lid)), ex)
+
+    async def delete_feed(self, thing, pid):
+        """See :doc:`IoticAgent.IOT.Thing` Thing.delete_feed"""
+        await self.request(thing.delete_feed_async(pid))
+
+    async def delete_control(self, thing, pid):
+        """See :doc:`IoticAgent.IOT.Thing` Thing.delete_control"""
+        await self.request(thing.delete_control_async(pid))
+
+    async def follow(self, thing, gpid, callback=None, callback_parsed=None, **queue_kwargs):
+        """See :doc:`IoticAgent.IOT.Thing` Thing.follow. The callbacks are run on the event loop."""
+        await self.request(thing.follow_async(gpid, callback=self.callback(callback),
+                                              callback_parsed=self.callback(callback_parsed), **queue_kwargs))
+        try:
+            return thing.get_remote_feed(gpid)
+        except KeyError as ex:
+            raise raise_from(IOTClientError('Subscription for %s (from %s) not in cache (post-create)' %
+                                            (gpid, thing.lid)), ex)
+
+    async def attach(self, thing, gpid):
+        """See :doc:`IoticAgent.IOT.Thing` Thing.attach"""
+        await self.request(thing.attach_async(gpid))
+        try:
+            return thing.get_remote_control(gpid)
+        except KeyError as ex:
+            raise raise_from(IOTClientError('Subscription for %s (from %s) not in cache (post-create)' %
+                                            (gpid, thing.lid)), ex)
+
+    async def share(self, feed, data, mime=None, time=None):
+        """See :doc:`IoticAgent.IOT.Point` Feed.share"""
+        await self.request(feed.share_async(data, mime=mime, time=time))
+
+    async def get_recent(self, remote_feed, count):
+        """See :doc:`IoticAgent.IOT.RemotePoint` RemoteFeed.get_recent
+
+        Returns:
+            List of samples (rather than an iterable)
+        """
+        samples = remote_feed._get_cached_recent(count)
+        if samples is None:
+            samples = []
+            await self.request(remote_feed.get_recent_async(count, samples.append))
+        return samples
+
+    async def get_recent_columns(self, remote_feed, count):
+        """See :doc:`IoticAgent.IOT.RemotePoint` RemoteFeed.get_recent_columns"""
+        columns = []
+        # value template might have to be retrieved (synchronously) first
+        evt = await self.__loop.run_in_executor(None, remote_feed.get_recent_columns_async, count, columns.append)
+        await self.request(evt)
+        return columns[0]
+
+    async def ask(self, remote_control, data, mime=None):
+        """See :doc:`IoticAgent.IOT.RemotePoint` RemoteControl.ask"""
+        await self.request(remote_control.ask_async(data, mime=mime))
+
+    async def tell(self, remote_control, data, timeout=10, mime=None):
+        """See :doc:`IoticAgent.IOT.RemotePoint` RemoteControl.tell
+
+        Returns:
+            True on success or else the reason (string)
+        """
+        evt = remote_control.tell_async(data, timeout=timeout, mime=mime)
+        try:
+            await self.request(evt, timeout=timeout)
+        except IOTSyncTimeout:
+            return 'timeout'
+        return True if evt.payload['success'] else evt.payload['reason']
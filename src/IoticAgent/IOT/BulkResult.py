@@ -0,0 +1,50 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Outcome of bulk operations such as Client.create_things & Thing.create_feeds
+"""
+
+from __future__ import unicode_literals
+
+from collections import namedtuple, OrderedDict
+
+
+class BulkResult(namedtuple('nt_BulkResult', 'results errors')):
+    """Per-item outcome of a bulk operation, keyed by local id (in the order given to the operation).
+
+    `results` - OrderedDict of resources (e.g. Thing or Point instances) which were created or already existed
+
+    `errors` - OrderedDict of exceptions (e.g. IOTException, LinkException or ValueError) for items which failed
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """Whether all items succeeded"""
+        return not self.errors
+
+    def error_summary(self):
+        """
+        Returns:
+            OrderedDict of local ids which failed, by exception type name, e.g. {'IOTAccessDenied': ['thing1']}
+        """
+        summary = OrderedDict()
+        for key, ex in self.errors.items():
+            summary.setdefault(type(ex).__name__, []).append(key)
+        return summary
+
+    def __str__(self):
+        summary = ', '.join('%s: %d' % (name, len(keys)) for name, keys in self.error_summary().items())
+        return '%d succeeded, %d failed%s' % (len(self.results), len(self.errors),
+                                              ' (%s)' % summary if summary else '')
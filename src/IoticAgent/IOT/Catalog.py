@@ -0,0 +1,263 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""On-disk catalog of own things, points & subscriptions, used to skip waiting for creation requests after a restart
+"""
+
+from __future__ import unicode_literals
+
+from json import dumps, loads
+import logging
+logger = logging.getLogger(__name__)
+
+from IoticAgent.Core.Const import R_FEED, R_CONTROL
+from IoticAgent.Core.Validation import Validation
+from IoticAgent.Core.compat import Lock, replace_file, string_types
+
+DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
+
+_CATALOG_VERSION = 1
+
+# Kinds of guid index entries
+_THING = 0
+_POINT = 1
+_SUB = 2
+
+
+class Catalog(object):
+    """Global ids of own things (by local id), their points (by type & local id) and subscriptions (by point type &
+    global id or local thing & point id), as learned from creation responses and kept current via renamed, deleted &
+    reassigned notifications. The catalog is loaded from and saved to a file. If no file has been configured, nothing
+    is recorded and all lookups return None. Threadsafe."""
+
+    def __init__(self, epId, path=None):
+        """
+        `epId` - (string) Global id of this agent. Snapshots made by other agents are ignored and things reassigned to
+        other agents are forgotten.
+
+        `path` - (string) Catalog file for use by load() and save()
+        """
+        self.__epId = Validation.guid_check_convert(epId)
+        self.__path = path or None
+        self.__lock = Lock()
+        # lid -> {'id': guid, 'epId': epId, 'points': {(foc, pid): guid}, 'subs': {(foc, gpid): (subid, point guid)}}
+        self.__things = {}
+        # guid -> (kind, lid, key), key being None (thing), (foc, pid) for points or (foc, gpid) for subscriptions
+        self.__index = {}
+
+    def __len__(self):
+        return len(self.__index)
+
+    def thing(self, lid):
+        """
+        Returns:
+            Tuple of guid & agent id of the given thing or None if unknown
+        """
+        with self.__lock:
+            thing = self.__things.get(lid)
+            return None if thing is None else (thing['id'], thing['epId'])
+
+    def point(self, foc, lid, pid):
+        """
+        Returns:
+            Guid of the given point or None if unknown
+        """
+        with self.__lock:
+            thing = self.__things.get(lid)
+            return None if thing is None else thing['points'].get((foc, pid))
+
+    def sub(self, lid, foc, gpid):
+        """
+        `gpid` - Global id of the point or (thing lid, point pid) tuple for local subscriptions
+
+        Returns:
+            Tuple of subscription id & point guid for given subscription of thing or None if unknown
+        """
+        with self.__lock:
+            thing = self.__things.get(lid)
+            return None if thing is None else thing['subs'].get((foc, gpid))
+
+    def add_thing(self, lid, guid, epId):
+        """Record creation of a thing. Points & subscriptions of a previous thing with the same local id are
+        forgotten."""
+        if not self.__path:
+            return
+        with self.__lock:
+            thing = self.__things.get(lid)
+            if thing is not None and thing['id'] == guid:
+                thing['epId'] = epId
+                return
+            self.__remove_thing(lid)
+            self.__add_thing(lid, {'id': guid, 'epId': epId, 'points': {}, 'subs': {}})
+
+    def add_point(self, foc, lid, pid, guid):
+        """Record creation of a point of a (recorded) thing"""
+        if not self.__path:
+            return
+        with self.__lock:
+            thing = self.__things.get(lid)
+            if thing is None:
+                return
+            key = (foc, pid)
+            self.__index.pop(thing['points'].get(key), None)
+            thing['points'][key] = guid
+            self.__index[guid] = (_POINT, lid, key)
+
+    def add_sub(self, lid, foc, gpid, subid, point_guid):
+        """Record creation of a subscription by a (recorded) thing. See sub() for `gpid`"""
+        if not self.__path:
+            return
+        with self.__lock:
+            thing = self.__things.get(lid)
+            if thing is None:
+                return
+            key = (foc, gpid)
+            self.__index.pop(thing['subs'].get(key, (None,))[0], None)
+            thing['subs'][key] = (subid, point_guid)
+            self.__index[subid] = (_SUB, lid, key)
+
+    def rename(self, guid, new_lid):
+        """Record renaming of a thing or point"""
+        with self.__lock:
+            try:
+                kind, lid, key = self.__index[guid]
+            except KeyError:
+                return
+            if kind == _THING:
+                thing = self.__things.pop(lid)
+                self.__remove_thing(new_lid)
+                self.__add_thing(new_lid, thing)
+            elif kind == _POINT:
+                points = self.__things[lid]['points']
+                del points[key]
+                new_key = (key[0], new_lid)
+                self.__index.pop(points.get(new_key), None)
+                points[new_key] = guid
+                self.__index[guid] = (kind, lid, new_key)
+
+    def reassign(self, lid, epId):
+        """Record reassignment of a thing. Things assigned to other agents are forgotten."""
+        with self.__lock:
+            thing = self.__things.get(lid)
+            if thing is None:
+                return
+            if epId == self.__epId:
+                thing['epId'] = epId
+            else:
+                self.__remove_thing(lid)
+
+    def remove(self, guid):
+        """Record deletion of a thing (including its points & subscriptions), point or subscription"""
+        with self.__lock:
+            try:
+                kind, lid, key = self.__index[guid]
+            except KeyError:
+                return
+            if kind == _THING:
+                self.__remove_thing(lid)
+            else:
+                del self.__index[guid]
+                del self.__things[lid]['points' if kind == _POINT else 'subs'][key]
+
+    def __add_thing(self, lid, thing):
+        """MUST be called within lock"""
+        self.__things[lid] = thing
+        self.__index[thing['id']] = (_THING, lid, None)
+        for key, guid in thing['points'].items():
+            self.__index[guid] = (_POINT, lid, key)
+        for key, (subid, _) in thing['subs'].items():
+            self.__index[subid] = (_SUB, lid, key)
+
+    def __remove_thing(self, lid):
+        """MUST be called within lock"""
+        thing = self.__things.pop(lid, None)
+        if thing is None:
+            return
+        self.__index.pop(thing['id'], None)
+        for guid in thing['points'].values():
+            self.__index.pop(guid, None)
+        for subid, _ in thing['subs'].values():
+            self.__index.pop(subid, None)
+
+    def load(self):
+        """Load catalog from file, if configured. Failure to do so is logged rather than raised."""
+        if not self.__path:
+            return
+        try:
+            with open(self.__path, 'r') as catalog_file:
+                catalog = loads(catalog_file.read())
+            if catalog.get('version') != _CATALOG_VERSION:
+                raise ValueError('Unsupported catalog version')
+            if catalog['epId'] != self.__epId:
+                logger.warning('Ignoring catalog %s of different agent (%s)', self.__path, catalog['epId'])
+                return
+            things = catalog['things']
+        except IOError as ex:
+            logger.debug('Catalog %s not loaded: %s', self.__path, ex)
+            return
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logger.warning('Ignoring invalid catalog %s', self.__path, exc_info=DEBUG_ENABLED)
+            return
+        loaded = {}
+        for lid, entry in things.items():
+            try:
+                loaded[Validation.lid_check_convert(lid)] = self.__check_thing(entry)
+            except (ValueError, KeyError, TypeError):
+                logger.debug('Ignoring invalid catalog entry for %s', lid, exc_info=DEBUG_ENABLED)
+        with self.__lock:
+            for lid, thing in loaded.items():
+                self.__remove_thing(lid)
+                self.__add_thing(lid, thing)
+        logger.debug('Loaded %d thing(s) from catalog %s', len(loaded), self.__path)
+
+    @staticmethod
+    def __check_thing(entry):
+        points = {}
+        for foc, pid, guid in entry['points']:
+            if foc not in (R_FEED, R_CONTROL):
+                raise ValueError('Invalid point type')
+            points[(foc, Validation.pid_check_convert(pid))] = Validation.guid_check_convert(guid)
+        subs = {}
+        for foc, gpid, subid, point_guid in entry['subs']:
+            if foc not in (R_FEED, R_CONTROL):
+                raise ValueError('Invalid point type')
+            if isinstance(gpid, string_types):
+                gpid = Validation.guid_check_convert(gpid)
+            else:
+                gpid = (Validation.lid_check_convert(gpid[0]), Validation.pid_check_convert(gpid[1]))
+            subs[(foc, gpid)] = (Validation.guid_check_convert(subid), Validation.guid_check_convert(point_guid))
+        return {'id': Validation.guid_check_convert(entry['id']),
+                'epId': Validation.guid_check_convert(entry['epId']),
+                'points': points,
+                'subs': subs}
+
+    def save(self):
+        """Write catalog to file, if configured. Failure to do so is logged rather than raised."""
+        if not self.__path:
+            return
+        with self.__lock:
+            things = {lid: {'id': thing['id'],
+                            'epId': thing['epId'],
+                            'points': [[foc, pid, guid] for (foc, pid), guid in thing['points'].items()],
+                            'subs': [[foc, gpid, subid, point_guid]
+                                     for (foc, gpid), (subid, point_guid) in thing['subs'].items()]}
+                      for lid, thing in self.__things.items()}
+        tmp_path = self.__path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as catalog_file:
+                catalog_file.write(dumps({'version': _CATALOG_VERSION, 'epId': self.__epId, 'things': things}))
+            replace_file(tmp_path, self.__path)
+        except (IOError, OSError):
+            logger.warning('Failed to save catalog %s', self.__path, exc_info=DEBUG_ENABLED)
+        else:
+            logger.debug('Saved %d thing(s) to catalog %s', len(things), self.__path)
@@ -18,21 +18,26 @@ from __future__ import unicode_literals
 
 from warnings import warn
 from functools import partial
+from collections import deque, OrderedDict
 import logging
 logger = logging.getLogger(__name__)
 DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
 
 from IoticAgent.Core import Client as Core_Client, ThreadSafeDict, __version__ as Core_Version
 from IoticAgent.Core.compat import Mapping, raise_from, string_types
+from IoticAgent.Core.Exceptions import LinkException
 from IoticAgent.Core.Const import (
     E_FAILED_CODE_NOTALLOWED, E_FAILED_CODE_UNKNOWN, E_FAILED_CODE_MALFORMED, E_FAILED_CODE_INTERNALERROR,
     E_FAILED_CODE_ACCESSDENIED,
     M_CLIENTREF, M_PAYLOAD,
     R_ENTITY, R_FEED, R_CONTROL, R_SUB,
-    P_CODE, P_ID, P_LID, P_ENTITY_LID, P_EPID, P_RESOURCE, P_MESSAGE, P_POINT_TYPE, P_POINT_ID, P_DATA,
-    SearchScope, SearchType, DescribeScope
+    P_CODE, P_ID, P_LID, P_ENTITY_LID, P_EPID, P_RESOURCE, P_MESSAGE, P_POINT_TYPE, P_POINT_ID, P_POINT_LID,
+    P_POINT_ENTITY_LID, P_DATA,
+    SearchScope, SearchType, DescribeScope, QueuePolicy
 )
 from IoticAgent.Core.utils import validate_nonnegative_int
+from IoticAgent.Core.LazyPayload import LazyPayload
+from IoticAgent.Core.RequestEvent import wait_any
 from IoticAgent.Core.Validation import Validation
 
 from . import __version__
@@ -45,7 +50,12 @@ from .Exceptions import (
 )
 from .Point import Control, Point, _POINT_TYPES
 from .RemotePoint import RemoteFeed, RemoteControl
-from .PointValueHelper import PointDataObjectHandler, RefreshException
+from .PointValueHelper import RefreshException
+from .TemplateCache import TemplateCache
+from .DescribeCache import DescribeCache
+from .BulkResult import BulkResult
+from .Catalog import Catalog
+from .Sync import build_plan
 
 
 class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
@@ -79,6 +89,20 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         self.__sync_timeout = validate_nonnegative_int(self.__config.get('iot', 'sync_request_timeout'),
                                                        'iot.sync_request_timeout', allow_zero=False)
         self.__config.setup_logging()
+        # PointDataObjectHandler cache
+        try:
+            self.__templates = TemplateCache(self, max_size=self.__config.get('iot', 'template_cache_size'),
+                                             ttl=self.__config.get('iot', 'template_cache_ttl'),
+                                             path=self.__config.get('iot', 'template_cache_file'))
+            # describe() cache
+            self.__descriptions = DescribeCache(max_size=self.__config.get('iot', 'describe_cache_size'),
+                                                ttl=self.__config.get('iot', 'describe_cache_ttl'))
+            # own resources (from previous runs)
+            self.__catalog = Catalog(self.__config.get('agent', 'epid'), path=self.__config.get('iot', 'catalog_file'))
+        except ValueError as ex:
+            raise_from(ValueError('Configuration error'), ex)
+        self.__templates.load()
+        self.__catalog.load()
         #
         try:
             self.__client = Core_Client(host=self.__config.get('agent', 'host'),
@@ -94,12 +118,31 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
                                         auto_encode_decode=bool_from(self.__config.get('core', 'auto_encode_decode'),
                                                                      default=True),
                                         send_queue_size=self.__config.get('core', 'queue_size'),
+                                        send_queue_size_control=self.__config.get('core', 'queue_size_control'),
+                                        send_queue_size_bulk=self.__config.get('core', 'queue_size_bulk'),
                                         throttle_conf=self.__config.get('core', 'throttle'),
+                                        throttle_reserve=self.__config.get('core', 'throttle_reserve'),
                                         max_encoded_length=self.__config.get('core', 'max_encoded_length'),
                                         startup_ignore_exc=bool_from(self.__config.get('core', 'startup_ignore_exc'),
                                                                      default=False),
                                         conn_retry_delay=self.__config.get('core', 'conn_retry_delay'),
-                                        conn_error_log_threshold=self.__config.get('core', 'conn_error_log_threshold'))
+                                        conn_error_log_threshold=self.__config.get('core', 'conn_error_log_threshold'),
+                                        send_workers=self.__config.get('core', 'send_workers'),
+                                        send_confirm=bool_from(self.__config.get('core', 'send_confirm'),
+                                                               default=False),
+                                        adaptive_compression=bool_from(self.__config.get('core',
+                                                                                         'adaptive_compression'),
+                                                                       default=False),
+                                        callback_workers=self.__config.get('core', 'callback_workers'),
+                                        recv_workers=self.__config.get('core', 'recv_workers'),
+                                        prefetch=self.__config.get('core', 'prefetch'),
+                                        ackpc=self.__config.get('core', 'ackpc'),
+                                        adaptive_prefetch=bool_from(self.__config.get('core', 'adaptive_prefetch'),
+                                                                    default=False),
+                                        lazy_decode=bool_from(self.__config.get('core', 'lazy_decode'),
+                                                              default=False),
+                                        time_type=self.__config.get('core', 'time_type'),
+                                        feed_cache_budget=self.__config.get('core', 'feed_cache_budget'))
         except ValueError as ex:
             raise_from(ValueError('Configuration error'), ex)
 
@@ -109,6 +152,7 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         self.__client.register_callback_duplicate(self.__cb_duplicated)
         self.__client.register_callback_reassigned(self.__cb_reassigned)
         self.__client.register_callback_deleted(self.__cb_deleted)
+        self.__client.register_callback_renamed(self.__cb_renamed)
         self.__client.register_callback_recent_data(self.__cb_recent_data)
         #
         # Keeps track of newly created things (the requests for which originated from this agent)
@@ -116,8 +160,6 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         # Allows client to forward e.g. Point creation callbacks to the relevant Thing instance. This contains the most
         # recent instance of any single Thing (since creation requests can be performed more than once).
         self.__private_things = ThreadSafeDict()
-        # PointDataObjectHandler cache
-        self.__point_data_handlers = ThreadSafeDict()
         # recent data callbacks by request id
         self.__recent_data_callbacks = ThreadSafeDict()
 
@@ -136,6 +178,41 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         """
         return self.__client.default_lang
 
+    @property
+    def compression_stats(self):
+        """
+        Statistics for adaptive compression of outgoing requests, keyed by request resource type and compression
+        method. None if core.adaptive_compression is not enabled or before client has started.
+        """
+        return self.__client.compression_stats
+
+    @property
+    def recv_stats(self):
+        """
+        Settings used for receiving messages: `prefetch` (maximum number of unacknowledged messages), `ack_threshold`
+        (number of processed messages after which to acknowledge them) and whether these are `adaptive` (see
+        core.adaptive_prefetch). If so, also includes the measured round trip time (`rtt`, seconds), per-message
+        processing `latency` (seconds) and processing `rate` (messages per second).
+        """
+        return self.__client.recv_stats
+
+    @property
+    def feed_cache_stats(self):
+        """
+        Usage of the local cache of received feed data (see core.feed_cache_budget): Number of cached `feeds`,
+        `samples` in total, their estimated size in `bytes`, the `budget` and the number of samples `evicted` due to
+        the budget having been exceeded.
+        """
+        return self.__client.feed_cache_stats
+
+    @property
+    def describe_cache_stats(self):
+        """
+        Usage of the describe() cache (see iot.describe_cache_ttl): Number of `cached` descriptions, `pending` describe
+        requests, cache `hits` and `misses` and how many describe calls were `coalesced` with a pending identical one.
+        """
+        return self.__descriptions.stats()
+
     @property
     def local_meta(self):
         """
@@ -219,6 +296,8 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         """
         if self.__client.is_alive():
             self.__client.stop()
+            self.__templates.save()
+            self.__catalog.save()
 
     def __exit__(self, exc_type, exc_value, traceback):
         return self.stop()
@@ -676,11 +755,7 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         """
         Used by point instances and data callbacks
         """
-        with self.__point_data_handlers:
-            try:
-                return self.__point_data_handlers[point]
-            except KeyError:
-                return self.__point_data_handlers.setdefault(point, PointDataObjectHandler(point, self))
+        return self.__templates.get(point)
 
     def _parsed_callback_wrapper(self, callback_parsed, callback_plain, foc, data):
         """
@@ -693,8 +768,11 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         else:  # R_CONTROL
             point_ref = Control(self, data[P_ENTITY_LID], data[P_LID], '0' * 32)
 
+        payload = data[P_DATA]
+        if isinstance(payload, LazyPayload):
+            payload = payload.data
         try:
-            data['parsed'] = self._get_point_data_handler_for(point_ref).get_template(data=data[P_DATA])
+            data['parsed'] = self._get_point_data_handler_for(point_ref).get_template(data=payload)
         except RefreshException:
             # No metadata available, do not produce warning
             if callback_plain:
@@ -809,9 +887,53 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
             lid (string): local identifier of your Thing. The local id is your name or nickname for the
                 thing. It's "local" in that it's only available to you on this container, not searchable and not visible
                 to others.
-        """
+
+        Note:
+            If the Thing is known from the catalog (see iot.catalog_file configuration option), it is returned without
+            waiting for the creation request to complete, i.e. no exception is raised here if the latter fails.
+            Instead the failure is logged, the Thing forgotten by the catalog and any further use of the returned
+            instance raises IOTClientError (so create_thing should be called again). Should the request yield a
+            different Thing (e.g. because it was deleted in the meantime), the returned instance takes on the new guid.
+        """
+        thing = self.__warm_thing(lid)
+        if thing is not None:
+            return thing
         evt = self.create_thing_async(lid)
         self._wait_and_except_if_failed(evt)
+        return self.__pop_new_thing(lid)
+
+    def __warm_thing(self, lid):
+        """
+        Returns:
+            Thing from catalog (the creation request being made in the background) or None if not catalogued
+        """
+        entry = self.__catalog.thing(lid)
+        if entry is None:
+            return None
+        guid, epId = entry
+        with self.__private_things:
+            thing = self.__private_things.get(lid, None)
+            if thing is None or thing.guid != guid:
+                thing = self.__private_things[lid] = Thing(self, lid, guid, epId)
+        self.create_thing_async(lid).add_done_callback(partial(self.__verify_thing, lid, guid, thing))
+        return thing
+
+    def __verify_thing(self, lid, guid, warm_thing, evt):
+        """Done callback for creation of Thing returned from catalog"""
+        if not evt.success:
+            logger.warning('Catalogued thing %s could not be created, forgetting it', lid)
+            self.__catalog.remove(guid)
+            with self.__private_things:
+                if self.__private_things.get(lid, None) is warm_thing:
+                    del self.__private_things[lid]
+            warm_thing._invalidate('Thing %s (from catalog) could not be created' % lid)
+            return
+        with self.__new_things:
+            thing = self.__new_things.pop(lid, None)
+        if thing is not None and thing.guid != guid:
+            logger.warning('Catalogued thing %s has changed (%s -> %s)', lid, guid, thing.guid)
+
+    def __pop_new_thing(self, lid):
         try:
             with self.__new_things:
                 return self.__new_things.pop(lid)
@@ -822,6 +944,138 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         logger.info("create_thing(lid=\"%s\")", lid)
         return self._request_entity_create(lid)
 
+    def create_things(self, lids, window=32):
+        """
+        Create (or retrieve existing) Things with the given local ids. Unlike with repeated calls to create_thing, up to
+        `window` creation requests are in flight at once, so that the overall duration is limited by request throttling
+        (see core.throttle) rather than round trip time. Failure of individual creations does not stop the others.
+
+        Returns:
+            :doc:`IoticAgent.IOT.BulkResult` BulkResult with a Thing object (`results`) or exception (`errors`) for
+            each (unique) local id
+
+        Args:
+            lids (iterable): Local identifiers of your Things
+            window (integer, optional): Maximum number of creation requests pending at any one time
+        """
+        logger.info("create_things(window=%s)", window)
+        return self._bulk_request(lids, self._request_entity_create, self.__pop_new_thing, window)
+
+    def sync_plan(self, spec, prune=False, window=32):
+        """
+        Work out which requests are needed to bring things (and their points etc.) in line with the given
+        specification, without making any changes yet. The current state is retrieved with up to `window` requests in
+        flight at once. Anything not specified is left alone, e.g. tags are only compared if a `tags` key is present.
+        Values are compared by label and updated if their type, unit or description differ. Subscriptions are only
+        created (without callback, i.e. data arrives via register_catchall_feeddata/controlreq).
+
+        Note:
+            Creating (or retrieving existing) Things & Points via create_thing/create_feed/create_control remains
+            necessary to obtain instances for them (and to register control callbacks).
+
+        Returns:
+            :doc:`IoticAgent.IOT.Sync` SyncPlan, the str() of which lists the planned operations. Call its apply()
+            method to make the changes.
+
+        Raises:
+            ValueError: If the specification is invalid
+            IOTException: Infrastructure problem detected
+            LinkException: Communications problem between you and the infrastructure
+
+        Args:
+            spec (dict): Thing specifications by local id, as below. All keys are optional.
+            prune (bool, optional): Also remove tags, values, properties, labels/descriptions (in other languages) and
+                subscriptions which are not in the specification (where the respective key has been specified)
+            window (integer, optional): Maximum number of (read) requests pending at any one time
+
+        ::
+
+            {
+                'my_thing': {
+                    'labels': {'en': 'Weather station'},  # or just a string for the default language
+                    'descriptions': {'en': 'Garden weather station'},
+                    'location': (52.2, 0.12),
+                    'tags': ['garden', 'weather'],
+                    'properties': [('http://xmlns.com/foaf/0.1/age', 3)],
+                    'feeds': {
+                        'temperature': {
+                            'labels': 'Temperature',
+                            'descriptions': 'Air temperature',
+                            'tags': ['temperature'],
+                            'values': [{'label': 'celsius', 'type': Datatypes.DECIMAL, 'unit': Units.CELSIUS,
+                                        'description': 'Temperature in C', 'lang': 'en'}],
+                            'save_recent': 10  # only applies on creation
+                        }
+                    },
+                    'controls': {
+                        # callback (for creation) same as for create_control
+                        'reset': {'labels': 'Reset', 'callback': my_callback}
+                    },
+                    'follows': ['<feed guid>'],
+                    'attaches': ['<control guid>']
+                }
+            }
+        """
+        logger.info("sync_plan(things=%d, prune=%s, window=%s)", len(spec), prune, window)
+        return build_plan(self, spec, prune=prune, window=window)
+
+    def ensure(self, spec, prune=False, window=32):
+        """
+        Shorthand for sync_plan(spec, prune, window) followed by SyncPlan.apply(window).
+
+        Returns:
+            Tuple of the :doc:`IoticAgent.IOT.Sync` SyncPlan and the :doc:`IoticAgent.IOT.BulkResult` BulkResult of
+            applying it
+        """
+        plan = self.sync_plan(spec, prune=prune, window=window)
+        if plan:
+            logger.info('Applying %d change(s)', len(plan))
+        return plan, plan.apply(window=window)
+
+    def _bulk_request(self, keys, request, result, window):
+        """
+        Used by create_things, Thing.create_feeds etc. to pipeline requests. For each (unique) key, request(key) is
+        called, with at most window requests pending, followed by result(key) on success of the request.
+
+        Returns:
+            BulkResult of the return values of result() (or the request payloads, if result is None) or exceptions
+            raised by any of the functions by key
+        """
+        window = validate_nonnegative_int(window, 'window')
+        keys = list(OrderedDict.fromkeys(keys))
+        todo = deque(keys)
+        pending = {}
+        results = {}
+        errors = {}
+
+        while todo or pending:
+            while todo and len(pending) < window:
+                key = todo.popleft()
+                try:
+                    pending[request(key)] = key
+                except (IOTException, ValueError, LinkException) as ex:
+                    errors[key] = ex
+            if not pending:
+                continue
+            done = wait_any(pending, timeout=self.__sync_timeout).done
+            if not done:
+                logger.warning('%d bulk request(s) timed out', len(pending))
+                for evt, key in pending.items():
+                    errors[key] = IOTSyncTimeout('Requested timed out', evt)
+                pending.clear()
+                continue
+            for evt in done:
+                key = pending.pop(evt)
+                try:
+                    evt.wait(0)
+                    self._except_if_failed(evt)
+                    results[key] = evt.payload if result is None else result(key)
+                except (IOTException, LinkException) as ex:
+                    errors[key] = ex
+
+        return BulkResult(OrderedDict((key, results[key]) for key in keys if key in results),
+                          OrderedDict((key, errors[key]) for key in keys if key in errors))
+
     def delete_thing(self, lid):
         """Delete a Thing
 
@@ -998,6 +1252,73 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         self._wait_and_except_if_failed(evt)
         return evt.payload['result']  # pylint: disable=unsubscriptable-object
 
+    def iter_search(self, text=None, lang=None, location=None, unit=None, page_size=100, offset=0,
+                    type_=SearchType.FULL, scope=SearchScope.PUBLIC, prefetch=4):
+        """
+        Iterate over all results of a search (see :doc:`IoticAgent.IOT.Client` Client.search for general documentation),
+        retrieving them page by page. Up to `prefetch` page requests are kept in flight, so that subsequent pages have
+        usually arrived by the time the current one has been consumed. Iteration ends after the last page.
+
+        Returns:
+            Generator of `(thing id, result)` tuples in the order returned by the container, where result is as per the
+            search type (see search_reduced & search_located). For `type_=SearchType.MINIMAL`, just thing ids are
+            generated. Things repeated on subsequent pages (e.g. due to metadata having changed whilst iterating) are
+            skipped.
+
+        Raises:
+            IOTException: Infrastructure problem detected (whilst iterating)
+            LinkException: Communications problem between you and the infrastructure (whilst iterating)
+
+        Args:
+            page_size (integer, optional): Number of results to request at once
+            offset (integer, optional): Start with results at this offset
+            type_ (optional): What kind of search to perform, FULL, REDUCED, LOCATED or MINIMAL
+            prefetch (integer, optional): Maximum number of pages to request ahead of time
+        """
+        logger.info("iter_search(text=\"%s\", lang=\"%s\", location=\"%s\", unit=\"%s\", page_size=%s, offset=%s, "
+                    "type_=%s)", text, lang, location, unit, page_size, offset, type_)
+        return self.__iter_pages(partial(self._request_search, text, lang, location, unit, type_=type_, scope=scope),
+                                 type_, page_size, offset, prefetch)
+
+    def __iter_pages(self, request, type_, page_size, offset, prefetch):
+        """Validates paging arguments and returns generator for pages from request (a search function only lacking
+        limit & offset)"""
+        page_size = validate_nonnegative_int(page_size, 'page_size')
+        offset = validate_nonnegative_int(offset, 'offset', allow_zero=True)
+        prefetch = validate_nonnegative_int(prefetch, 'prefetch')
+        type_ = Validation.search_type_check_convert(type_)
+        return self.__iter_pages_gen(request, type_, page_size, offset, prefetch)
+
+    def __iter_pages_gen(self, request, type_, page_size, offset, prefetch):
+        # Located results can be a subset (those things with a location) of each page, so only an empty one reliably
+        # indicates the end. For other types, a short page is the last one.
+        min_page_size = 1 if type_ == SearchType.LOCATED else page_size
+        pending = deque()
+        seen = set()
+
+        while True:
+            while len(pending) < prefetch:
+                pending.append(request(limit=page_size, offset=offset))
+                offset += page_size
+            evt = pending.popleft()
+            self._wait_and_except_if_failed(evt)
+            result = evt.payload['result']  # pylint: disable=unsubscriptable-object
+
+            if type_ == SearchType.MINIMAL:
+                for thing_id in result:
+                    if thing_id not in seen:
+                        seen.add(thing_id)
+                        yield thing_id
+            else:
+                for thing_id, thing in result.items():
+                    if thing_id not in seen:
+                        seen.add(thing_id)
+                        yield thing_id, thing
+
+            # Any further pending requests are beyond the end of the results and can be ignored
+            if len(result) < min_page_size:
+                break
+
     def search_property(
             self,
             props,
@@ -1147,6 +1468,19 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         return self.search_property(props, limit, offset, type_=SearchType.MINIMAL, scope=scope,
                                     with_pointless=with_pointless)
 
+    def iter_search_property(self, props, page_size=100, offset=0, type_=SearchType.FULL, scope=SearchScope.PUBLIC,
+                             lang=None, with_pointless=False, prefetch=4):
+        """
+        Iterate over all results of a property search (see :doc:`IoticAgent.IOT.Client` Client.search_property for
+        general documentation), retrieving them page by page with up to `prefetch` page requests in flight. See
+        iter_search for what is generated & raised.
+        """
+        logger.info("iter_search_property(props=%s, page_size=%s, offset=%s, type_=%s, scope=%s, lang=%s, "
+                    "with_pointless=%s)", props, page_size, offset, type_, scope, lang, with_pointless)
+        return self.__iter_pages(partial(self._request_search_property, props, type_=type_, scope=scope, lang=lang,
+                                         with_pointless=with_pointless),
+                                 type_, page_size, offset, prefetch)
+
     # used by describe()
     __guid_resources = (Thing, Point, RemoteFeed, RemoteControl)
 
@@ -1204,7 +1538,16 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
                 restricted to own things) metadata lookup. Check the :doc:`IoticAgent.IOT.Client` Client.local_meta flag
                 to determine whether local metadata functionality is available. (Note that AUTO, PUBLIC and LOCAL_OWN
                 scopes are always available.). AUTO mode first attempts to look up private metadata, then public.
+
+        Note:
+            If iot.describe_cache_ttl is set, results are reused for that many seconds and so might not reflect recent
+            changes made elsewhere (changes to own resources made via this client discard them).
         """
+        evt = self.describe_async(guid_or_resource, lang=lang, scope=scope)
+        self._wait_and_except_if_failed(evt)
+        return evt.payload['result']  # pylint: disable=unsubscriptable-object
+
+    def describe_async(self, guid_or_resource, lang=None, scope=DescribeScope.AUTO):
         if isinstance(guid_or_resource, self.__guid_resources):
             guid = guid_or_resource.guid
         elif isinstance(guid_or_resource, string_types):
@@ -1212,11 +1555,50 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         else:
             raise ValueError("describe requires guid string or Thing, Point, RemoteFeed or RemoteControl instance")
         logger.info('describe() [guid="%s"]', guid)
+        guid = Validation.guid_check_convert(guid)
+        scope = Validation.describe_scope_check_convert(scope)
+        return self.__descriptions.request(guid, lang, scope, partial(self._request_describe, guid, lang, scope=scope))
 
-        evt = self._request_describe(guid, lang, scope=scope)
+    def _invalidate_description(self, guid):
+        """Used by PointDataObjectHandler to ensure value metadata is re-fetched (rather than taken from the describe
+        cache) when refreshing"""
+        self.__descriptions.invalidate(guid=guid)
 
-        self._wait_and_except_if_failed(evt)
-        return evt.payload['result']  # pylint: disable=unsubscriptable-object
+    def _private_thing(self, lid):
+        """
+        Returns:
+            The most recent Thing instance for the given local id (created via this client) or None
+        """
+        with self.__private_things:
+            return self.__private_things.get(lid, None)
+
+    def _catalog_point(self, foc, lid, pid):
+        """
+        Returns:
+            Guid of the given point according to the catalog or None
+        """
+        return self.__catalog.point(foc, lid, pid)
+
+    def _catalog_sub(self, lid, foc, gpid):
+        """
+        Returns:
+            Tuple of subscription id & point guid of the given subscription according to the catalog or None
+        """
+        return self.__catalog.sub(lid, foc, gpid)
+
+    def _catalog_remove(self, guid):
+        """Used by Thing to forget catalogued points & subscriptions which could not be created"""
+        self.__catalog.remove(guid)
+
+    def __thing_guid(self, lid):
+        thing = self._private_thing(lid)
+        return None if thing is None else thing.guid
+
+    def __invalidate_descriptions(self, lid, foc=None, pid=None):
+        """Discard cached descriptions of the given local thing and (if pid is set) its point"""
+        thing_guid = self.__thing_guid(lid)
+        if thing_guid is not None:
+            self.__descriptions.invalidate(guid=thing_guid, local=None if pid is None else (foc, thing_guid, pid))
 
     def __cb_created(self, msg, duplicated=False):
         # Only consider solicitied creation events since there is no cache. This also applies to things reassigned to
@@ -1228,19 +1610,40 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
                 lid = payload[P_LID]
                 if payload[P_EPID] != self.__client.epId:
                     logger.warning('Created thing %s assigned to different agent: %s', lid, payload[P_EPID])
-                thing = Thing(self, lid, payload[P_ID], payload[P_EPID])
+                self.__descriptions.invalidate(guid=payload[P_ID])
+                self.__catalog.add_thing(lid, payload[P_ID], payload[P_EPID])
 
+                # second (permanent) reference kept so can forward to thing for e.g. point creation callbacks. The
+                # existing instance is kept (and updated if necessary) since it might have been returned from the
+                # catalog already.
+                with self.__private_things:
+                    thing = self.__private_things.get(lid, None)
+                    if thing is None:
+                        thing = self.__private_things[lid] = Thing(self, lid, payload[P_ID], payload[P_EPID])
+                    elif thing.guid != payload[P_ID]:
+                        thing._replace_guid(payload[P_ID])
+                        if thing.agent_id != payload[P_EPID]:
+                            thing._cb_reassigned(payload)
                 with self.__new_things:
                     self.__new_things[lid] = thing
-                # second (permanent) reference kept so can forward to thing for e.g. point creation callbacks
-                with self.__private_things:
-                    self.__private_things[lid] = thing
                 logger.debug('Added %sthing: %s (%s)', 'existing ' if duplicated else '', lid, payload[P_ID])
 
             elif payload[P_RESOURCE] in _POINT_TYPES or payload[P_RESOURCE] == R_SUB:
                 with self.__private_things:
                     thing = self.__private_things.get(payload[P_ENTITY_LID], None)
                 if thing:
+                    if payload[P_RESOURCE] in _POINT_TYPES:
+                        # point listing of thing has changed
+                        self.__descriptions.invalidate(guid=thing.guid)
+                        self.__descriptions.invalidate(guid=payload[P_ID])
+                        self.__descriptions.add_local((payload[P_RESOURCE], thing.guid, payload[P_LID]), payload[P_ID])
+                        self.__catalog.add_point(payload[P_RESOURCE], payload[P_ENTITY_LID], payload[P_LID],
+                                                 payload[P_ID])
+                    else:
+                        self.__catalog.add_sub(payload[P_ENTITY_LID], payload[P_POINT_TYPE],
+                                               ((payload[P_POINT_ENTITY_LID], payload[P_POINT_LID])
+                                                if P_POINT_ENTITY_LID in payload else payload[P_POINT_ID]),
+                                               payload[P_ID], payload[P_POINT_ID])
                     thing._cb_created(payload, duplicated=duplicated)
                 else:
                     logger.warning('Thing %s unknown internally, ignoring creation of point/sub', payload[P_ENTITY_LID])
@@ -1258,16 +1661,30 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         payload = msg[M_PAYLOAD]
 
         if payload[P_RESOURCE] == R_ENTITY:
+            self.__catalog.reassign(payload[P_LID], payload[P_EPID])
             with self.__private_things:
                 thing = self.__private_things.get(payload[P_LID], None)
             if thing:
+                self.__descriptions.invalidate(guid=thing.guid)
                 thing._cb_reassigned(payload)
             else:
                 logger.warning('Thing %s unknown internally, ignoring reassignment', payload[P_LID])
         else:
             logger.error('Resource reassignment of type %d unhandled', payload[P_RESOURCE])
 
+    def __cb_renamed(self, msg):
+        payload = msg[M_PAYLOAD]
+        self.__descriptions.invalidate(guid=payload[P_ID])
+        self.__catalog.rename(payload[P_ID], payload[P_LID])
+        if payload[P_RESOURCE] in (R_FEED, R_CONTROL):
+            self.__templates.invalidate(guid=payload[P_ID])
+
     def __cb_deleted(self, msg):
+        self.__descriptions.invalidate(guid=msg[M_PAYLOAD][P_ID])
+        self.__catalog.remove(msg[M_PAYLOAD][P_ID])
+        if msg[M_PAYLOAD][P_RESOURCE] in (R_FEED, R_CONTROL):
+            self.__templates.invalidate(guid=msg[M_PAYLOAD][P_ID])
+
         # only consider solicitied deletion events
         if msg[M_CLIENTREF] is not None:
             payload = msg[M_PAYLOAD]
@@ -1281,7 +1698,7 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
                 else:
                     logger.debug('Deleted thing: %s', payload[P_LID])
 
-            # currently no functionality benefits from these
+            # templates & descriptions invalidated above, otherwise no functionality benefits from these
             elif payload[P_RESOURCE] in (R_FEED, R_CONTROL, R_SUB):
                 pass
 
@@ -1350,28 +1767,30 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         return self.__client.request_entity_create(lid)
 
     def _request_entity_rename(self, lid, new_lid):
-        return self.__client.request_entity_rename(lid, new_lid)
+        return self.__invalidate_on_completion(self.__client.request_entity_rename(lid, new_lid), lid)
 
     def _request_entity_delete(self, lid):
-        return self.__client.request_entity_delete(lid)
+        return self.__invalidate_on_completion(self.__client.request_entity_delete(lid), lid)
 
     def _request_entity_reassign(self, lid, new_epid):
-        return self.__client.request_entity_reassign(lid, new_epid)
+        return self.__invalidate_on_completion(self.__client.request_entity_reassign(lid, new_epid), lid)
 
     def _request_entity_meta_setpublic(self, lid, public):
-        return self.__client.request_entity_meta_setpublic(lid, public)
+        return self.__invalidate_on_completion(self.__client.request_entity_meta_setpublic(lid, public), lid)
 
     def _request_entity_tag_update(self, lid, tags, delete=False):
-        return self.__client.request_entity_tag_update(lid, tags, delete)
+        return self.__invalidate_on_completion(self.__client.request_entity_tag_update(lid, tags, delete), lid)
 
     def _request_entity_tag_list(self, lid, limit, offset):
         return self.__client.request_entity_tag_list(lid, limit, offset)
 
     def _request_entity_property_update(self, lid, props, replace=True, replace_all=False):
-        return self.__client.request_entity_property_update(lid, props, replace=replace, replace_all=replace_all)
+        return self.__invalidate_on_completion(
+            self.__client.request_entity_property_update(lid, props, replace=replace, replace_all=replace_all), lid
+        )
 
     def _request_entity_property_delete(self, lid, props):
-        return self.__client.request_entity_property_delete(lid, props)
+        return self.__invalidate_on_completion(self.__client.request_entity_property_delete(lid, props), lid)
 
     def _request_entity_property_list(self, lid, limit=100, offset=0):
         return self.__client.request_entity_property_list(lid, limit=limit, offset=offset)
@@ -1380,16 +1799,41 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         return self.__client.request_entity_meta_get(lid, fmt)
 
     def _request_entity_meta_set(self, lid, rdf, fmt):
-        return self.__client.request_entity_meta_set(lid, rdf, fmt)
+        return self.__invalidate_on_completion(self.__client.request_entity_meta_set(lid, rdf, fmt), lid)
 
     def _request_point_create(self, foc, lid, pid, control_cb=None, save_recent=0):
-        return self.__client.request_point_create(foc, lid, pid, control_cb, save_recent)
+        return self.__invalidate_on_completion(
+            self.__client.request_point_create(foc, lid, pid, control_cb, save_recent), lid
+        )
 
     def _request_point_rename(self, foc, lid, pid, newpid):
-        return self.__client.request_point_rename(foc, lid, pid, newpid)
+        evt = self.__invalidate_on_completion(self.__client.request_point_rename(foc, lid, pid, newpid), lid, foc, pid,
+                                              template=True)
+        evt._run_on_completion(self.__rename_point_description, lid, foc, pid, newpid)
+        return evt
+
+    def __rename_point_description(self, evt, lid, foc, pid, newpid):
+        if evt.success:
+            thing_guid = self.__thing_guid(lid)
+            if thing_guid is not None:
+                guid = self.__descriptions.remove_local((foc, thing_guid, pid))
+                if guid is not None:
+                    self.__descriptions.add_local((foc, thing_guid, newpid), guid)
 
     def _request_point_delete(self, foc, lid, pid):
-        return self.__client.request_point_delete(foc, lid, pid)
+        return self.__invalidate_on_completion(self.__client.request_point_delete(foc, lid, pid), lid, foc, pid,
+                                               template=True)
+
+    def __invalidate_on_completion(self, evt, lid, foc=None, pid=None, template=False):
+        """Discard cached description of the given local thing (and its point, if pid is set) and optionally the
+        point's template once the request (which changes them) has finished"""
+        def invalidate(_):
+            self.__invalidate_descriptions(lid, foc, pid)
+            if template:
+                self.__templates.invalidate(local=(foc, lid, pid))
+
+        evt._run_on_completion(invalidate)
+        return evt
 
     def _request_point_share(self, lid, pid, data, mime, time):
         return self.__client.request_point_share(lid, pid, data, mime, time)
@@ -1401,28 +1845,45 @@ class Client(object):  # pylint: disable=too-many-public-methods, too-many-lines
         return self.__client.request_point_meta_get(foc, lid, pid, fmt)
 
     def _request_point_meta_set(self, foc, lid, pid, rdf, fmt):
-        return self.__client.request_point_meta_set(foc, lid, pid, rdf, fmt)
+        return self.__invalidate_on_completion(self.__client.request_point_meta_set(foc, lid, pid, rdf, fmt), lid, foc,
+                                               pid)
 
     def _request_point_tag_update(self, foc, lid, pid, tags, delete=False):
-        return self.__client.request_point_tag_update(foc, lid, pid, tags, delete)
+        return self.__invalidate_on_completion(self.__client.request_point_tag_update(foc, lid, pid, tags, delete), lid,
+                                               foc, pid)
 
     def _request_point_tag_list(self, foc, lid, pid, limit, offset):
         return self.__client.request_point_tag_list(foc, lid, pid, limit, offset)
 
     def _request_point_value_create(self, lid, pid, foc, label, vtype, lang, comment, unit):
-        return self.__client.request_point_value_create(lid, pid, foc, label, vtype, lang, comment, unit)
+        return self.__invalidate_on_completion(
+            self.__client.request_point_value_create(lid, pid, foc, label, vtype, lang, comment, unit), lid, foc, pid,
+            template=True
+        )
 
     def _request_point_value_delete(self, lid, pid, foc, label=None):
-        return self.__client.request_point_value_delete(lid, pid, foc, label=label)
+        return self.__invalidate_on_completion(
+            self.__client.request_point_value_delete(lid, pid, foc, label=label), lid, foc, pid, template=True
+        )
 
     def _request_point_value_list(self, lid, pid, foc, limit, offset):
         return self.__client.request_point_value_list(lid, pid, foc, limit, offset)
 
-    def _request_sub_create_local(self, slid, foc, lid, pid, callback):
-        return self.__client.request_sub_create_local(slid, foc, lid, pid, callback)
+    def _request_sub_create_local(self, slid, foc, lid, pid, callback, queue_size=0, queue_policy=QueuePolicy.BLOCK,
+                                  cache_size=0):
+        return self.__client.request_sub_create_local(slid, foc, lid, pid, callback, queue_size=queue_size,
+                                                      queue_policy=queue_policy, cache_size=cache_size)
+
+    def _request_sub_create(self, lid, foc, gpid, callback, queue_size=0, queue_policy=QueuePolicy.BLOCK,
+                            cache_size=0):
+        return self.__client.request_sub_create(lid, foc, gpid, callback, queue_size=queue_size,
+                                                queue_policy=queue_policy, cache_size=cache_size)
+
+    def _feed_cache_recent(self, feedid, count):
+        return self.__client.feed_cache_recent(feedid, count)
 
-    def _request_sub_create(self, lid, foc, gpid, callback):
-        return self.__client.request_sub_create(lid, foc, gpid, callback)
+    def _feed_callback_stats(self, feedid):
+        return self.__client.feed_callback_stats(feedid)
 
     def _request_sub_ask(self, subid, data, mime):
         return self.__client.request_sub_ask(subid, data, mime)
@@ -53,6 +53,29 @@ class Config(object):
             sync_request_timeout = # 330 (default). How long synchronous requests at most wait before timing out. This
                                    # option should have a higher value set than core.network_retry_timeout.
 
+            template_cache_size = # 1000 (default). Maximum number of point value templates (used for e.g.
+                                  # callback_parsed & get_template) to keep, least recently used ones being discarded
+                                  # first. Zero means unlimited.
+
+            template_cache_ttl = # 86400 (default). Seconds after which a point's value metadata is retrieved again.
+                                 # Zero means never (templates are still refreshed if parsing fails).
+
+            template_cache_file = # File in which to save value metadata of remote points on stop, to be reloaded on
+                                  # start (avoiding a describe request per point). Not used unless set.
+
+            describe_cache_size = # 1000 (default). Maximum number of describe results to keep, least recently used
+                                  # ones being discarded first. Zero means unlimited.
+
+            describe_cache_ttl = # 0 (default). Seconds for which a describe result is reused. Zero disables caching
+                                 # (identical concurrent describe requests are still combined). Descriptions of this
+                                 # agent's own resources are discarded earlier when changed via this client, but
+                                 # changes made elsewhere (e.g. to remote things) are not noticed, so results can be
+                                 # up to this many seconds out of date.
+
+            catalog_file = # File in which to record own things, points & subscriptions, saved on stop & loaded on
+                           # start. Creating catalogued ones then returns immediately, the creation request being
+                           # verified in the background. Not used unless set.
+
 
         `[logging] =` Logging preferences
 
@@ -76,7 +99,14 @@ class Config(object):
             queue_size = # 128 (default). Maximum number of (outgoing) requests to allow in pending
                          # request queue before blocking. Set to zero for unlimited. Whether queue
                          # fills up depends on latency & throughput of network & container as well as
-                         # throttling setting.
+                         # throttling setting. Requests are queued in three priority lanes (control
+                         # confirmations & pings, other requests, feed shares), each limited to this size.
+
+            queue_size_control = # Override queue_size for the control confirmation (& ping) lane. Not used
+                                 # (i.e. queue_size applies) unless set.
+
+            queue_size_bulk = # Override queue_size for the feed share lane. Not used (i.e. queue_size applies)
+                              # unless set.
 
             throttle = # Automatic request (outgoing) throttling, specified as comma-separate list of
                        # REQUESTS/INTERVAL pairs. E.g. '180/60,600/300' would result in no more than 180
@@ -84,6 +114,51 @@ class Config(object):
                        # last 5 minutes. Used to prevent rate-limiting containers from temporarily banning
                        # the client without requiring application code to introduce artificial delays. Note:
                        # The limits should be set a bit lower than the hard limits imposed by container.
+
+            throttle_reserve = # 0 (default). Percentage of each throttle limit which feed shares cannot use, so that
+                               # other requests (e.g. control confirmations) are not delayed by bulk sharing.
+
+            send_workers = # 0 (default). Number of threads with which to encode, compress & sign outgoing requests.
+                           # Requests are still sent in order. Can improve throughput for large (compressible)
+                           # requests when multiple cores are available. Zero uses the sending thread only.
+
+            adaptive_compression = # 0 (default). Choose whether & how to compress each (outgoing) request based on how
+                                   # well recent requests of the same type compressed. See
+                                   # IOT.Client.compression_stats.
+
+            send_confirm = # 0 (default). Whether to use (AMQP) publisher confirms to track delivery of requests to the
+                           # broker. If enabled, requests not confirmed before a connection failure are re-sent
+                           # immediately on reconnection instead of after a delay.
+
+            callback_workers = # 8 (default). Maximum number of threads with which to run feed data, control request
+                               # and other non-CRUD callbacks. Threads beyond the first two are only started whilst
+                               # callbacks are waiting. Callbacks for the same feed/control always run in order.
+
+            recv_workers = # 0 (default). Number of threads with which to validate, decompress & decode received
+                           # messages. Messages are still processed in the order they were received. Zero means the
+                           # (AMQP) receiving thread does all the work.
+
+            prefetch = # 128 (default). Maximum number of received messages which have not been acknowledged yet.
+
+            ackpc = # 0.5 (default). Fraction of prefetch after which processed messages are acknowledged (they are
+                    # also acknowledged at least every 0.1 seconds).
+
+            adaptive_prefetch = # 0 (default). Adjust prefetch (starting with the above) based on measured message
+                                # processing rate & latency and round trip time. See IOT.Client.recv_stats.
+
+            lazy_decode = # 0 (default). If enabled (and auto_encode_decode is too), feed data & control request
+                          # callbacks receive the data as a LazyPayload object (see IoticAgent.Core.LazyPayload) which
+                          # only decodes it on first access, in the callback's thread. `mime` is then always None, the
+                          # mime type being available via the LazyPayload instead.
+
+            time_type = # datetime (default). Representation of timestamps of received feed data & recent data
+                        # samples: datetime (naive, UTC), epoch (float seconds) or datetime64 (numpy.datetime64,
+                        # requires numpy).
+
+            feed_cache_budget = # 16777216 (default). Maximum (estimated) memory use in bytes of locally cached feed
+                                # data for feeds followed with a cache_size (see Thing.follow). RemoteFeed.get_last &
+                                # get_recent read from this cache instead of the container where possible. Zero
+                                # disables the cache.
         """
         self.__fname = None
         self.__config = {}
@@ -95,7 +170,11 @@ class Config(object):
                 'prefix': ''
             },
             'iot': {
-                'sync_request_timeout': 330
+                'sync_request_timeout': 330,
+                'template_cache_size': 1000,
+                'template_cache_ttl': 86400,
+                'describe_cache_size': 1000,
+                'describe_cache_ttl': 0
             },
             'core': {
                 'network_retry_timeout': 300,
@@ -103,8 +182,20 @@ class Config(object):
                 'auto_encode_decode': 1,
                 'queue_size': 128,
                 'throttle': '480/30,1680/300',
+                'throttle_reserve': 0,
                 'conn_retry_delay': 5,
-                'conn_error_log_threshold': 180
+                'conn_error_log_threshold': 180,
+                'send_workers': 0,
+                'send_confirm': 0,
+                'adaptive_compression': 0,
+                'callback_workers': 8,
+                'recv_workers': 0,
+                'prefetch': 128,
+                'ackpc': 0.5,
+                'adaptive_prefetch': 0,
+                'lazy_decode': 0,
+                'time_type': 'datetime',
+                'feed_cache_budget': 16777216
             },
             'logging': {
                 'amqp': 'warning',
@@ -0,0 +1,211 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Bounded cache of describe results, coalescing concurrent identical describe requests
+"""
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+from copy import deepcopy
+from functools import partial
+import logging
+logger = logging.getLogger(__name__)
+
+from IoticAgent.Core.RequestEvent import RequestEvent
+from IoticAgent.Core.compat import Event, Lock, monotonic
+from IoticAgent.Core.utils import validate_nonnegative_int
+
+
+def _copy_outcome(copy, evt):
+    """Done callback finishing copy of evt (see DescribeCache.request)"""
+    copy.success = evt.success
+    copy.payload = deepcopy(evt.payload)
+    copy._exception = evt._exception
+    copy._set()
+
+
+class _Pending(object):
+    """Describe request which is being (or has been) issued"""
+
+    __slots__ = ('issued', 'evt')
+
+    def __init__(self):
+        # set once request has been issued (or issuing it failed)
+        self.issued = Event()
+        self.evt = None
+
+
+class DescribeCache(object):
+    """Least recently used describe responses by guid, language & scope, each expiring ttl seconds after having been
+    received. Whilst a describe request is pending, identical requests share it instead of making their own.
+    Descriptions are discarded via invalidate(), e.g. when the resource in question is changed by this agent. Changes
+    made by others are not noticed, i.e. a cached description can be up to ttl seconds out of date. Threadsafe."""
+
+    def __init__(self, max_size=1000, ttl=0):
+        """
+        `max_size` - (int) Maximum number of descriptions to keep. Zero means unlimited.
+
+        `ttl` - (int) Seconds for which a description is used. Zero disables caching (but identical requests are still
+        coalesced).
+        """
+        self.__max_size = validate_nonnegative_int(max_size, 'max_size', allow_zero=True)
+        self.__ttl = validate_nonnegative_int(ttl, 'ttl', allow_zero=True)
+        self.__lock = Lock()
+        # (guid, lang, scope) -> (payload, monotonic expiry time), least recently used first
+        self.__cached = OrderedDict()
+        # (guid, lang, scope) -> _Pending
+        self.__pending = {}
+        # local identifier (see add_local) -> guid
+        self.__local = {}
+        self.__hits = 0
+        self.__misses = 0
+        self.__coalesced = 0
+
+    def __len__(self):
+        return len(self.__cached)
+
+    def request(self, guid, lang, scope, func):
+        """
+        Returns:
+            RequestEvent for the description of the given resource. If cached, the event has finished already.
+            Otherwise it finishes along with a pending identical request or, if none, the one returned by func (the
+            actual describe request, called without arguments). Either way each caller gets its own event & copy of
+            the payload.
+        """
+        key = (guid, lang, scope)
+        with self.__lock:
+            try:
+                payload, expiry = self.__cached.pop(key)
+            except KeyError:
+                pass
+            else:
+                if monotonic() < expiry:
+                    # most recently used last
+                    self.__cached[key] = (payload, expiry)
+                    self.__hits += 1
+                    return self.__finished_event(payload)
+                logger.debug('Description of %s expired', guid)
+
+            pending = self.__pending.get(key)
+            if pending is None:
+                self.__misses += 1
+                # Placeholder so that identical requests made whilst issuing this one wait for it
+                pending = self.__pending[key] = _Pending()
+                issue = True
+            else:
+                self.__coalesced += 1
+                issue = False
+
+        if not issue:
+            # Request is issued outside of lock, possibly blocking (e.g. when send queue is full)
+            pending.issued.wait()
+            # Issuing failed, so try again separately (raising the relevant exception, if any)
+            return func() if pending.evt is None else self.__own_copy(pending.evt)
+
+        try:
+            evt = func()
+        except:
+            with self.__lock:
+                if self.__pending.get(key) is pending:
+                    del self.__pending[key]
+            pending.issued.set()
+            raise
+        pending.evt = evt
+        pending.issued.set()
+        evt.add_done_callback(partial(self.__completed, key, pending))
+        return self.__own_copy(evt)
+
+    @staticmethod
+    def __finished_event(payload):
+        evt = RequestEvent(None)
+        evt.success = True
+        evt.payload = deepcopy(payload)
+        evt._set()
+        return evt
+
+    @staticmethod
+    def __own_copy(evt):
+        """
+        Returns:
+            RequestEvent which finishes along with the given (shared) one, with its own copy of the payload, so that
+            callers modifying the latter do not affect each other (or the cache)
+        """
+        copy = RequestEvent(evt.id_)
+        evt.add_done_callback(partial(_copy_outcome, copy))
+        return copy
+
+    def __completed(self, key, pending, evt):
+        """Done callback of pending requests"""
+        with self.__lock:
+            # Not stored if invalidated in the meantime since the response might predate the change
+            if self.__pending.get(key) is not pending:
+                return
+            del self.__pending[key]
+            if not (self.__ttl and evt.success and evt._exception is None and evt.payload and
+                    evt.payload.get('result') is not None):
+                return
+            self.__cached[key] = (deepcopy(evt.payload), monotonic() + self.__ttl)
+            if self.__max_size and len(self.__cached) > self.__max_size:
+                del self.__cached[next(iter(self.__cached))]
+
+    def add_local(self, local, guid):
+        """Associate a local identifier with the given guid so that invalidate() can be called with either. A local
+        identifier should be a tuple of resource type (e.g. R_ENTITY) followed by local id(s)."""
+        with self.__lock:
+            self.__local[local] = guid
+
+    def remove_local(self, local):
+        """Forget local identifier (see add_local), e.g. because the resource has been renamed or deleted
+
+        Returns:
+            The guid the identifier was associated with or None
+        """
+        with self.__lock:
+            return self.__local.pop(local, None)
+
+    def invalidate(self, guid=None, local=None):
+        """Discard descriptions (in all languages & scopes) of a resource, e.g. because it has been changed.
+
+        `guid` - (string) Global id of the resource
+
+        `local` - (tuple) Local identifier of the resource (see add_local)
+        """
+        with self.__lock:
+            guids = set()
+            if guid is not None:
+                guids.add(guid)
+            if local is not None:
+                local_guid = self.__local.get(local)
+                if local_guid is not None:
+                    guids.add(local_guid)
+            if not guids:
+                return
+            for key in [key for key in self.__cached if key[0] in guids]:
+                del self.__cached[key]
+                logger.debug('Invalidated description of %s', key[0])
+            for key in [key for key in self.__pending if key[0] in guids]:
+                del self.__pending[key]
+
+    def stats(self):
+        """
+        Returns:
+            dict of number of `cached` descriptions, `pending` requests, the number of cache `hits` and `misses` and
+            how many requests were `coalesced` with a pending one.
+        """
+        with self.__lock:
+            return {'cached': len(self.__cached),
+                    'pending': len(self.__pending),
+                    'hits': self.__hits,
+                    'misses': self.__misses,
+                    'coalesced': self.__coalesced}
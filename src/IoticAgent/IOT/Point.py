@@ -451,8 +451,11 @@ class PointDataObject(object):
     __slots__ = tuple(private_names_for('PointDataObject', ('__values', '__filter')))
 
     def __init__(self, values, value_filter):
-        """Instantiated by :doc:IoticAgent.IOT.`PointValueHelper` PointDataObjectHandler"""
-        self.__values = _PointValueWrapper(values)
+        """Instantiated by :doc:IoticAgent.IOT.`PointValueHelper` PointDataObjectHandler. `values` is either a class
+        returned by point_values_class() or a sequence of Value templates."""
+        if not isinstance(values, type):
+            values = point_values_class(values)
+        self.__values = values()
         self.__filter = value_filter
 
     def __bool__(self):
@@ -466,15 +469,23 @@ class PointDataObject(object):
 
     def unset(self):
         """Unsets all values"""
-        for value in self.__values:
-            del value.value
+        values = self.__values
+        for label in values.__pdo_labels__:
+            delattr(values, label)
 
     @property
     def empty(self):
         """
         Returns:
             True if no values have been set yet."""
-        return all(value.unset for value in self.__values)
+        values = self.__values
+        for _, field in values.__pdo_fields__:
+            try:
+                field.__get__(values)
+            except AttributeError:
+                continue
+            return False
+        return True
 
     @property
     def missing(self):
@@ -491,7 +502,7 @@ class PointDataObject(object):
             raise TypeError('text should be sequence of strings')
         values = ([self.__values[name] for name in self.__filter.filter_by(types=types, units=units)
                    if include_unset or not self.__values[name].unset]
-                  if types or units else self.__values)
+                  if types or units else list(self.__values))
         if text:
             # avoid unexpected search by individual characters if a single string was specified
             if isinstance(text, string_types):
@@ -509,7 +520,14 @@ class PointDataObject(object):
 
     def to_dict(self):
         """Converts the set of values into a dictionary. Unset values are excluded."""
-        return {value.label: value.value for value in self.__values if not value.unset}
+        values = self.__values
+        result = {}
+        for label, field in values.__pdo_fields__:
+            try:
+                result[label] = field.__get__(values)
+            except AttributeError:
+                pass
+        return result
 
     @classmethod
     def _from_dict(cls, values, value_filter, dictionary, allow_unset=True):
@@ -522,17 +540,38 @@ class PointDataObject(object):
         for name, value in dictionary.items():
             if not isinstance(name, string_types):
                 raise TypeError('Key %s is not a string' % str(name))
-            setattr(values, name, value)
-        if obj.missing and not allow_unset:
+            try:
+                setattr(values, name, value)
+            except AttributeError as ex:
+                raise_from(AttributeError('no such value'), ex)
+        if not allow_unset and obj.missing:
             raise ValueError('%d value(s) are unset' % len(obj.missing))
         return obj
 
 
-class _PointValueWrapper(object):
-    """Encapsulates a set of values, accessible by their label as well as an iterator. NOT threadsafe.
-
-    pvw = PointValueWrapper(SEQUENCE_OF_VALUES)
-    # This will produce a ValueError if the value has not been set yet
+def point_values_class(templates):
+    """
+    Returns:
+        New class (derived from _PointValues) holding the values described by the given sequence of Value templates in
+        slots named after their labels. Created once per point value description, see PointDataObjectHandler.
+    """
+    labels = tuple(template.label for template in templates)
+    # Labels cannot start with two underscores, so the class attributes below cannot clash with them
+    cls = type(str('PointValues'), (_PointValues,), {'__slots__': labels,
+                                                     '__pdo_labels__': labels,
+                                                     '__pdo_templates__': {template.label: template
+                                                                           for template in templates}})
+    # slot descriptors, for access which bypasses __getattr__ (i.e. raises AttributeError if unset)
+    cls.__pdo_fields__ = tuple((label, cls.__dict__[label]) for label in labels)
+    return cls
+
+
+class _PointValues(object):
+    """Base for classes created by point_values_class(). Holds a set of values, each accessible by its label as an
+    attribute, as well as an iterator. NOT threadsafe.
+
+    pvw = PointDataObject.values
+    # This will return None if the value has not been set yet
     print(pvw.some_value)
     pvw.some_value = 2
     print(pvw.some_value)
@@ -545,38 +584,91 @@ class _PointValueWrapper(object):
     print(pvw['some_value'].value)
     """
 
-    __slots__ = tuple(private_names_for('_PointValueWrapper', ('__values',)))
-
-    def __init__(self, values):
-        self.__values = {value.label: value.copy() for value in values}
+    __slots__ = ()
+    __pdo_labels__ = ()
+    __pdo_templates__ = {}
+    __pdo_fields__ = ()
 
     def __iter__(self):
-        return iter(self.__values.values())
+        templates = self.__pdo_templates__
+        return iter([_BoundValue(self, templates[label]) for label in self.__pdo_labels__])
 
     def __getattr__(self, name):
-        try:
-            return self.__values[name].value
-        except KeyError as ex:
-            raise_from(AttributeError('no such value'), ex)
+        # Only called if slot has not been set (or name is not a value)
+        if name in self.__pdo_templates__:
+            return None
+        raise AttributeError('no such value')
 
     def __getitem__(self, key):
         try:
-            return self.__values[key]
+            return _BoundValue(self, self.__pdo_templates__[key])
         except KeyError as ex:
             raise_from(KeyError('no such value'), ex)
 
-    def __setattr__(self, name, value):
-        # private attributes belonging to class
-        if name.startswith('_PointValueWrapper__'):
-            super(_PointValueWrapper, self).__setattr__(name, value)
-        else:
-            try:
-                self.__values[name].value = value
-            except KeyError as ex:
+    def __delattr__(self, name):
+        try:
+            super(_PointValues, self).__delattr__(name)
+        except AttributeError as ex:
+            # deleting an unset value is not an error
+            if name not in self.__pdo_templates__:
                 raise_from(AttributeError('no such value'), ex)
 
-    def __delattr__(self, name):
+
+class _BoundValue(object):
+    """Value (see PointValueHelper.Value) of a particular _PointValues instance. Reading & assigning `value` applies
+    to the instance."""
+
+    __slots__ = ('__owner', '__template')
+
+    def __init__(self, owner, template):
+        self.__owner = owner
+        self.__template = template
+
+    @property
+    def unset(self):
+        """Whether this value instances has had data assigned to it"""
         try:
-            del self.__values[name].value
-        except KeyError as ex:
-            raise_from(AttributeError('no such value'), ex)
+            getattr(type(self.__owner), self.__template.label).__get__(self.__owner)
+        except AttributeError:
+            return True
+        return False
+
+    @property
+    def label(self):
+        """Label for this value"""
+        return self.__template.label
+
+    @property
+    def type_(self):
+        """Value type, e.g. one of IoticAgent.Datatypes"""
+        return self.__template.type_
+
+    @property
+    def unit(self):
+        """Value unit, e.g. one of IoticAgent.Units"""
+        return self.__template.unit
+
+    @property
+    def description(self):
+        """Human-readable description of this value"""
+        return self.__template.description
+
+    @property
+    def value(self):
+        """Data for this value.
+
+        Returns:
+            None if it hasn't been set. To distinguish between None and and unset, check the `unset` property.
+        """
+        return getattr(self.__owner, self.__template.label)
+
+    @value.setter
+    def value(self, value):
+        setattr(self.__owner, self.__template.label, value)
+
+    @value.deleter
+    def value(self):
+        delattr(self.__owner, self.__template.label)
+
+    def copy(self):
+        return self.__template.copy()
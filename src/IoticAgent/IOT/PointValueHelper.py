@@ -24,10 +24,12 @@ from IoticAgent.Core.Validation import Validation
 from IoticAgent.Core.compat import Sequence, Lock, valid_identifier
 
 from .Exceptions import IOTUnknown
-from .Point import Point, PointDataObject
+from .Point import Point, PointDataObject, point_values_class
 from .RemotePoint import RemotePoint
 from .utils import private_names_for
 
+DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
+
 
 class Value(object):
     """Represent data and metadata for a single value. NOT thread safe."""
@@ -123,7 +125,7 @@ class _ValueFilter(namedtuple('nt__ValueFilter', 'by_type by_unit')):
         return (type_names & unit_names) if (types and units) else empty
 
 
-class RefreshException(Exception):
+class RefreshException(ValueError):
     """Raised by __refresh() to indicate metadata unsuitable for template usage."""
 
 
@@ -132,11 +134,13 @@ class PointDataObjectHandler(object):
     with data from a share/ask/tell. Threadsafe."""
 
     __slots__ = tuple(private_names_for('PointDataObjectHandler', ('__remote', '__point', '__last_parse_ok', '__client',
-                                                                   '__lock', '__value_templates', '__filter')))
+                                                                   '__lock', '__values_class', '__filter',
+                                                                   '__raw_values')))
 
-    def __init__(self, point, client):
+    def __init__(self, point, client, values=None):
         """point - instance of Point, RemoteFeed or RemoteControl or a valid GUID
            client - instance of IOT.Client
+           values - (optional) previously retrieved value metadata (see raw_values) to use instead of fetching it
         """
         # remote => use describe, non-remote => use point value listing
         if isinstance(point, Point):
@@ -153,33 +157,48 @@ class PointDataObjectHandler(object):
         self.__client = client
         # flag to prevent repeated fetching of value metadata
         self.__last_parse_ok = True
-        self.__value_templates = None
+        self.__values_class = None
         self.__filter = None
+        self.__raw_values = None
+        if values:
+            try:
+                self.__refresh(values)
+            except (RefreshException, KeyError, TypeError):
+                logger.debug('Ignoring unsuitable value metadata for point %s', self.__point, exc_info=DEBUG_ENABLED)
+
+    @property
+    def raw_values(self):
+        """Value metadata (list of dicts, as per describe) the current template is based on or None if not yet
+        retrieved"""
+        with self.__lock:
+            return self.__raw_values
 
     def get_template(self, data=None):  # noqa (complexity)
         """Get new template which represents the values of this point in a PointDataObject from the
         :doc:`IoticAgent.IOT.Point`. If data is set (to a dictionary), use this to populate the created template."""
         with self.__lock:
-            if self.__value_templates is None and self.__last_parse_ok:
+            if self.__values_class is None and self.__last_parse_ok:
                 try:
                     self.__refresh()
                 except RefreshException:
                     # Point has no (useable) values - don't try to refetch again
                     self.__last_parse_ok = False
                     raise
-            if self.__value_templates is None:
+            if self.__values_class is None:
                 raise ValueError('Point has no values')
             if data is None:
-                template = PointDataObject(self.__value_templates, self.__filter)
+                template = PointDataObject(self.__values_class, self.__filter)
             else:
                 while True:
                     try:
-                        template = PointDataObject._from_dict(self.__value_templates, self.__filter, data)
+                        template = PointDataObject._from_dict(self.__values_class, self.__filter, data)
                     except:
                         # parsing has failed for first time since refresh so try again
                         if self.__last_parse_ok:
                             logger.debug('Failed to parse data from for point %s, refreshing', self.__point)
                             self.__last_parse_ok = False
+                            if self.__remote:
+                                self.__client._invalidate_description(self.__point)
                             try:
                                 self.__refresh()
                             except RefreshException:
@@ -191,10 +210,11 @@ class PointDataObjectHandler(object):
                         break
             return template
 
-    def __refresh(self):
-        """Update local knowledge of values (to be used to create new skeletal instances). MUST be called within
-        lock."""
-        raw_values = self.__get_values()
+    def __refresh(self, raw_values=None):
+        """Update local knowledge of values (to be used to create new skeletal instances), fetching value metadata
+        unless raw_values are specified. MUST be called within lock (or from constructor)."""
+        if raw_values is None:
+            raw_values = self.__get_values()
         if not raw_values:
             raise RefreshException('Point has no values')
 
@@ -220,8 +240,9 @@ class PointDataObjectHandler(object):
                 except KeyError:
                     by_unit[value.unit] = {label}
 
-        self.__value_templates = templates
+        self.__values_class = point_values_class(templates)
         self.__filter = _ValueFilter(by_type, by_unit)
+        self.__raw_values = raw_values
 
     def __get_values(self):
         """Retrieve value information either via describe or point value listing. MUST be called within lock."""
@@ -0,0 +1,117 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Column-wise (rather than per-sample) representation of recent feed data
+"""
+
+from __future__ import unicode_literals
+
+from collections import namedtuple, OrderedDict
+from numbers import Real
+import logging
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy
+except ImportError:
+    NUMPY_AVAILABLE = False
+else:
+    NUMPY_AVAILABLE = True
+
+from IoticAgent.Core.LazyPayload import LazyPayload
+from IoticAgent import Datatypes
+
+DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
+
+# numpy dtypes for value types which have a fixed-width representation. Columns which cannot be converted (e.g. due to
+# missing integer values) use the object dtype instead.
+_NUMPY_DTYPES = {
+    Datatypes.DECIMAL: 'float64',
+    Datatypes.DOUBLE: 'float64',
+    Datatypes.FLOAT: 'float64',
+    Datatypes.BYTE: 'int64',
+    Datatypes.UNSIGNED_BYTE: 'int64',
+    Datatypes.INT: 'int64',
+    Datatypes.INTEGER: 'int64',
+    Datatypes.LONG: 'int64',
+    Datatypes.BOOLEAN: 'bool'
+}
+
+
+class RecentColumns(namedtuple('nt_RecentColumns', 'time values skipped')):
+    """Recent data samples of a feed, by column. Each column is a numpy array if numpy is available, a list otherwise.
+
+    `time` - Timestamps of samples (chronologically ascending). With numpy, these are datetime64 (or float64, if epoch
+             timestamps have been configured via core.time_type).
+
+    `values` - OrderedDict of columns by value label, in the order defined by the point. Values missing from a sample
+               are None (NaN for floating point columns with numpy).
+
+    `skipped` - Number of samples which were not included since their data could not be decoded into values
+    """
+
+    __slots__ = ()
+
+
+class RecentColumnsBuilder(object):
+    """Accumulates recent data samples (as passed to RemoteFeed.get_recent_async callbacks) into columns. The samples
+    themselves are not retained. NOT threadsafe."""
+
+    __slots__ = ('__types', '__time', '__values', '__skipped')
+
+    def __init__(self, template):
+        """
+        `template` - PointDataObject (from PointDataObjectHandler) defining the values (columns) of the point
+        """
+        self.__types = OrderedDict((value.label, value.type_) for value in template.values)
+        self.__time = []
+        self.__values = OrderedDict((label, []) for label in self.__types)
+        self.__skipped = 0
+
+    def add(self, sample):
+        data = sample['data']
+        if isinstance(data, LazyPayload):
+            data = data.data
+        if not isinstance(data, dict):
+            self.__skipped += 1
+            return
+        self.__time.append(sample['time'])
+        for label, column in self.__values.items():
+            column.append(data.get(label))
+
+    def __len__(self):
+        return len(self.__time)
+
+    def result(self):
+        """
+        Returns:
+            RecentColumns for the samples added so far
+        """
+        if not NUMPY_AVAILABLE:
+            return RecentColumns(self.__time, OrderedDict((label, list(column))
+                                                          for label, column in self.__values.items()),
+                                 self.__skipped)
+
+        time = self.__time
+        time = numpy.array(time, dtype='float64' if time and isinstance(time[0], Real) else 'datetime64[us]')
+        values = OrderedDict()
+        for label, column in self.__values.items():
+            dtype = _NUMPY_DTYPES.get(self.__types[label])
+            if dtype is not None and (dtype == 'float64' or None not in column):
+                try:
+                    values[label] = numpy.array(column, dtype=dtype)
+                    continue
+                except (TypeError, ValueError, OverflowError):
+                    logger.debug('Column %s not convertible to %s', label, dtype, exc_info=DEBUG_ENABLED)
+            values[label] = numpy.array(column, dtype=object)
+        return RecentColumns(time, values, self.__skipped)
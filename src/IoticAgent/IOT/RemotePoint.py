@@ -14,15 +14,18 @@
 
 from __future__ import unicode_literals
 
+from collections import deque
+from threading import Condition
 import logging
 logger = logging.getLogger(__name__)
 
 from IoticAgent.Core.Validation import Validation
 from IoticAgent.Core.utils import validate_nonnegative_int
-from IoticAgent.Core.compat import Queue, Empty, monotonic
+from IoticAgent.Core.compat import Lock, monotonic
 
 from .Point import PointDataObject
-from .Exceptions import IOTSyncTimeout
+from .Exceptions import IOTClientError, IOTSyncTimeout
+from .RecentColumns import RecentColumnsBuilder
 
 
 class RemotePoint(object):
@@ -35,14 +38,36 @@ class RemotePoint(object):
         self.__subid = Validation.guid_check_convert(subid)
         self.__pointid = Validation.guid_check_convert(pointid)
         self.__lid = Validation.lid_check_convert(lid)
+        # reason for which this instance can no longer be used (see _invalidate)
+        self.__invalid = None
 
     @property
     def _client(self):
         """
         For internal use: reference to IOT.Client instance
+
+        Raises:
+            IOTClientError: If this instance has been invalidated
         """
+        if self.__invalid is not None:
+            raise IOTClientError(self.__invalid)
         return self.__client
 
+    def _replace_ids(self, subid, pointid):
+        """
+        For internal use: the subscription has been (re)created with a different subscription and/or point id since
+        this instance was returned from the catalog
+        """
+        self.__subid = Validation.guid_check_convert(subid)
+        self.__pointid = Validation.guid_check_convert(pointid)
+
+    def _invalidate(self, reason):
+        """
+        For internal use: the subscription this instance was returned for from the catalog could not be created. Any
+        further use raises IOTClientError with the given reason.
+        """
+        self.__invalid = reason
+
     @property
     def subid(self):
         """
@@ -116,27 +141,56 @@ class RemoteFeed(RemotePoint):
                 by the container.
 
         Note:
-            Feed data is iterable as soon as it arrives, rather than when the request completes.
+            Feed data is iterable as soon as it arrives, rather than when the request completes. If the feed was
+            followed with a `cache_size` (see :doc:`IoticAgent.IOT.Thing` Thing.follow) and at least count samples have
+            been received since, these are returned without making a request.
         """
-        queue = Queue()
-        evt = self.get_recent_async(count, queue.put)
+        cached = self._get_cached_recent(count)
+        if cached is not None:
+            for sample in cached:
+                yield sample
+            return
+
+        samples = deque()
+        cond = Condition(Lock())
+
+        def add_sample(sample):
+            with cond:
+                samples.append(sample)
+                cond.notify()
+
+        def notify_done(_):
+            with cond:
+                cond.notify()
+
+        evt = self.get_recent_async(count, add_sample)
+        # Samples are always delivered before the request completes
+        evt.add_done_callback(notify_done)
         timeout_time = monotonic() + self._client.sync_timeout
 
         while True:
-            try:
-                yield queue.get(True, .1)
-            except Empty:
-                if evt.is_set() or monotonic() >= timeout_time:
-                    break
-        # Forward any remaining samples which arrived e.g. during this thread being inactive
-        try:
-            while True:
-                yield queue.get_nowait()
-        except Empty:
-            pass
+            with cond:
+                while not (samples or evt.is_set()):
+                    remaining = timeout_time - monotonic()
+                    if remaining <= 0:
+                        break
+                    cond.wait(remaining)
+                batch = list(samples)
+                samples.clear()
+            if not batch:
+                break
+            for sample in batch:
+                yield sample
 
         self._client._except_if_failed(evt)
 
+    def _get_cached_recent(self, count):
+        """
+        Returns:
+            List of the last count samples from the local cache or None if not available
+        """
+        return self._client._feed_cache_recent(self.guid, count)
+
     def get_recent_async(self, count, callback):
         """
         Similar to `get_recent` except instead of returning an iterable, passes each dict to the given function which
@@ -155,6 +209,51 @@ class RemoteFeed(RemotePoint):
         self._client._add_recent_cb_for(evt, callback)
         return evt
 
+    def get_recent_columns(self, count):
+        """
+        Get the last instance(s) of feeddata from the feed by column rather than by sample, with values split according
+        to the point's value template. Suited to retrieving large numbers of samples since the per-sample dicts (and,
+        with numpy, datetimes) are not kept once their values have been added to the columns. Note that they are still
+        created whilst decoding each batch of samples, as for get_recent, so the saving is in memory held rather than
+        in decoding work.
+
+        Returns:
+            :doc:`IoticAgent.IOT.RecentColumns` RecentColumns instance. Columns are numpy arrays if numpy is available.
+
+        Args:
+            count (integer): How many recent instances to retrieve. High values might be floored to a maximum as defined
+                by the container.
+
+        Raises:
+            ValueError: If the point has no (suitable) values
+        """
+        builder = self.__get_columns_builder()
+        self._client._wait_and_except_if_failed(self.get_recent_async(count, builder.add))
+        return builder.result()
+
+    def get_recent_columns_async(self, count, callback):
+        """
+        Similar to `get_recent_columns` except instead of returning the columns, passes them to the given function
+        once the request has completed successfully.
+
+        Returns:
+            The request.
+
+        Args:
+            callback (function): Called with a RecentColumns instance. Not called if the request fails.
+
+        Note:
+            The point's value template is retrieved (synchronously) first, unless already known.
+        """
+        Validation.callable_check(callback)
+        builder = self.__get_columns_builder()
+        evt = self.get_recent_async(count, builder.add)
+        evt.add_done_callback(lambda req: callback(builder.result()) if req.success else None)
+        return evt
+
+    def __get_columns_builder(self):
+        return RecentColumnsBuilder(self._client._get_point_data_handler_for(self).get_template())
+
     def simulate(self, data, mime=None):
         """
         Simulate the arrival of feeddata into the feed.  Useful if the remote Thing doesn't publish
@@ -166,6 +265,25 @@ class RemoteFeed(RemotePoint):
         """
         self._client.simulate_feeddata(self.__pointid, data, mime)
 
+    def get_callback_stats(self):
+        """
+        Statistics of the queue through which feed data is passed to the callback specified via
+        :doc:`IoticAgent.IOT.Thing` Thing.follow. Useful for finding out which callbacks cannot keep up.
+
+        Returns:
+            None if no callback was specified or a dict.
+
+        Dict contains:
+
+        ::
+
+            'queued'     # (number of messages currently waiting for the callback)
+            'max_queued' # (highest number of messages which have been waiting at any one time)
+            'dropped'    # (number of messages discarded due to the queue being full)
+            'delayed'    # (number of messages which had to wait for the callback to finish with earlier ones)
+        """
+        return self._client._feed_callback_stats(self.guid)
+
 
 class RemoteControl(RemotePoint):
     """
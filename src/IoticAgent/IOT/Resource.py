@@ -17,6 +17,8 @@ from __future__ import unicode_literals
 
 from IoticAgent.Core.Validation import Validation
 
+from .Exceptions import IOTClientError
+
 
 class Resource(object):
     """Resource base class
@@ -25,6 +27,8 @@ class Resource(object):
     def __init__(self, client, guid):
         self.__client = client
         self.__guid = Validation.guid_check_convert(guid)
+        # reason for which this instance can no longer be used (see _invalidate)
+        self.__invalid = None
 
     @property
     def guid(self):
@@ -34,5 +38,21 @@ class Resource(object):
 
     @property
     def _client(self):
-        """For internal use: reference to IOT.Client instance"""
+        """For internal use: reference to IOT.Client instance
+
+        Raises:
+            IOTClientError: If this instance has been invalidated
+        """
+        if self.__invalid is not None:
+            raise IOTClientError(self.__invalid)
         return self.__client
+
+    def _replace_guid(self, guid):
+        """For internal use: the resource has been (re)created with a different global id since this instance was
+        returned, e.g. from the catalog"""
+        self.__guid = Validation.guid_check_convert(guid)
+
+    def _invalidate(self, reason):
+        """For internal use: the resource this instance was returned for (e.g. from the catalog) could not be created.
+        Any further use raises IOTClientError with the given reason."""
+        self.__invalid = reason
@@ -0,0 +1,513 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Declarative provisioning of things: A specification is compared with the current state of things (and their points,
+values, tags, properties, metadata & subscriptions) so that only the requests needed to reach it are made. See
+Client.sync_plan.
+"""
+
+from __future__ import unicode_literals
+
+from collections import namedtuple, OrderedDict
+from functools import partial
+import logging
+logger = logging.getLogger(__name__)
+
+from IoticAgent.Core.Const import R_FEED, R_CONTROL
+from IoticAgent.Core.compat import Mapping, Sequence, string_types
+from IoticAgent.Core.Validation import Validation
+
+from .BulkResult import BulkResult
+from .Exceptions import IOTClientError, IOTUnknown
+from .PointMeta import PointMeta
+from .ThingMeta import ThingMeta
+from .utils import foc_to_str
+
+_THING_KEYS = frozenset(('labels', 'descriptions', 'location', 'tags', 'properties', 'feeds', 'controls', 'follows',
+                         'attaches'))
+_POINT_KEYS = frozenset(('labels', 'descriptions', 'tags', 'values', 'save_recent', 'callback'))
+_VALUE_KEYS = frozenset(('label', 'type', 'unit', 'description', 'lang'))
+
+# Page size for retrieving tags, values, properties & subscriptions of a resource. Further pages are requested (for all
+# resources at once) whilst pages come back full.
+_LIST_LIMIT = 500
+# Kinds of state which are retrieved in pages (each being the key of the listing in the respective payload)
+_LISTINGS = frozenset(('tags', 'props', 'values', 'subs'))
+_META_FMT = 'n3'
+
+# Operations are applied in stages (things, points, everything else), each stage only starting once the previous one
+# has finished.
+_STAGE_THING = 0
+_STAGE_POINT = 1
+_STAGE_DETAIL = 2
+
+
+class SyncOperation(namedtuple('nt_SyncOperation', 'action lid foc pid detail')):
+    """A single change (request) in a SyncPlan.
+
+    `action` - One of create_thing, create_feed, create_control, set_meta, create_tag, delete_tag, update_property,
+    delete_property, create_value, delete_value, follow, attach, unfollow, unattach
+
+    `lid` - Local id of the thing
+
+    `foc` - R_FEED or R_CONTROL if the operation concerns a point, None otherwise
+
+    `pid` - Local id of the point, if applicable
+
+    `detail` - Action specific (hashable) summary, e.g. tuple of tags, value label or point guid
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        target = self.lid if self.pid is None else '%s/%s/%s' % (self.lid, foc_to_str(self.foc), self.pid)
+        if self.detail is None:
+            return '%s %s' % (self.action, target)
+        return '%s %s: %s' % (self.action, target, self.detail)
+
+
+class SyncPlan(object):
+    """Operations needed to bring things in line with a specification, as returned by Client.sync_plan. Iterating over
+    a plan yields its SyncOperations (in the order in which they will be applied)."""
+
+    def __init__(self, client, operations):
+        self.__client = client
+        # list of (stage, SyncOperation, request function, result function or None, prepare function or None). If
+        # set, the prepare function is a (read) request, the payload of which is passed to the request function.
+        self.__operations = sorted(operations, key=lambda entry: entry[0])
+
+    def __len__(self):
+        return len(self.__operations)
+
+    def __iter__(self):
+        return (op for _, op, _, _, _ in self.__operations)
+
+    def __str__(self):
+        return '\n'.join(str(op) for op in self) if self.__operations else 'No changes'
+
+    def apply(self, window=32):
+        """
+        Make the planned requests, stage by stage (things, points, everything else) with up to `window` requests in
+        flight at once. Operations concerning a thing or point which could not be created are not attempted. Metadata of
+        newly created things & points is retrieved (for all of them at once) before any of it is updated.
+
+        Returns:
+            :doc:`IoticAgent.IOT.BulkResult` BulkResult by SyncOperation. Results of create_thing operations are Thing
+            objects and those of point creations Point objects, unless the thing is not known to this client (i.e.
+            neither created by the same plan nor previously via this client), in which case they are None. All other
+            operations have None as their result.
+        """
+        results = {}
+        errors = {}
+        failed = set()
+
+        for stage in sorted(set(entry[0] for entry in self.__operations)):
+            entries = OrderedDict()
+            for op_stage, op, request, result, prepare in self.__operations:
+                if op_stage != stage:
+                    continue
+                if op.lid in failed or (op.lid, op.foc, op.pid) in failed:
+                    errors[op] = IOTClientError('Not attempted since thing/point could not be created')
+                else:
+                    entries[op] = (request, result, prepare)
+
+            # All reads needed by this stage are made (pipelined) before any of its requests
+            prepared = [op for op, entry in entries.items() if entry[2]]
+            payloads = {}
+            if prepared:
+                outcome = self.__client._bulk_request(prepared, lambda op: entries[op][2](), None, window)
+                payloads = outcome.results
+                errors.update(outcome.errors)
+                for op in outcome.errors:
+                    del entries[op]
+
+            # (result function always given, so that payloads are never returned as results)
+            outcome = self.__client._bulk_request(
+                entries, lambda op: entries[op][0](payloads[op]) if entries[op][2] else entries[op][0](),
+                lambda op: entries[op][1]() if entries[op][1] else None, window
+            )
+            results.update(outcome.results)
+            errors.update(outcome.errors)
+            for op in outcome.errors:
+                if op.action == 'create_thing':
+                    failed.add(op.lid)
+                elif op.action in ('create_feed', 'create_control'):
+                    failed.add((op.lid, op.foc, op.pid))
+
+        ops = list(self)
+        return BulkResult(OrderedDict((op, results[op]) for op in ops if op in results),
+                          OrderedDict((op, errors[op]) for op in ops if op in errors))
+
+
+def _check_keys(obj, allowed, name):
+    if not isinstance(obj, Mapping):
+        raise ValueError('%s specification should be a mapping' % name)
+    unknown = set(obj) - allowed
+    if unknown:
+        raise ValueError('Unknown %s specification key(s): %s' % (name, ', '.join(sorted(unknown))))
+
+
+def _texts(texts, default_lang, name):
+    """Labels/descriptions by language (string implying default language) or None if not specified"""
+    if texts is None:
+        return None
+    if isinstance(texts, string_types):
+        texts = {None: texts}
+    elif not isinstance(texts, Mapping):
+        raise ValueError('%s should be a string or mapping by language' % name)
+    return {Validation.lang_check_convert(lang, default=default_lang): text for lang, text in texts.items()}
+
+
+def _tags(tags):
+    if tags is None:
+        return None
+    if isinstance(tags, string_types):
+        tags = [tags]
+    # tags are stored lower-cased
+    return list(OrderedDict.fromkeys(tag.lower() for tag in Validation.tags_check_convert(tags))) if tags else []
+
+
+def _property_object(obj):
+    """Hashable form of property object (as used by Thing.list_property)"""
+    return tuple(obj) if isinstance(obj, (list, tuple)) else obj
+
+
+def _properties(props):
+    """Properties as OrderedDict of object lists by predicate (or None if not specified)"""
+    if props is None:
+        return None
+    by_predicate = OrderedDict()
+    for prop in props:
+        if not (isinstance(prop, Sequence) and 2 <= len(prop) <= 3):
+            raise ValueError('Properties should be (predicate, object[, type]) tuples')
+        by_predicate.setdefault(prop[0], []).append(prop[1] if len(prop) == 2 else tuple(prop[1:]))
+    return by_predicate
+
+
+def _values(values, default_lang):
+    if values is None:
+        return None
+    checked = OrderedDict()
+    for value in values:
+        _check_keys(value, _VALUE_KEYS, 'value')
+        label = value['label']
+        checked[label] = (value['type'], value.get('unit') or None, value.get('description'),
+                          Validation.lang_check_convert(value.get('lang'), default=default_lang))
+    return checked
+
+
+def _guids(guids):
+    return None if guids is None else [Validation.guid_check_convert(guid) for guid in guids]
+
+
+class _Planner(object):
+    """Reads the current state of the specified things and works out the operations needed"""
+
+    def __init__(self, client, spec, prune, window):
+        self.__client = client
+        self.__prune = prune
+        self.__window = window
+        self.__default_lang = client.default_lang
+        self.__things = OrderedDict((Validation.lid_check_convert(lid), self.__check_thing(thing or {}))
+                                    for lid, thing in spec.items())
+        # read request key -> payload
+        self.__state = None
+        self.__operations = []
+
+    def __check_thing(self, thing):
+        _check_keys(thing, _THING_KEYS, 'thing')
+        lang = self.__default_lang
+        location = thing.get('location')
+        if location is not None:
+            Validation.location_check(*location)
+        points = OrderedDict()
+        for foc, key in ((R_FEED, 'feeds'), (R_CONTROL, 'controls')):
+            for pid, point in (thing.get(key) or {}).items():
+                _check_keys(point, _POINT_KEYS, 'point')
+                callback = point.get('callback')
+                if foc == R_CONTROL and callback is not None:
+                    Validation.callable_check(callback)
+                elif callback is not None or (foc == R_CONTROL and point.get('save_recent')):
+                    raise ValueError('callback only applies to controls, save_recent only to feeds')
+                points[(foc, Validation.pid_check_convert(pid))] = {
+                    'labels': _texts(point.get('labels'), lang, 'labels'),
+                    'descriptions': _texts(point.get('descriptions'), lang, 'descriptions'),
+                    'tags': _tags(point.get('tags')),
+                    'values': _values(point.get('values'), lang),
+                    'save_recent': point.get('save_recent', 0),
+                    'callback': callback
+                }
+        return {'labels': _texts(thing.get('labels'), lang, 'labels'),
+                'descriptions': _texts(thing.get('descriptions'), lang, 'descriptions'),
+                'location': None if location is None else tuple(location),
+                'tags': _tags(thing.get('tags')),
+                'properties': _properties(thing.get('properties')),
+                'points': points,
+                'follows': _guids(thing.get('follows')),
+                'attaches': _guids(thing.get('attaches'))}
+
+    def plan(self):
+        self.__read()
+        for lid, thing in self.__things.items():
+            self.__plan_thing(lid, thing)
+        return SyncPlan(self.__client, self.__operations)
+
+    def __read(self):
+        """Retrieves the current state of all things & points at once. Unknown things & points are recognised by their
+        tags & values (respectively) not being available. Listings (see _LISTINGS) are read page by page, the read
+        functions of which take the offset as their only argument."""
+        client = self.__client
+        reads = OrderedDict()
+        for lid, thing in self.__things.items():
+            reads[('tags', lid)] = partial(client._request_entity_tag_list, lid, _LIST_LIMIT)
+            if thing['properties'] is not None:
+                reads[('props', lid)] = partial(client._request_entity_property_list, lid, _LIST_LIMIT)
+            if self.__meta_specified(thing):
+                reads[('meta', lid)] = partial(client._request_entity_meta_get, lid, _META_FMT)
+            if thing['follows'] is not None or thing['attaches'] is not None:
+                reads[('subs', lid)] = partial(client._request_sub_list, lid, _LIST_LIMIT)
+            for (foc, pid), point in thing['points'].items():
+                reads[('values', lid, foc, pid)] = partial(client._request_point_value_list, lid, pid, foc, _LIST_LIMIT)
+                if point['tags'] is not None:
+                    reads[('tags', lid, foc, pid)] = partial(client._request_point_tag_list, foc, lid, pid, _LIST_LIMIT)
+                if self.__meta_specified(point):
+                    reads[('meta', lid, foc, pid)] = partial(client._request_point_meta_get, foc, lid, pid, _META_FMT)
+
+        state = client._bulk_request(reads, lambda key: reads[key](0) if key[0] in _LISTINGS else reads[key](), None,
+                                     self.__window)
+        for ex in state.errors.values():
+            if not isinstance(ex, IOTUnknown):
+                raise ex  # pylint: disable=raising-bad-type
+        results = state.results
+
+        # Subsequent pages of listings, so that nothing (e.g. when pruning) is missed
+        offset = 0
+        incomplete = [key for key in results if key[0] in _LISTINGS and _more_pages(key[0], results[key])]
+        while incomplete:
+            offset += _LIST_LIMIT
+            pages = client._bulk_request(incomplete, lambda key: reads[key](offset), None, self.__window)
+            for ex in pages.errors.values():
+                raise ex  # pylint: disable=raising-bad-type
+            for key, page in pages.results.items():
+                _merge_page(results[key][key[0]], page[key[0]])
+            incomplete = [key for key, page in pages.results.items() if _more_pages(key[0], page)]
+            logger.debug('Read page %d of %d listing(s)', offset // _LIST_LIMIT + 1, len(pages.results))
+
+        logger.debug('Read %d state(s) for %d thing(s), %d unknown', len(reads), len(self.__things),
+                     len(state.errors))
+        self.__state = results
+
+    @staticmethod
+    def __meta_specified(resource):
+        return any(resource.get(key) is not None for key in ('labels', 'descriptions', 'location'))
+
+    def __add(self, stage, action, lid, request, foc=None, pid=None, detail=None, result=None, prepare=None):
+        self.__operations.append((stage, SyncOperation(action, lid, foc, pid, detail), request, result, prepare))
+
+    def __plan_thing(self, lid, thing):
+        client = self.__client
+        state = self.__state
+        exists = ('tags', lid) in state
+        if not exists:
+            self.__add(_STAGE_THING, 'create_thing', lid, partial(client._request_entity_create, lid),
+                       result=partial(_pop_new_thing, client, lid))
+
+        if self.__meta_specified(thing):
+            self.__plan_meta(lid, None, None, thing, ThingMeta, state.get(('meta', lid)),
+                             client._request_entity_meta_get, client._request_entity_meta_set)
+        self.__plan_tags(lid, None, None, thing['tags'], state.get(('tags', lid)), client._request_entity_tag_update)
+        self.__plan_properties(lid, thing['properties'], state.get(('props', lid)))
+        self.__plan_subs(lid, thing['follows'], thing['attaches'], state.get(('subs', lid)))
+
+        for (foc, pid), point in thing['points'].items():
+            self.__plan_point(lid, foc, pid, point)
+
+    def __plan_point(self, lid, foc, pid, point):
+        client = self.__client
+        state = self.__state
+        values = state.get(('values', lid, foc, pid))
+        if values is None:
+            if foc == R_CONTROL:
+                if point['callback'] is None:
+                    raise ValueError('Control %s (of %s) does not exist and no callback has been specified'
+                                     % (pid, lid))
+                request = partial(client._request_point_create, foc, lid, pid, control_cb=point['callback'])
+            else:
+                request = partial(client._request_point_create, foc, lid, pid, save_recent=point['save_recent'])
+            self.__add(_STAGE_POINT, 'create_%s' % foc_to_str(foc), lid, request, foc, pid,
+                       result=partial(_pop_new_point, client, lid, foc, pid))
+
+        if self.__meta_specified(point):
+            self.__plan_meta(lid, foc, pid, point, PointMeta, state.get(('meta', lid, foc, pid)),
+                             partial(client._request_point_meta_get, foc), partial(client._request_point_meta_set, foc))
+        self.__plan_tags(lid, foc, pid, point['tags'], state.get(('tags', lid, foc, pid)),
+                         partial(client._request_point_tag_update, foc))
+        self.__plan_values(lid, foc, pid, point['values'], values)
+
+    def __plan_tags(self, lid, foc, pid, desired, current, update):
+        if desired is None:
+            return
+        current = set(tag.lower() for tag in current['tags']) if current else set()
+        ids = (lid,) if pid is None else (lid, pid)
+        missing = [tag for tag in desired if tag not in current]
+        if missing:
+            self.__add(_STAGE_DETAIL, 'create_tag', lid, partial(update, *ids, tags=missing, delete=False), foc, pid,
+                       tuple(missing))
+        if self.__prune:
+            extra = sorted(current.difference(desired))
+            if extra:
+                self.__add(_STAGE_DETAIL, 'delete_tag', lid, partial(update, *ids, tags=extra, delete=True), foc, pid,
+                           tuple(extra))
+
+    def __plan_properties(self, lid, desired, current):
+        if desired is None:
+            return
+        current = current['props'] if current else {}
+        changed = [predicate for predicate, objects in desired.items()
+                   if set(map(_property_object, objects)) != set(map(_property_object, current.get(predicate, ())))]
+        if changed:
+            props = [(predicate,) + (obj if isinstance(obj, tuple) else (obj,))
+                     for predicate in changed for obj in desired[predicate]]
+            self.__add(_STAGE_DETAIL, 'update_property', lid,
+                       partial(self.__client._request_entity_property_update, lid, props, replace=True),
+                       detail=tuple(changed))
+        if self.__prune:
+            extra = sorted(set(current).difference(desired))
+            if extra:
+                self.__add(_STAGE_DETAIL, 'delete_property', lid,
+                           partial(self.__client._request_entity_property_delete, lid,
+                                   [(predicate, None) for predicate in extra]),
+                           detail=tuple(extra))
+
+    def __plan_values(self, lid, foc, pid, desired, current):
+        if desired is None:
+            return
+        current = {value['label']: value for value in current['values']} if current else {}
+        for label, (vtype, unit, description, lang) in desired.items():
+            value = current.get(label)
+            if not (value is not None and value['type'] == vtype and (value.get('unit') or None) == unit and
+                    (value.get('comment') or {}).get(lang) == description):
+                self.__add(_STAGE_DETAIL, 'create_value', lid,
+                           partial(self.__client._request_point_value_create, lid, pid, foc, label, vtype, lang,
+                                   description, unit),
+                           foc, pid, label)
+        if self.__prune:
+            for label in sorted(set(current).difference(desired)):
+                self.__add(_STAGE_DETAIL, 'delete_value', lid,
+                           partial(self.__client._request_point_value_delete, lid, pid, foc, label=label), foc, pid,
+                           label)
+
+    def __plan_subs(self, lid, follows, attaches, current):
+        current = current['subs'] if current else {}
+        for foc, desired, action in ((R_FEED, follows, 'follow'), (R_CONTROL, attaches, 'attach')):
+            if desired is None:
+                continue
+            existing = {sub['id']: subid for subid, sub in current.items() if sub['type'] == foc}
+            for gpid in desired:
+                if gpid not in existing:
+                    self.__add(_STAGE_DETAIL, action, lid,
+                               partial(self.__client._request_sub_create, lid, foc, gpid, None), detail=gpid)
+            if self.__prune:
+                for gpid in set(existing).difference(desired):
+                    self.__add(_STAGE_DETAIL, 'un%s' % action, lid,
+                               partial(self.__client._request_sub_delete, existing[gpid]), detail=gpid)
+
+    def __plan_meta(self, lid, foc, pid, desired, meta_cls, current, get, set_):
+        ids = (lid,) if pid is None else (lid, pid)
+        if current is None:
+            # Resource does not exist yet, so its (default) metadata can only be retrieved once it has been created
+            self.__add(_STAGE_DETAIL, 'set_meta', lid, partial(self.__set_meta_later, ids, desired, meta_cls, set_),
+                       foc, pid, prepare=partial(get, *ids, fmt=_META_FMT))
+            return
+        rdf = self.__updated_meta(desired, meta_cls, current['meta'])
+        if rdf is not None:
+            self.__add(_STAGE_DETAIL, 'set_meta', lid, partial(set_, *ids, rdf=rdf, fmt=_META_FMT), foc, pid)
+
+    def __set_meta_later(self, ids, desired, meta_cls, set_, payload):
+        """Request function for set_meta of newly created resource, given the payload of its meta get request"""
+        rdf = self.__updated_meta(desired, meta_cls, payload['meta'])
+        return set_(*ids, rdf=payload['meta'] if rdf is None else rdf, fmt=_META_FMT)
+
+    def __updated_meta(self, desired, meta_cls, rdf):
+        """
+        Returns:
+            Modified RDF or None if the metadata already matches
+        """
+        meta = meta_cls(None, rdf, self.__default_lang, fmt=_META_FMT)
+        changed = False
+        for key, get, set_, delete in (
+                ('labels', meta.get_labels_rdf, meta.set_label, meta.delete_label),
+                ('descriptions', meta.get_descriptions_rdf, meta.set_description, meta.delete_description)
+        ):
+            if desired[key] is None:
+                continue
+            current = {literal.language: '%s' % literal for literal in get()}
+            for lang, text in desired[key].items():
+                if current.get(lang) != text:
+                    set_(text, lang)
+                    changed = True
+            if self.__prune:
+                # labels without language are left alone (delete_* would apply to the default language instead)
+                for lang in set(current).difference(desired[key]).difference((None,)):
+                    delete(lang)
+                    changed = True
+        location = desired.get('location')
+        if location is not None and meta.get_location() != tuple(float(item) for item in location):
+            meta.set_location(*location)
+            changed = True
+        return '%s' % meta if changed else None
+
+
+def _more_pages(kind, payload):
+    """Whether a listing (see _LISTINGS) might continue beyond the given page"""
+    items = payload[kind]
+    if kind == 'props':
+        # Iotic-internal properties are omitted from pages, so only an empty page reliably indicates the end
+        return bool(items)
+    return len(items) >= _LIST_LIMIT
+
+
+def _merge_page(items, page):
+    """Adds page of a listing to the (first page of the) same listing"""
+    if isinstance(items, Mapping):
+        for key, value in page.items():
+            if isinstance(value, list) and isinstance(items.get(key), list):
+                items[key].extend(value)
+            else:
+                items[key] = value
+    else:
+        items.extend(page)
+
+
+def _pop_new_thing(client, lid):
+    try:
+        return client.get_thing(lid)
+    except KeyError:
+        return None
+
+
+def _pop_new_point(client, lid, foc, pid):
+    thing = client._private_thing(lid)
+    if thing is None:
+        return None
+    try:
+        return thing.get_feed(pid) if foc == R_FEED else thing.get_control(pid)
+    except KeyError:
+        return None
+
+
+def build_plan(client, spec, prune=False, window=32):
+    """See Client.sync_plan"""
+    if not isinstance(spec, Mapping):
+        raise ValueError('spec should be a mapping of thing specifications by local id')
+    return _Planner(client, spec, prune, window).plan()
@@ -0,0 +1,192 @@
+# Copyright (c) 2019 Iotic Labs Ltd. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://github.com/Iotic-Labs/py-IoticAgent/blob/master/LICENSE
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Bounded cache of point value templates (PointDataObjectHandler instances) with optional on-disk snapshot
+"""
+
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+from json import dumps, loads
+from time import time as wall_time
+import logging
+logger = logging.getLogger(__name__)
+
+from IoticAgent.Core.Validation import Validation
+from IoticAgent.Core.compat import Lock, monotonic, replace_file
+from IoticAgent.Core.utils import validate_nonnegative_int
+
+from .Point import Point
+from .PointValueHelper import PointDataObjectHandler
+from .RemotePoint import RemotePoint
+
+DEBUG_ENABLED = logger.isEnabledFor(logging.DEBUG)
+
+_SNAPSHOT_VERSION = 1
+# Guid used for points which are identified by local ids only
+_UNKNOWN_GUID = '0' * 32
+
+
+class TemplateCache(object):
+    """Least recently used PointDataObjectHandler instances by point, each expiring ttl seconds after its value metadata
+    was retrieved. Value metadata of remote points can be saved to and loaded from a file, so that templates are
+    available without making (describe) requests after a restart. Threadsafe."""
+
+    def __init__(self, client, max_size=1000, ttl=86400, path=None):
+        """
+        `client` - IOT.Client instance (used by handlers to retrieve value metadata)
+
+        `max_size` - (int) Maximum number of handlers to keep. Zero means unlimited.
+
+        `ttl` - (int) Seconds after which value metadata is retrieved again. Zero means never.
+
+        `path` - (string) Snapshot file for use by load() and save(). If not set, these do nothing.
+        """
+        self.__client = client
+        self.__max_size = validate_nonnegative_int(max_size, 'max_size', allow_zero=True)
+        self.__ttl = validate_nonnegative_int(ttl, 'ttl', allow_zero=True)
+        self.__path = path or None
+        self.__lock = Lock()
+        # key -> (handler, monotonic expiry time or None, wall time at which value metadata was retrieved)
+        self.__handlers = OrderedDict()
+        # guid -> key, for local points with a known guid
+        self.__guid_keys = {}
+        # guid -> (values, wall time), loaded from snapshot but not used yet
+        self.__snapshot = {}
+
+    def __len__(self):
+        return len(self.__handlers)
+
+    @staticmethod
+    def __key(point):
+        if isinstance(point, Point):
+            return (point._type, point.lid, point.pid)
+        elif isinstance(point, RemotePoint):
+            return point.guid
+        return Validation.guid_check_convert(point)
+
+    def get(self, point):
+        """
+        Returns:
+            PointDataObjectHandler for the given point (Point, RemotePoint instance or GUID)
+        """
+        key = self.__key(point)
+        now = monotonic()
+        with self.__lock:
+            try:
+                entry = self.__handlers.pop(key)
+            except KeyError:
+                pass
+            else:
+                if entry[1] is None or now < entry[1]:
+                    # most recently used last
+                    self.__handlers[key] = entry
+                    return entry[0]
+                logger.debug('Template for %s expired', key)
+                self.__remove_guid_key(key)
+
+            values, retrieved = self.__snapshot.pop(key, (None, None))
+            if retrieved is None:
+                retrieved = wall_time()
+            handler = PointDataObjectHandler(point, self.__client, values=values)
+            self.__handlers[key] = (handler, now + self.__ttl - (wall_time() - retrieved) if self.__ttl else None,
+                                    retrieved)
+            if isinstance(point, Point) and point.guid != _UNKNOWN_GUID:
+                self.__guid_keys[point.guid] = key
+            if self.__max_size and len(self.__handlers) > self.__max_size:
+                old_key = next(iter(self.__handlers))
+                del self.__handlers[old_key]
+                self.__remove_guid_key(old_key)
+            return handler
+
+    def __remove_guid_key(self, key):
+        """MUST be called within lock"""
+        if isinstance(key, tuple):
+            for guid, other in list(self.__guid_keys.items()):
+                if other == key:
+                    del self.__guid_keys[guid]
+
+    def invalidate(self, guid=None, local=None):
+        """Discard template for a point, e.g. because its values have changed or it has been renamed or deleted.
+
+        `guid` - (string) Global id of the point
+
+        `local` - (tuple) Point type (R_FEED/R_CONTROL), Thing local id & point local id
+        """
+        with self.__lock:
+            keys = []
+            if guid is not None:
+                keys.append(guid)
+                self.__snapshot.pop(guid, None)
+                local_key = self.__guid_keys.pop(guid, None)
+                if local_key is not None:
+                    keys.append(local_key)
+            if local is not None:
+                keys.append(tuple(local))
+            for key in keys:
+                if self.__handlers.pop(key, None) is not None:
+                    logger.debug('Invalidated template for %s', key)
+                    self.__remove_guid_key(key)
+
+    def load(self):
+        """Load (unexpired) value metadata of remote points from the snapshot file, if configured. Failure to do so is
+        logged rather than raised."""
+        if not self.__path:
+            return
+        try:
+            with open(self.__path, 'r') as snapshot_file:
+                snapshot = loads(snapshot_file.read())
+            if snapshot.get('version') != _SNAPSHOT_VERSION:
+                raise ValueError('Unsupported snapshot version')
+            templates = snapshot['templates']
+        except IOError as ex:
+            logger.debug('Template snapshot %s not loaded: %s', self.__path, ex)
+            return
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logger.warning('Ignoring invalid template snapshot %s', self.__path, exc_info=DEBUG_ENABLED)
+            return
+        oldest = wall_time() - self.__ttl if self.__ttl else None
+        loaded = {}
+        for guid, entry in templates.items():
+            try:
+                if oldest is None or entry['time'] > oldest:
+                    loaded[Validation.guid_check_convert(guid)] = (entry['values'], entry['time'])
+            except (ValueError, KeyError, TypeError):
+                logger.debug('Ignoring invalid template for %s', guid, exc_info=DEBUG_ENABLED)
+        with self.__lock:
+            self.__snapshot.update(loaded)
+        logger.debug('Loaded %d template(s) from %s', len(loaded), self.__path)
+
+    def save(self):
+        """Write value metadata of remote points (including those loaded but not used) to the snapshot file, if
+        configured. Failure to do so is logged rather than raised."""
+        if not self.__path:
+            return
+        with self.__lock:
+            templates = {guid: {'values': values, 'time': retrieved}
+                         for guid, (values, retrieved) in self.__snapshot.items()}
+            handlers = [(key, handler, retrieved) for key, (handler, _, retrieved) in self.__handlers.items()
+                        if not isinstance(key, tuple)]
+        for guid, handler, retrieved in handlers:
+            values = handler.raw_values
+            if values:
+                templates[guid] = {'values': values, 'time': retrieved}
+        tmp_path = self.__path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as snapshot_file:
+                snapshot_file.write(dumps({'version': _SNAPSHOT_VERSION, 'templates': templates}))
+            replace_file(tmp_path, self.__path)
+        except (IOError, OSError):
+            logger.warning('Failed to save template snapshot %s', self.__path, exc_info=DEBUG_ENABLED)
+        else:
+            logger.debug('Saved %d template(s) to %s', len(templates), self.__path)
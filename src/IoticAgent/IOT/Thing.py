@@ -16,11 +16,12 @@
 from __future__ import unicode_literals
 
 from contextlib import contextmanager
+from functools import partial
 import logging
 logger = logging.getLogger(__name__)
 
 from IoticAgent.Core.Const import (P_RESOURCE, R_FEED, R_CONTROL, R_SUB, P_ID, P_LID, P_ENTITY_LID, P_POINT_LID,
-                                   P_POINT_ID, P_POINT_ENTITY_LID, P_POINT_TYPE, P_EPID)
+                                   P_POINT_ID, P_POINT_ENTITY_LID, P_POINT_TYPE, P_EPID, QueuePolicy)
 from IoticAgent.Core import ThreadSafeDict
 from IoticAgent.Core.compat import raise_from, string_types, Sequence
 from IoticAgent.Core.Validation import Validation
@@ -439,8 +440,14 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
                 raise_from(KeyError('Control %s not know as new' % pid), ex)
 
     def __create_point(self, foc, pid, control_cb=None, save_recent=0):
+        point = self.__warm_point(foc, pid, control_cb=control_cb, save_recent=save_recent)
+        if point is not None:
+            return point
         evt = self.__create_point_async(foc, pid, control_cb=control_cb, save_recent=save_recent)
         self._client._wait_and_except_if_failed(evt)
+        return self.__pop_new_point(foc, pid)
+
+    def __pop_new_point(self, foc, pid):
         store = self.__new_feeds if foc == R_FEED else self.__new_controls
         try:
             with store:
@@ -450,6 +457,38 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
                                             (foc_to_str(foc), pid, self.__lid)),
                              ex)
 
+    def __warm_point(self, foc, pid, control_cb=None, save_recent=0):
+        """
+        Returns:
+            Point from catalog (the creation request, which also registers the control callback, being made in the
+            background) or None if not catalogued
+        """
+        guid = self._client._catalog_point(foc, self.__lid, pid)
+        if guid is None:
+            return None
+        point = _POINT_TYPE_TO_CLASS[foc](self._client, self.__lid, pid, guid)
+        evt = self.__create_point_async(foc, pid, control_cb=control_cb, save_recent=save_recent)
+        evt.add_done_callback(partial(self.__verify_point, foc, pid, point))
+        return point
+
+    def __verify_point(self, foc, pid, warm_point, evt):
+        """Done callback for creation of point returned from catalog"""
+        guid = warm_point.guid
+        if not evt.success:
+            logger.warning('Catalogued %s %s (from %s) could not be created, forgetting it', foc_to_str(foc), pid,
+                           self.__lid)
+            self._client._catalog_remove(guid)
+            warm_point._invalidate('%s %s (from %s, catalog) could not be created' % (foc_to_str(foc).capitalize(),
+                                                                                      pid, self.__lid))
+            return
+        store = self.__new_feeds if foc == R_FEED else self.__new_controls
+        with store:
+            point = store.pop(pid, None)
+        if point is not None and point.guid != guid:
+            logger.warning('Catalogued %s %s (from %s) has changed (%s -> %s)', foc_to_str(foc), pid, self.__lid,
+                           guid, point.guid)
+            warm_point._replace_guid(point.guid)
+
     def __create_point_async(self, foc, pid, control_cb=None, save_recent=0):
         return self._client._request_point_create(foc, self.__lid, pid, control_cb=control_cb, save_recent=save_recent)
 
@@ -469,6 +508,12 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
             save_recent (int, optional): How many shares to store for later retrieval. If not supported by container,
                 this argument will be ignored. A value of zero disables this feature whilst a negative value requests
                 the maximum sample store amount.
+
+        Note:
+            If the Feed is known from the catalog (see iot.catalog_file configuration option), it is returned without
+            waiting for the creation request to complete, so a failure of the latter is not raised here. Instead it is
+            logged and any further use of the returned instance raises IOTClientError. Should the Feed have been
+            recreated with a different guid, the returned instance takes on the new one.
         """
         logger.info("create_feed(pid=\"%s\") [lid=%s]", pid, self.__lid)
         return self.__create_point(R_FEED, pid, save_recent=save_recent)
@@ -477,6 +522,20 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
         logger.info("create_feed_async(pid=\"%s\") [lid=%s]", pid, self.__lid)
         return self.__create_point_async(R_FEED, pid, save_recent=save_recent)
 
+    def create_feeds(self, pids, save_recent=0, window=32):
+        """
+        Create (or retrieve existing) Feeds with the given local point ids, with up to `window` creation requests in
+        flight at once. See create_feed for the meaning of `save_recent` (which applies to all of the feeds) and
+        :doc:`IoticAgent.IOT.Client` Client.create_things for details on bulk creation.
+
+        Returns:
+            :doc:`IoticAgent.IOT.BulkResult` BulkResult with a feed object (`results`) or exception (`errors`) for
+            each (unique) point id
+        """
+        logger.info("create_feeds(save_recent=%s, window=%s) [lid=%s]", save_recent, window, self.__lid)
+        return self._client._bulk_request(pids, partial(self.__create_point_async, R_FEED, save_recent=save_recent),
+                                          partial(self.__pop_new_point, R_FEED), window)
+
     def create_control(self, pid, callback, callback_parsed=None):
         """
         Create a control for this Thing with a local point id (pid) and a control request feedback
@@ -502,7 +561,8 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
         ::
 
             'data'      # (decoded or raw bytes)
-            'mime'      # (None, unless payload was not decoded and has a mime type)
+            'mime'      # (None, unless payload was not decoded and has a mime type. Always None if
+                        #  core.lazy_decode is enabled, see LazyPayload.mime instead.)
             'subId'     # (the global id of the associated subscripion)
             'entityLid' # (local id of the Thing to which the control belongs)
             'lid'       # (local id of control)
@@ -511,6 +571,11 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
 
         Note:
             `callback_parsed` can only be used if `auto_encode_decode` is enabled for the client instance.
+
+        Note:
+            As with create_feed, a Control known from the catalog is returned without waiting for the creation request
+            (which also registers the callback) to complete. If the request fails, this is only logged and the returned
+            instance raises IOTClientError when used subsequently.
         """
         logger.info("create_control(pid=\"%s\", control_cb=%s) [lid=%s]", pid, callback, self.__lid)
         if callback_parsed:
@@ -523,6 +588,22 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
             callback = self._client._get_parsed_control_callback(callback_parsed, callback)
         return self.__create_point_async(R_CONTROL, pid, control_cb=callback)
 
+    def create_controls(self, pids, callback, callback_parsed=None, window=32):
+        """
+        Create (or retrieve existing) Controls with the given local point ids, with up to `window` creation requests in
+        flight at once. The callbacks (see create_control) apply to all of the controls. See
+        :doc:`IoticAgent.IOT.Client` Client.create_things for details on bulk creation.
+
+        Returns:
+            :doc:`IoticAgent.IOT.BulkResult` BulkResult with a control object (`results`) or exception (`errors`) for
+            each (unique) point id
+        """
+        logger.info("create_controls(control_cb=%s, window=%s) [lid=%s]", callback, window, self.__lid)
+        if callback_parsed:
+            callback = self._client._get_parsed_control_callback(callback_parsed, callback)
+        return self._client._bulk_request(pids, partial(self.__create_point_async, R_CONTROL, control_cb=callback),
+                                          partial(self.__pop_new_point, R_CONTROL), window)
+
     def __delete_point(self, foc, pid):
         evt = self.__delete_point_async(foc, pid)
         self._client._wait_and_except_if_failed(evt)
@@ -645,7 +726,7 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
             except KeyError:
                 logger.warning('No sub ref %s', key)
 
-    def __sub_make_request(self, foc, gpid, callback):
+    def __sub_make_request(self, foc, gpid, callback, **sub_kwargs):
         """
         Make right subscription request depending on whether local or global - used by __sub*
         """
@@ -654,20 +735,24 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
             gpid = uuid_to_hex(gpid)
             ref = (foc, gpid)
             with self.__sub_add_reference(ref):
-                req = self._client._request_sub_create(self.__lid, foc, gpid, callback=callback)
+                req = self._client._request_sub_create(self.__lid, foc, gpid, callback=callback, **sub_kwargs)
         # local
         elif isinstance(gpid, Sequence) and len(gpid) == 2:
             ref = (foc, tuple(gpid))
             with self.__sub_add_reference(ref):
-                req = self._client._request_sub_create_local(self.__lid, foc, *gpid, callback=callback)
+                req = self._client._request_sub_create_local(self.__lid, foc, *gpid, callback=callback,
+                                                             **sub_kwargs)
         else:
             raise ValueError('gpid must be string or two-element tuple')
 
         req._run_on_completion(self.__sub_del_reference, ref)
         return req
 
-    def __sub(self, foc, gpid, callback=None):
-        evt = self.__sub_async(foc, gpid, callback=callback)
+    def __sub(self, foc, gpid, callback=None, **sub_kwargs):
+        sub = self.__warm_sub(foc, gpid, callback=callback, **sub_kwargs)
+        if sub is not None:
+            return sub
+        evt = self.__sub_async(foc, gpid, callback=callback, **sub_kwargs)
         self._client._wait_and_except_if_failed(evt)
         try:
             return self.__get_sub(foc, gpid)
@@ -676,11 +761,51 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
                                             gpid, self.__lid),
                              ex)
 
-    def __sub_async(self, foc, gpid, callback=None):
+    def __warm_sub(self, foc, gpid, callback=None, **sub_kwargs):
+        """
+        Returns:
+            RemoteFeed/RemoteControl from catalog (the subscription request, which also registers the callback, being
+            made in the background) or None if not catalogued
+        """
+        if isinstance(gpid, string_types):
+            key = uuid_to_hex(gpid)
+        elif isinstance(gpid, Sequence) and len(gpid) == 2:
+            key = tuple(gpid)
+        else:
+            raise ValueError('gpid must be string or two-element tuple')
+        entry = self._client._catalog_sub(self.__lid, foc, key)
+        if entry is None:
+            return None
+        subid, point_guid = entry
+        sub = (RemoteFeed if foc == R_FEED else RemoteControl)(self._client, subid, point_guid, self.__lid)
+        evt = self.__sub_async(foc, gpid, callback=callback, **sub_kwargs)
+        evt.add_done_callback(partial(self.__verify_sub, foc, key, sub))
+        return sub
+
+    def __verify_sub(self, foc, gpid, warm_sub, evt):
+        """Done callback for subscription returned from catalog"""
+        subid = warm_sub.subid
+        if not evt.success:
+            logger.warning('Catalogued subscription to %s (from %s) could not be created, forgetting it', gpid,
+                           self.__lid)
+            self._client._catalog_remove(subid)
+            warm_sub._invalidate('Subscription to %s (from %s, catalog) could not be created' % (gpid, self.__lid))
+            return
+        try:
+            sub = self.__get_sub(foc, gpid)
+        except (KeyError, ValueError):
+            return
+        if sub.subid != subid or sub.guid != warm_sub.guid:
+            logger.warning('Catalogued subscription to %s (from %s) has changed (%s -> %s)', gpid, self.__lid, subid,
+                           sub.subid)
+            warm_sub._replace_ids(sub.subid, sub.guid)
+
+    def __sub_async(self, foc, gpid, callback=None, **sub_kwargs):
         logger.info("__sub(foc=%s, gpid=\"%s\", callback=%s) [lid=%s]", foc_to_str(foc), gpid, callback, self.__lid)
-        return self.__sub_make_request(foc, gpid, callback)
+        return self.__sub_make_request(foc, gpid, callback, **sub_kwargs)
 
-    def follow(self, gpid, callback=None, callback_parsed=None):
+    def follow(self, gpid, callback=None, callback_parsed=None, queue_size=0, queue_policy=QueuePolicy.BLOCK,
+               cache_size=0):
         """
         Create a subscription (i.e. follow) a Feed/Point with a global point id (gpid) and a feed data callback
 
@@ -703,6 +828,17 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
                 :doc:`IoticAgent.IOT.Point` PointDataObject instance. If both `callback_parsed` and `callback` have been
                 specified, the former takes precedence and `callback` is only called if the point data could not be
                 parsed according to its current value description.
+            queue_size (int, optional): Maximum number of feed data messages to hold whilst the callback is still busy
+                with earlier ones. Zero (the default) means unlimited. Each subscription has its own queue, so a slow
+                callback does not hold up those of other subscriptions.
+            queue_policy (QueuePolicy, optional): What to do with new feed data when the queue is full: `BLOCK` (wait),
+                `DROP_OLDEST`, `DROP_NEWEST` or `LATEST` (only keep the most recent, ignoring queue_size). Note that
+                blocking holds up receipt of all other messages too. See
+                :doc:`IoticAgent.IOT.RemotePoint` RemoteFeed.get_callback_stats.
+            cache_size (int, optional): Number of most recently received samples to keep locally, from which
+                :doc:`IoticAgent.IOT.RemotePoint` RemoteFeed.get_last & get_recent are answered when enough samples
+                are available (instead of making a request). Zero (the default) disables caching. Subject to the
+                overall core.feed_cache_budget. The cache is per feed, i.e. shared by all Things following it.
 
         Note:
             The callback receives a single dict argument, with keys of:
@@ -710,21 +846,32 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
             ::
 
                 'data' # (decoded or raw bytes)
-                'mime' # (None, unless payload was not decoded and has a mime type)
+                'mime' # (None, unless payload was not decoded and has a mime type. Always None if
+                       #  core.lazy_decode is enabled, see LazyPayload.mime instead.)
                 'pid'  # (the global id of the feed from which the data originates)
                 'time' # (datetime representing UTC timestamp of share)
 
         Note:
             `callback_parsed` can only be used if `auto_encode_decode` is enabled for the client instance.
+
+        Note:
+            If the subscription is known from the catalog (see iot.catalog_file configuration option), it is returned
+            without waiting for the subscription request (which also registers the callback) to complete, so a failure
+            of the latter is not raised here. Instead it is logged and any further use of the returned instance raises
+            IOTClientError. Should the request yield a different subscription id, the returned instance takes on the
+            new one.
         """
         if callback_parsed:
             callback = self._client._get_parsed_feed_callback(callback_parsed, callback)
-        return self.__sub(R_FEED, gpid, callback=callback)
+        return self.__sub(R_FEED, gpid, callback=callback, queue_size=queue_size, queue_policy=queue_policy,
+                          cache_size=cache_size)
 
-    def follow_async(self, gpid, callback=None, callback_parsed=None):
+    def follow_async(self, gpid, callback=None, callback_parsed=None, queue_size=0, queue_policy=QueuePolicy.BLOCK,
+                     cache_size=0):
         if callback_parsed:
             callback = self._client._get_parsed_feed_callback(callback_parsed, callback)
-        return self.__sub_async(R_FEED, gpid, callback=callback)
+        return self.__sub_async(R_FEED, gpid, callback=callback, queue_size=queue_size, queue_policy=queue_policy,
+                                cache_size=cache_size)
 
     def attach(self, gpid):
         """
@@ -741,6 +888,11 @@ class Thing(Resource):  # pylint: disable=too-many-public-methods
         Args:
             gpid (uuid): Global id of the Point to which you want to attach **OR**
             gpid (lid, pid): Tuple of `(thing_localid, point_localid)` for local subscription
+
+        Note:
+            As with follow, a subscription known from the catalog is returned without waiting for the request to
+            complete. If the latter fails, this is only logged and the returned instance raises IOTClientError when
+            used subsequently.
         """
         return self.__sub(R_CONTROL, gpid)
 
@@ -17,4 +17,11 @@ helper objects for Thing, Point, etc.
 
 __version__ = '0.7.0'
 
-from .Client import Client, SearchScope, DescribeScope  # NOQA
+from sys import version_info as __version_info
+
+from .Client import Client, SearchScope, DescribeScope, QueuePolicy  # NOQA
+from IoticAgent.Core.Const import TimeType  # NOQA
+
+# asyncio interface requires async/await syntax
+if __version_info >= (3, 5):
+    from .AsyncClient import AsyncClient  # NOQA
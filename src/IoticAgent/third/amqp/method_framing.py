@@ -21,7 +21,7 @@ from struct import pack, unpack
 
 from .basic_message import Message
 from .exceptions import AMQPError, UnexpectedFrame
-from .five import range, text_t
+from .five import range, text_t, PY3
 from .serialization import AMQPReader
 
 __all__ = ['MethodReader']
@@ -37,6 +37,13 @@ _CONTENT_METHODS = [
 ]
 
 
+def _join(parts):
+    # bytes.join() only accepts buffers (memoryview) in Python 3
+    if PY3:
+        return bytes().join(parts)
+    return bytes().join(part.tobytes() for part in parts)
+
+
 class _PartialMessage(object):
     """Helper class to build up a multi-frame method."""
 
@@ -55,14 +62,15 @@ class _PartialMessage(object):
         self.complete = (self.body_size == 0)
 
     def add_payload(self, payload):
+        """payload - memoryview, copied only once body is complete"""
         parts = self.body_parts
         self.body_received += len(payload)
         if self.body_received == self.body_size:
             if parts:
                 parts.append(payload)
-                self.msg.body = bytes().join(parts)
+                self.msg.body = _join(parts)
             else:
-                self.msg.body = payload
+                self.msg.body = payload.tobytes()
             self.complete = True
         else:
             parts.append(payload)
@@ -134,6 +142,8 @@ class MethodReader(object):
 
     def _process_method_frame(self, channel, payload):
         """Process Method frames"""
+        # payload is a memoryview (see transport.read_frame)
+        payload = payload.tobytes()
         method_sig = unpack('>HH', payload[:4])
         args = AMQPReader(payload[4:])
 
@@ -151,7 +161,7 @@ class MethodReader(object):
     def _process_content_header(self, channel, payload):
         """Process Content Header frames"""
         partial = self.partial_messages[channel]
-        partial.add_header(payload)
+        partial.add_header(payload.tobytes())
 
         if partial.complete:
             #